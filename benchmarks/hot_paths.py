@@ -0,0 +1,284 @@
+"""
+Benchmarks for the interpreter's hot paths.
+
+Each benchmark runs one piece of the interpreter in isolation, on each of the ZORK
+games after it has played a few commands:
+
+    dispatch          decode and run instructions (the boot sequence and the commands)
+    zscii_decode      decode every object name and dictionary word
+    lookup_dictionary look up every dictionary word and some misses, with binary search
+                      and with the shared dictionary index
+    tokenize          split commands into words
+    property_walk     walk every object's property list, and read every property through the index
+    undo              save_undo followed by restore_undo
+    quetzal           save to and restore from a Quetzal file
+    wrap_lines        wrap the game's output, with and without the LineWrapper cache
+
+Results are written as JSON, to track them between releases.
+
+    python -m benchmarks.hot_paths [--games ZORK1 ...] [--only NAME ...] [--repeat 5] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable
+from zmachine.builder import ZMachineBuilder
+from zmachine.text import TextUtils
+from zmachine.screen import LineWrapper
+from .wrap_lines import GAMES_DIR, COMMANDS, collect_transcript
+
+BENCHMARKS = ('dispatch', 'zscii_decode', 'lookup_dictionary', 'tokenize', 'property_walk', 'undo', 'quetzal', 'wrap_lines')
+
+
+def measure(func: Callable[[], int], repeat: int) -> dict:
+    """Call func repeat times and keep the fastest run. func returns the number of operations it did."""
+    best = None
+    operations = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operations = func()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return {
+        'operations': operations,
+        'seconds': best,
+        'operations_per_second': operations / best if best > 0 else 0.0,
+    }
+
+
+def play(game: str) -> ZMachineBuilder:
+    """Start a game and play its commands, leaving it waiting for input."""
+    builder = ZMachineBuilder(os.path.join(GAMES_DIR, f'{game}.z5'), terminal='headless', seed=0)
+    session = builder.interpreter.run_resumable()
+    next(session)
+    for command in COMMANDS[game]:
+        session.send(command)
+    builder.terminal_adapter.read_output()
+    return builder
+
+
+def dictionary_entries(text_utils: TextUtils) -> list[int]:
+    config = text_utils.config
+    dictionary_addr = config.dictionary_table_addr
+    num_separators = text_utils.read_byte(dictionary_addr)
+    entry_length = text_utils.read_byte(dictionary_addr + num_separators + 1)
+    num_entries = abs(text_utils.read_int16(dictionary_addr + num_separators + 2))
+    first_entry_ptr = dictionary_addr + num_separators + 4
+    return [first_entry_ptr + i * entry_length for i in range(num_entries)]
+
+
+def dictionary_zchars(text_utils: TextUtils) -> list[list[int]]:
+    """The z-characters of each dictionary word. Not every entry marks its last word,
+    so the encoded length is read rather than reading up to the end bit."""
+    word_count = 2 if text_utils.config.version <= 3 else 3
+    result = []
+    for entry_addr in dictionary_entries(text_utils):
+        zchars = []
+        for i in range(word_count):
+            word = text_utils.read_word(entry_addr + i * 2)
+            zchars += [(word >> 10) & 0x1f, (word >> 5) & 0x1f, word & 0x1f]
+        result.append(zchars)
+    return result
+
+
+def bench_dispatch(game: str, repeat: int) -> dict:
+    def run():
+        builder = ZMachineBuilder(os.path.join(GAMES_DIR, f'{game}.z5'), terminal='headless', seed=0)
+        builder.interpreter.count_instructions = True
+        session = builder.interpreter.run_resumable()
+        next(session)
+        for command in COMMANDS[game]:
+            session.send(command)
+        session.close()
+        return builder.interpreter.instruction_count
+    return {'dispatch': measure(run, repeat)}
+
+
+def bench_zscii_decode(builder: ZMachineBuilder, repeat: int) -> dict:
+    interpreter = builder.interpreter
+    text_utils = interpreter.text_utils
+    object_table = interpreter.object_table
+    zchar_strings = [object_table.get_object_text_zchars(obj_id) for obj_id in range(1, object_table.object_count + 1)]
+    zchar_strings += dictionary_zchars(text_utils)
+
+    def run():
+        for zchars in zchar_strings:
+            text_utils.zscii_decode(zchars)
+        return len(zchar_strings)
+    return {'zscii_decode': measure(run, repeat)}
+
+
+def bench_lookup_dictionary(builder: ZMachineBuilder, repeat: int) -> dict:
+    memory_map = builder.interpreter.memory_map
+    text_utils = builder.interpreter.text_utils
+    words = [text_utils.zscii_decode(zchars).strip() for zchars in dictionary_zchars(text_utils)]
+    words += [word + 'xyzzy' for word in words[::4]]
+    searched = TextUtils(memory_map)
+    indexed = TextUtils(memory_map, {})
+    indexed.build_dictionary_index()
+
+    def lookup(text_utils: TextUtils):
+        def run():
+            for word in words:
+                text_utils.lookup_dictionary(word)
+            return len(words)
+        return run
+    results = {'lookup_dictionary': measure(lookup(searched), repeat)}
+    if indexed.dictionary_index is not None:
+        results['lookup_dictionary_indexed'] = measure(lookup(indexed), repeat)
+    return results
+
+
+def bench_tokenize(builder: ZMachineBuilder, game: str, repeat: int) -> dict:
+    separators = builder.interpreter.text_utils.separator_chars
+    commands = COMMANDS[game] + [', '.join(COMMANDS[game]), 'say "hello, sailor". take all. n.']
+
+    def run():
+        for command in commands:
+            TextUtils.tokenize(command, separators)
+        return len(commands)
+    return {'tokenize': measure(run, repeat)}
+
+
+def bench_property_walk(builder: ZMachineBuilder, repeat: int) -> dict:
+    object_table = builder.interpreter.object_table
+    obj_ids = range(1, object_table.object_count + 1)
+
+    def walk():
+        count = 0
+        for obj_id in obj_ids:
+            prop_addr = object_table.get_first_property_addr(obj_id)
+            while prop_addr is not None:
+                object_table.get_property_num(prop_addr)
+                prop_addr = object_table.get_next_property_addr(prop_addr)
+                count += 1
+        return count
+
+    def read_indexed():
+        count = 0
+        for obj_id in obj_ids:
+            prop_id = object_table.get_next_property_num(obj_id, 0)
+            while prop_id != 0:
+                object_table.get_property_addr(obj_id, prop_id)
+                prop_id = object_table.get_next_property_num(obj_id, prop_id)
+                count += 1
+        return count
+    return {'property_walk': measure(walk, repeat), 'property_index': measure(read_indexed, repeat)}
+
+
+def bench_undo(builder: ZMachineBuilder, repeat: int, iterations: int = 100) -> dict:
+    interpreter = builder.interpreter
+    pc = interpreter.pc
+
+    def run():
+        for _ in range(iterations):
+            # Both store their result through the byte at pc, so it's put back each time.
+            interpreter.pc = pc
+            interpreter.do_save_undo()
+            interpreter.do_restore_undo()
+        interpreter.pc = pc
+        return iterations
+    return {'undo': measure(run, repeat)}
+
+
+def bench_quetzal(builder: ZMachineBuilder, repeat: int, iterations: int = 20) -> dict:
+    interpreter = builder.interpreter
+    quetzal = interpreter.quetzal
+    pc = interpreter.pc
+    save_count = 0
+
+    def save():
+        nonlocal save_count
+        for _ in range(iterations):
+            # Each save goes to a new file; truncating an existing file can cost more than the save.
+            save_count += 1
+            assert quetzal.do_save(pc, interpreter.call_stack)
+        return iterations
+
+    def restore():
+        for _ in range(iterations):
+            assert quetzal.do_restore(interpreter.call_stack)[1]
+        return iterations
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # An absolute path answers the file name prompt.
+        quetzal.prompt_save_file = lambda: os.path.join(temp_dir, f'{save_count}.sav')
+        try:
+            return {'quetzal_save': measure(save, repeat), 'quetzal_restore': measure(restore, repeat)}
+        finally:
+            del quetzal.prompt_save_file
+
+
+def bench_wrap_lines(game: str, repeat: int, width: int = 80) -> dict:
+    texts = collect_transcript(game)
+    wrapper = LineWrapper(width)
+
+    def wrap(func):
+        def run():
+            for text in texts:
+                for x in (0, width // 2):
+                    func(text, x)
+            return len(texts) * 2
+        return run
+    return {'wrap_lines': measure(wrap(wrapper._wrap), repeat), 'wrap_lines_cached': measure(wrap(wrapper.wrap), repeat)}
+
+
+def run_benchmarks(game: str, only: list[str], repeat: int) -> dict:
+    results = {}
+    builder = play(game)
+    if 'dispatch' in only:
+        results.update(bench_dispatch(game, repeat))
+    if 'zscii_decode' in only:
+        results.update(bench_zscii_decode(builder, repeat))
+    if 'lookup_dictionary' in only:
+        results.update(bench_lookup_dictionary(builder, repeat))
+    if 'tokenize' in only:
+        results.update(bench_tokenize(builder, game, repeat))
+    if 'property_walk' in only:
+        results.update(bench_property_walk(builder, repeat))
+    if 'undo' in only:
+        results.update(bench_undo(builder, repeat))
+    if 'quetzal' in only:
+        results.update(bench_quetzal(builder, repeat))
+    if 'wrap_lines' in only:
+        results.update(bench_wrap_lines(game, repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', nargs='+', default=list(COMMANDS), choices=list(COMMANDS))
+    parser.add_argument('--only', nargs='+', default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each benchmark; the fastest is kept')
+    parser.add_argument('--output', help='File to write the JSON results to, instead of stdout')
+    args = parser.parse_args()
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'games': {},
+    }
+    for game in args.games:
+        results = run_benchmarks(game, args.only, args.repeat)
+        report['games'][game] = results
+        for name, result in results.items():
+            print(f"{game:6} {name:26} {result['operations_per_second']:14,.0f} ops/s", file=sys.stderr)
+    if args.output is not None:
+        with open(args.output, 'w') as s:
+            json.dump(report, s, indent=2)
+            s.write('\n')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
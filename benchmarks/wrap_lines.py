@@ -0,0 +1,127 @@
+"""
+Microbenchmark for word wrapping.
+
+Plays a few commands of each ZORK game on the headless terminal to collect the
+text written between inputs, then wraps each piece of text with the previous
+wrap_lines implementation and with LineWrapper, checking that the results match.
+
+    python -m benchmarks.wrap_lines [--width 80] [--repeat 20]
+"""
+import argparse
+import os
+import time
+from zmachine.builder import ZMachineBuilder
+from zmachine.screen import LineWrapper
+
+GAMES_DIR = os.path.join(os.path.dirname(__file__), '..', 'games')
+
+COMMANDS = {
+    'ZORK1': ['verbose', 'open mailbox', 'read leaflet', 'n', 'n', 'up', 'take egg', 'down', 's', 'e',
+              'open window', 'enter', 'w', 'take lamp', 'move rug', 'open trap door', 'turn on lamp',
+              'down', 's', 'e', 'look', 'inventory'],
+    'ZORK2': ['verbose', 'look', 's', 'take sword', 'n', 'n', 'look', 'inventory'],
+    'ZORK3': ['verbose', 'look', 'turn on lamp', 'take lamp', 'n', 'look', 'inventory'],
+}
+
+
+def legacy_wrap_lines(text: str, width: int, x: int) -> list[str]:
+    """The wrap_lines implementation before LineWrapper, for comparison."""
+    result = []
+    text_pos = 0
+    while text_pos < len(text):
+        line = text[text_pos:]
+        line_break = text.find("\n", text_pos)
+        if line_break >= 0:
+            line = text[text_pos:line_break + 1]
+            text_pos = line_break + 1
+        else:
+            text_pos = len(text)
+        if len(line) < width - x:
+            result += [line]
+            x = 0
+        else:
+            output_line = ''
+            linepos = 0
+            while line[linepos] == ' ':
+                if x <= width:
+                    output_line += ' '
+                linepos += 1
+                x += 1
+            words = line[linepos:].split(' ')
+            separator = ''
+            for word in words:
+                if len(separator) + len(word) > width - x:
+                    separator = ''
+                    result += [output_line + "\n"]
+                    output_line = ''
+                    x = 0
+                output_line += f"{separator}{word}"
+                x += len(separator) + len(word)
+                if x == width:
+                    x = 0
+                    separator = ''
+                    result += [output_line]
+                    output_line = ''
+                else:
+                    separator = ' '
+            if len(output_line) > 0 and output_line[-1] == '\n':
+                x = 0
+            result += [output_line]
+    return result
+
+
+def collect_transcript(game: str) -> list[str]:
+    """Return the text written to the screen between inputs."""
+    builder = ZMachineBuilder(os.path.join(GAMES_DIR, f'{game}.z5'), terminal='headless')
+    adapter = builder.terminal_adapter
+    texts = []
+    commands = iter(COMMANDS[game])
+
+    def next_command():
+        texts.append(adapter.read_output())
+        command = next(commands, None)
+        if command is not None:
+            yield command
+            yield from next_command()
+
+    adapter.open(next_command())
+    builder.start()
+    texts.append(adapter.read_output())
+    return [text for text in texts if text != '']
+
+
+def time_wrap(wrap, texts: list[str], width: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            wrap(text, width, 0)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    texts = []
+    for game in COMMANDS:
+        texts += collect_transcript(game)
+    # One long buffer with many lines, where the old implementation copies the most.
+    texts += [''.join(texts)]
+    wrapper = LineWrapper(args.width)
+    for text in texts:
+        for x in (0, 1, args.width // 2, args.width - 1):
+            assert wrapper.wrap(text, x) == legacy_wrap_lines(text, args.width, x)
+    legacy = time_wrap(legacy_wrap_lines, texts, args.width, args.repeat)
+    # Bypass the cache, so only the wrapping itself is compared.
+    line_wrapper = time_wrap(lambda text, width, x: wrapper._wrap(text, x), texts, args.width, args.repeat)
+    cached = time_wrap(lambda text, width, x: wrapper.wrap(text, x), texts, args.width, args.repeat)
+    total_chars = sum(len(text) for text in texts) * args.repeat
+    print(f"{len(texts)} texts, {total_chars} characters, width {args.width}")
+    print(f"legacy wrap_lines:     {legacy:8.4f}s")
+    print(f"LineWrapper:           {line_wrapper:8.4f}s ({legacy / line_wrapper:.1f}x)")
+    print(f"LineWrapper (cached):  {cached:8.4f}s ({legacy / cached:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
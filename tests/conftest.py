@@ -5,6 +5,7 @@ This module provides common fixtures that can be used across all test modules.
 """
 import pytest
 import os
+import random
 from typing import Protocol, Tuple
 from zmachine.config import ZMachineConfig
 from zmachine.memory import MemoryMap
@@ -28,6 +29,10 @@ except ImportError:
         WHITE = 9
 
 
+# Story file for the integration tests, which are skipped if it isn't there.
+ZORK1 = os.path.join(os.path.dirname(__file__), '..', 'games', 'ZORK1.z5')
+
+
 # ============================================================================
 # Mock Implementations
 # ============================================================================
@@ -47,6 +52,7 @@ class MockTerminalAdapter:
         self.scrollable_height = height
         self.timeout_ms = -1
         self.shutdown_called = False
+        self.update_count = 0
         
     @property
     def height(self) -> int:
@@ -58,6 +64,9 @@ class MockTerminalAdapter:
     
     def refresh(self):
         pass
+
+    def update_screen(self):
+        self.update_count += 1
     
     def set_scrollable_height(self, top: int):
         self.scrollable_height = top
@@ -351,6 +360,7 @@ class MockInterpreter:
         self._stored_value = None
         self._object_table = None 
         self._output = []
+        self._rng = random.Random()
         
         # Initialize globals area (240 bytes = 120 words)
         for i in range(240):
@@ -367,6 +377,10 @@ class MockInterpreter:
             self._object_table = MockObjectTable()
         return self._object_table
     
+    @property
+    def rng(self) -> random.Random:
+        return self._rng
+
     @property
     def pc(self) -> int:
         return self._pc
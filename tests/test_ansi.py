@@ -0,0 +1,208 @@
+"""
+Tests for the ANSI terminal adapter.
+
+The adapter is run on a pseudo-terminal. Keys are typed by writing to the master
+side, and the escape sequences it writes are collected by a mock tty.
+"""
+import os
+import termios
+import pytest
+from zmachine.ansi import AnsiAdapter
+from zmachine.screen import ScreenV3, ScreenV4, ScreenV5
+from zmachine.event import EventManager, EventArgs
+from zmachine.enums import WindowPosition, TextStyle, Color
+
+
+class MockTty:
+    """The slave side of a pseudo-terminal, with the written text kept for the test."""
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.written = []
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def write(self, text: str):
+        self.written.append(text)
+
+    def flush(self):
+        pass
+
+    def read_output(self) -> str:
+        text = ''.join(self.written)
+        self.written.clear()
+        return text
+
+
+@pytest.fixture
+def pty():
+    master_fd, slave_fd = os.openpty()
+    termios.tcsetwinsize(slave_fd, (24, 80))
+    yield master_fd, MockTty(slave_fd)
+    os.close(master_fd)
+    os.close(slave_fd)
+
+
+@pytest.fixture
+def ansi_adapter(pty):
+    _, mock_tty = pty
+    adapter = AnsiAdapter(None, mock_tty, mock_tty)
+    mock_tty.read_output()
+    yield adapter
+    adapter.shutdown()
+
+
+@pytest.mark.unit
+class TestAnsiAdapter:
+    """Test suite for the ANSI terminal adapter."""
+
+    @pytest.mark.unit
+    def test_size_and_terminal_mode(self, pty):
+        """The size should come from the terminal, and the terminal mode should be restored at shutdown."""
+        _, mock_tty = pty
+        original_mode = termios.tcgetattr(mock_tty.fd)
+        adapter = AnsiAdapter(None, mock_tty, mock_tty)
+        assert (adapter.height, adapter.width) == (24, 80)
+        assert termios.tcgetattr(mock_tty.fd)[3] & termios.ICANON == 0
+        adapter.shutdown()
+        assert termios.tcgetattr(mock_tty.fd) == original_mode
+        assert mock_tty.read_output().endswith('\x1b[?1049l')
+
+    @pytest.mark.unit
+    def test_output_is_buffered_until_update(self, ansi_adapter, pty):
+        """Text should be written to the terminal in one piece when the screen is updated."""
+        _, mock_tty = pty
+        ansi_adapter.move_cursor(2, 3)
+        ansi_adapter.write_to_screen("hello")
+        assert mock_tty.written == []
+        ansi_adapter.update_screen()
+        assert mock_tty.written == ['\x1b[3;4Hhello']
+
+    @pytest.mark.unit
+    def test_cursor_is_tracked(self, ansi_adapter):
+        """The cursor should follow the text, including wrapping at the right edge and newlines."""
+        ansi_adapter.move_cursor(5, 75)
+        ansi_adapter.write_to_screen("abcdefgh")
+        assert ansi_adapter.get_coordinates() == (6, 3)
+        ansi_adapter.write_to_screen("\nxy")
+        assert ansi_adapter.get_coordinates() == (7, 2)
+        ansi_adapter.move_cursor(23, 0)
+        ansi_adapter.write_to_screen("bottom\n")
+        assert ansi_adapter.get_coordinates() == (23, 0)
+
+    @pytest.mark.unit
+    def test_styles_and_colors(self, ansi_adapter, pty):
+        """Styles and colors should be combined into one graphic rendition sequence."""
+        _, mock_tty = pty
+        ansi_adapter.set_color(Color.BLUE, Color.YELLOW)
+        ansi_adapter.apply_style_attributes(TextStyle.BOLD | TextStyle.REVERSE)
+        ansi_adapter.update_screen()
+        assert mock_tty.read_output() == '\x1b[0;33;44m\x1b[0;7;1;33;44m'
+
+    @pytest.mark.unit
+    def test_set_scrollable_height_keeps_cursor(self, ansi_adapter, pty):
+        """Setting the scrolling region should put the cursor back where it was."""
+        _, mock_tty = pty
+        ansi_adapter.move_cursor(10, 4)
+        ansi_adapter.set_scrollable_height(3)
+        ansi_adapter.update_screen()
+        assert mock_tty.read_output().endswith('\x1b[4;24r\x1b[11;5H')
+        assert ansi_adapter.get_coordinates() == (10, 4)
+
+    @pytest.mark.unit
+    def test_read_keys(self, ansi_adapter, pty):
+        """Keys typed on the terminal should be read as they are pressed, with escape sequences read whole."""
+        master_fd, _ = pty
+        os.write(master_fd, b'a\x1b[A')
+        assert ansi_adapter.get_input_char() == ord('a')
+        assert ansi_adapter.get_coordinates() == (0, 1)
+        assert ansi_adapter.get_input_char(False) == 27
+        assert ansi_adapter.get_escape_sequence() == [ord('['), ord('A')]
+
+    @pytest.mark.unit
+    def test_read_times_out(self, ansi_adapter):
+        """Reading a key should give up when the timeout passes."""
+        ansi_adapter.set_timeout(10)
+        assert ansi_adapter.get_input_char() == -1
+
+    @pytest.mark.unit
+    def test_read_string_with_backspace(self, ansi_adapter, pty):
+        """A line of input should be read with simple editing."""
+        master_fd, _ = pty
+        os.write(master_fd, b'SAVX\x7fE\r')
+        assert ansi_adapter.get_input_string("File: ", lowercase=True) == "save"
+        assert ansi_adapter.get_coordinates() == (1, 0)
+
+    @pytest.mark.unit
+    def test_current_line_can_be_saved_and_painted(self, ansi_adapter):
+        """Characters on the cursor line should be available to the hotkeys, and painting shouldn't scroll."""
+        ansi_adapter.move_cursor(23, 0)
+        ansi_adapter.apply_style_attributes(TextStyle.BOLD)
+        ansi_adapter.write_to_screen(">look")
+        saved = [ansi_adapter.get_char_at(23, x) for x in range(80)]
+        assert saved[1] == (TextStyle.BOLD << 8) | ord('l')
+        ansi_adapter.erase_window(23, 1)
+        for x, char in enumerate(saved):
+            ansi_adapter.paint_char_at(23, x, char)
+        assert ansi_adapter.get_coordinates() == (23, 79)
+        assert [ansi_adapter.get_char_at(23, x) for x in range(80)] == saved
+
+
+@pytest.mark.unit
+class TestAnsiScreen:
+    """The screen tests, run on the ANSI adapter instead of the mock adapter."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.event_manager = EventManager()
+
+    @pytest.mark.unit
+    def test_status_line_cursor_positioning(self, ansi_adapter, pty):
+        """Status line should save and restore cursor position."""
+        _, mock_tty = pty
+        screen = ScreenV3(ansi_adapter, self.event_manager)
+        ansi_adapter.move_cursor(10, 20)
+        screen.refresh_status_line("West of House", "Score: 0  Moves: 1")
+        assert ansi_adapter.get_coordinates() == (10, 20)
+        ansi_adapter.update_screen()
+        output = mock_tty.read_output()
+        assert "West of House" in output
+        assert "Score: 0  Moves: 1" in output
+
+    @pytest.mark.unit
+    def test_erase_lower_window_moves_cursor_to_bottom_left(self, ansi_adapter):
+        """Erasing lower window should move cursor to bottom-left of lower window (8.7.3.2.1)."""
+        screen = ScreenV4(ansi_adapter, self.event_manager)
+        screen.set_window(WindowPosition.LOWER)
+        screen.erase_window(WindowPosition.LOWER)
+        assert ansi_adapter.get_coordinates() == (screen.height - 1, 0)
+
+    @pytest.mark.unit
+    def test_erase_lower_window_moves_cursor_to_top_left(self, ansi_adapter):
+        """Erasing lower window should move cursor to top-left of lower window (8.7.3.2.1)."""
+        screen = ScreenV5(ansi_adapter, self.event_manager)
+        screen.split_window(5)
+        screen.set_window(WindowPosition.LOWER)
+        screen.erase_window(WindowPosition.LOWER)
+        assert ansi_adapter.get_coordinates() == (5, 0)
+
+    @pytest.mark.unit
+    def test_print_table_advances_rows(self, ansi_adapter):
+        """print_table should print each row at the starting column of the next line."""
+        screen = ScreenV5(ansi_adapter, self.event_manager)
+        screen.split_window(5)
+        screen.set_window(WindowPosition.UPPER)
+        screen.set_cursor(1, 10)
+        screen.print_table(["abc", "def", "ghi"])
+        screen.set_window(WindowPosition.LOWER)
+        assert screen.framebuffer.get_lines(1, 3) == [" " * 10 + row + " " * 67 for row in ("abc", "def", "ghi")]
+        assert ansi_adapter.get_coordinates() == (5, 0)
+
+    @pytest.mark.unit
+    def test_lower_window_text_is_wrapped(self, ansi_adapter):
+        """Lower window text should be wrapped at word boundaries and flushed before input."""
+        screen = ScreenV4(ansi_adapter, self.event_manager)
+        screen.print("word " * 20, True)
+        self.event_manager.pre_read_input.invoke(self, EventArgs())
+        assert ansi_adapter.get_coordinates() == (2, 0)
+        assert ansi_adapter.get_char_at(2, 0) == ord(' ')
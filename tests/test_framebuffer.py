@@ -0,0 +1,131 @@
+"""
+Tests for the upper window framebuffer.
+"""
+import pytest
+from zmachine.framebuffer import Framebuffer, Cell
+from zmachine.screen import ScreenV4, ScreenV5
+from zmachine.event import EventManager, EventArgs
+from zmachine.enums import WindowPosition, TextStyle, Color
+
+
+class RecordingAdapter:
+    """Records the calls made by Framebuffer.flush."""
+    def __init__(self):
+        self.calls = []
+
+    def move_cursor(self, y_pos, x_pos):
+        self.calls.append(('move_cursor', y_pos, x_pos))
+
+    def apply_style_attributes(self, attributes):
+        self.calls.append(('style', attributes))
+
+    def set_color(self, background_color, foreground_color):
+        self.calls.append(('color', background_color, foreground_color))
+
+    def write_to_screen(self, text):
+        self.calls.append(('write', text))
+
+    def writes(self):
+        return [call for call in self.calls if call[0] in ('move_cursor', 'write')]
+
+
+@pytest.mark.unit
+class TestFramebuffer:
+    """Test suite for the framebuffer."""
+
+    @pytest.mark.unit
+    def test_write_returns_cursor(self):
+        """Writes should wrap at the right edge and return the new cursor position."""
+        framebuffer = Framebuffer(3, 5)
+        assert framebuffer.write(0, 3, "abcd", TextStyle.ROMAN, Color.BLACK, Color.WHITE) == (1, 2)
+        assert framebuffer.write(1, 2, "x\ny", TextStyle.ROMAN, Color.BLACK, Color.WHITE) == (2, 1)
+        assert framebuffer.get_lines() == ["   ab", "cdx  ", "y    "]
+        assert framebuffer.get_cell(0, 3) == Cell('a', TextStyle.ROMAN, Color.BLACK, Color.WHITE)
+
+    @pytest.mark.unit
+    def test_flush_sends_only_changed_cells(self):
+        """Only cells that differ from the last flush should be sent."""
+        framebuffer = Framebuffer(2, 10)
+        adapter = RecordingAdapter()
+        framebuffer.write(0, 0, "Score: 10", TextStyle.ROMAN, Color.BLACK, Color.WHITE)
+        framebuffer.flush(adapter)
+        assert adapter.writes() == [('move_cursor', 0, 0), ('write', "Score: 10")]
+        adapter.calls.clear()
+        framebuffer.write(0, 0, "Score: 15", TextStyle.ROMAN, Color.BLACK, Color.WHITE)
+        framebuffer.flush(adapter)
+        assert adapter.writes() == [('move_cursor', 0, 8), ('write', "5")]
+        adapter.calls.clear()
+        framebuffer.flush(adapter)
+        assert adapter.calls == []
+
+    @pytest.mark.unit
+    def test_flush_groups_runs_by_style(self):
+        """A run of changed cells should be split where the style changes."""
+        framebuffer = Framebuffer(1, 10, use_color=True)
+        adapter = RecordingAdapter()
+        framebuffer.write(0, 0, "ab", TextStyle.REVERSE, Color.BLUE, Color.WHITE)
+        framebuffer.write(0, 2, "cd", TextStyle.ROMAN, Color.BLUE, Color.WHITE)
+        framebuffer.flush(adapter)
+        assert adapter.calls == [
+            ('move_cursor', 0, 0), ('style', TextStyle.REVERSE), ('color', Color.BLUE, Color.WHITE), ('write', "ab"),
+            ('move_cursor', 0, 2), ('style', TextStyle.ROMAN), ('color', Color.BLUE, Color.WHITE), ('write', "cd"),
+        ]
+
+    @pytest.mark.unit
+    def test_erase_and_forget(self):
+        """Erased rows are blank on both sides; forgotten rows only send cells written afterwards."""
+        framebuffer = Framebuffer(2, 5)
+        adapter = RecordingAdapter()
+        framebuffer.write(0, 0, "abc", TextStyle.ROMAN, Color.BLACK, Color.WHITE)
+        framebuffer.erase(0, 1)
+        framebuffer.flush(adapter)
+        assert adapter.calls == []
+        framebuffer.forget(1, 1)
+        framebuffer.write(1, 2, " ", TextStyle.ROMAN, Color.BLACK, Color.WHITE)
+        framebuffer.flush(adapter)
+        assert adapter.writes() == [('move_cursor', 1, 2), ('write', " ")]
+
+
+@pytest.mark.unit
+class TestScreenFramebuffer:
+    """Test suite for drawing the upper window through the framebuffer."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.event_manager = EventManager()
+
+    @pytest.mark.unit
+    def test_upper_window_drawn_when_leaving_window(self, mock_terminal_adapter):
+        """Upper window text should reach the terminal when the lower window is selected again."""
+        screen = ScreenV4(mock_terminal_adapter, self.event_manager)
+        screen.split_window(2)
+        screen.set_window(WindowPosition.UPPER)
+        screen.set_cursor(0, 0)
+        screen.print("West of House")
+        assert mock_terminal_adapter.screen_output == []
+        assert mock_terminal_adapter.cursor_pos == (0, 13)
+        screen.set_window(WindowPosition.LOWER)
+        assert mock_terminal_adapter.screen_output == ["West of House"]
+        assert screen.get_upper_window_lines()[0].rstrip() == "West of House"
+
+    @pytest.mark.unit
+    def test_redraw_sends_only_changes(self, mock_terminal_adapter):
+        """Redrawing a status bar should only send the cells that changed."""
+        screen = ScreenV5(mock_terminal_adapter, self.event_manager)
+        screen.split_window(1)
+        for moves in ("Moves: 9", "Moves: 10"):
+            screen.set_window(WindowPosition.UPPER)
+            screen.set_cursor(0, 0)
+            screen.print(moves)
+            screen.set_window(WindowPosition.LOWER)
+        assert mock_terminal_adapter.screen_output == ["Moves: 9", "10"]
+
+    @pytest.mark.unit
+    def test_pre_read_input_flushes(self, mock_terminal_adapter):
+        """Pending upper window changes should be drawn before reading input."""
+        screen = ScreenV4(mock_terminal_adapter, self.event_manager)
+        screen.split_window(1)
+        screen.set_window(WindowPosition.UPPER)
+        screen.print("Time: 9:00")
+        self.event_manager.pre_read_input.invoke(self, EventArgs())
+        assert "Time: 9:00" in mock_terminal_adapter.screen_output
@@ -0,0 +1,120 @@
+"""
+Tests for the headless terminal adapter and screen.
+"""
+import os
+import pytest
+from zmachine.headless import HeadlessAdapter, HeadlessScreen
+from zmachine.builder import ZMachineBuilder
+from zmachine.event import EventManager, EventArgs
+from zmachine.enums import WindowPosition
+from zmachine.error import EndOfInputException
+from tests.conftest import ZORK1
+
+
+@pytest.mark.unit
+class TestHeadlessAdapter:
+    """Test suite for the headless terminal adapter."""
+
+    @pytest.mark.unit
+    def test_fed_input_is_read_and_echoed(self):
+        """Queued input should be returned one character at a time and echoed to the output."""
+        adapter = HeadlessAdapter(None)
+        adapter.feed("hi\n")
+        assert [adapter.get_input_char() for _ in range(3)] == [ord('h'), ord('i'), 10]
+        assert adapter.read_output() == "hi\n"
+        assert adapter.read_output() == ""
+
+    @pytest.mark.unit
+    def test_input_lines_are_read_when_queue_is_empty(self):
+        """Input lines should be read one at a time, flushing the output first."""
+        written = []
+        class Output:
+            def write(self, text):
+                written.append(text)
+            def flush(self):
+                pass
+        adapter = HeadlessAdapter(None)
+        adapter.open(iter(["look", "quit\n"]), Output())
+        adapter.write_to_screen(">")
+        assert adapter.get_input_string("", lowercase=False) == "look"
+        assert written == [">"]
+        assert adapter.get_input_string("", lowercase=False) == "quit"
+
+    @pytest.mark.unit
+    def test_end_of_input_raises(self):
+        """Reading past the end of the input should end the session."""
+        adapter = HeadlessAdapter(None)
+        with pytest.raises(EndOfInputException):
+            adapter.get_input_char()
+
+
+@pytest.mark.unit
+class TestHeadlessScreen:
+    """Test suite for the headless screen."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.event_manager = EventManager()
+        self.adapter = HeadlessAdapter(None, height=10, width=20)
+
+    @pytest.mark.unit
+    def test_lower_window_text_goes_to_output(self):
+        """Lower window text should be passed through without wrapping or paging."""
+        screen = HeadlessScreen(5, self.adapter, self.event_manager)
+        screen.print("x" * 50, True)
+        screen.print("more")
+        assert self.adapter.read_output() == "x" * 50 + "\nmore"
+
+    @pytest.mark.unit
+    def test_upper_window_grid(self):
+        """Upper window text should be written into the character grid at the cursor, wrapping at the right edge."""
+        screen = HeadlessScreen(5, self.adapter, self.event_manager)
+        screen.split_window(2)
+        screen.set_window(WindowPosition.UPPER)
+        screen.set_cursor(1, 3)
+        screen.print("abc")
+        screen.set_cursor(0, 18)
+        screen.print("xyz")
+        screen.set_window(WindowPosition.LOWER)
+        assert screen.get_upper_window_lines() == [" " * 18 + "xy", "z  abc" + " " * 14]
+        assert self.adapter.read_output() == ""
+
+    @pytest.mark.unit
+    def test_status_line(self):
+        """The v3 status line should be kept outside the upper window."""
+        screen = HeadlessScreen(3, self.adapter, self.event_manager)
+        screen.refresh_status_line("Kitchen", "Moves: 1")
+        assert len(screen.status_line) == 20
+        assert screen.status_line.startswith(" Kitchen")
+        assert screen.status_line.endswith("Moves: 1   ")
+
+    @pytest.mark.unit
+    def test_quit_flushes_output(self):
+        """Quitting should write the remaining output to the output file."""
+        written = []
+        class Output:
+            def write(self, text):
+                written.append(text)
+            def flush(self):
+                pass
+        self.adapter.open([], Output())
+        screen = HeadlessScreen(5, self.adapter, self.event_manager)
+        screen.print("goodbye", True)
+        self.event_manager.on_quit.invoke(self, EventArgs())
+        assert written == ["goodbye\n"]
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestHeadlessSession:
+    """Test suite for running a game headless."""
+
+    @pytest.mark.integration
+    def test_run_game_to_end_of_input(self):
+        """A headless session should run the game until the input runs out."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless')
+        builder.terminal_adapter.feed("open mailbox\n")
+        builder.start()
+        output = builder.terminal_adapter.read_output()
+        assert "West of House" in output
+        assert "Opening the small mailbox reveals a leaflet." in output
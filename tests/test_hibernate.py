@@ -0,0 +1,112 @@
+"""
+Tests for hibernating idle sessions and resuming them.
+"""
+import asyncio
+import os
+import pytest
+from zmachine.builder import ZMachineBuilder
+from zmachine.story import StoryImage
+from zmachine.server import ZMachineServer
+from zmachine.hibernate import hibernate, resume, warm_start
+from zmachine.error import HibernateException
+from tests.conftest import ZORK1
+
+
+pytestmark = pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+
+
+def play(builder: ZMachineBuilder, commands: list[str], game=None):
+    if game is None:
+        game = builder.interpreter.run_resumable()
+        next(game)
+    for command in commands:
+        game.send(command)
+    return game, builder.terminal_adapter.read_output()
+
+
+@pytest.mark.integration
+class TestHibernate:
+    """Test suite for hibernating a session."""
+
+    @pytest.mark.integration
+    def test_resumed_session_plays_like_the_original(self):
+        """A session resumed from hibernation should carry on exactly as if it had kept running."""
+        story = StoryImage.load(ZORK1)
+        before = ["open mailbox", "take leaflet", "n", "e", "open window", "enter"]
+        after = ["take all", "w", "take lamp", "move rug", "open trap door", "turn on lamp", "d"]
+        builder = ZMachineBuilder(ZORK1, terminal='headless', story=story, seed=1)
+        game, _ = play(builder, before + after)
+        _, expected = play(builder, ["look"], game)
+
+        builder = ZMachineBuilder(ZORK1, terminal='headless', story=story, seed=1)
+        game, _ = play(builder, before)
+        blob = hibernate(builder)
+        game.close()
+        assert len(blob) < 8192
+        builder = resume(story, blob)
+        game = builder.interpreter.run_resumable()
+        next(game)
+        play(builder, after, game)
+        _, output = play(builder, ["look"], game)
+        assert output == expected
+        assert builder.interpreter.screen.status_line.startswith(" Cellar")
+
+    @pytest.mark.integration
+    def test_only_waiting_sessions_can_hibernate(self):
+        """A session that isn't waiting for input can't be hibernated."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless')
+        with pytest.raises(HibernateException, match="waiting for input"):
+            hibernate(builder)
+
+    @pytest.mark.integration
+    def test_resume_checks_blob(self):
+        """Resuming should fail on data that isn't a hibernated session of the same game."""
+        with pytest.raises(HibernateException, match="Not a hibernated session"):
+            resume(StoryImage.load(ZORK1), b'FORM\x00\x00')
+
+    @pytest.mark.integration
+    def test_warm_start_matches_cold_start(self):
+        """A session cloned from the snapshot should look and play the same as one that booted."""
+        story = StoryImage.load(ZORK1)
+        commands = ["open mailbox", "read leaflet", "s", "e"]
+        cold_builder = ZMachineBuilder(ZORK1, terminal='headless', story=story, seed=2)
+        cold_game, cold_opening = play(cold_builder, [])
+        cold_builder.interpreter.count_instructions = True
+        _, cold_output = play(cold_builder, commands, cold_game)
+        cold_instructions = cold_builder.interpreter.instruction_count
+        warm_start(story)
+        snapshot = story.warm_start
+        assert len(snapshot) > 0
+        builder = warm_start(story)
+        builder.interpreter.rng.seed(2)
+        game, opening = play(builder, [])
+        builder.interpreter.count_instructions = True
+        _, output = play(builder, commands, game)
+        assert story.warm_start is snapshot
+        assert opening == cold_opening
+        assert output == cold_output
+        assert builder.interpreter.instruction_count == cold_instructions
+
+    @pytest.mark.integration
+    def test_server_hibernates_idle_sessions(self, tmp_path):
+        """An idle session should be hibernated to disk, and resumed when the player types."""
+        async def run():
+            server = ZMachineServer(hibernate_after_seconds=0.05, hibernate_dir=str(tmp_path))
+            listener = await server.start_tcp_server(ZORK1)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                await reader.readuntil(b'>')
+                writer.write(b"open mailbox\n")
+                await reader.readuntil(b'>')
+                await asyncio.sleep(0.2)
+                session, = server.sessions.values()
+                assert session.is_hibernating
+                assert len(os.listdir(tmp_path)) == 1
+                writer.write(b"take leaflet\n")
+                output = await reader.readuntil(b'>')
+                assert not session.is_hibernating
+                assert os.listdir(tmp_path) == []
+                writer.close()
+            return output.decode()
+        assert "Taken." in asyncio.run(run())
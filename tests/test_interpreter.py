@@ -144,7 +144,8 @@ def interpreter(test_config, memory_map, mock_screen, mock_input_source,
         input_source=mock_input_source,
         output_manager=mock_output_stream_manager,
         quetzal=Mock(),
-        event_manager=mock_event_manager
+        event_manager=mock_event_manager,
+        object_table=Mock()
     )
     
     # Replace text utils with mock
@@ -43,6 +43,30 @@ class TestMemoryMap:
         with pytest.raises(IllegalWriteException):
             memory_map.write_byte(static_addr, 0xFF)
     
+    @pytest.mark.unit
+    def test_write_bytes(self, memory_map, test_config):
+        """A block write should stop at static memory as a whole, and notify the watchers once."""
+        writes = []
+        memory_map.watch_writes(0x100, 0x110, lambda addr, length: writes.append((addr, length)))
+        memory_map.write_bytes(0xfe, b'abcd')
+        assert memory_map[0xfe:0x102] == b'abcd'
+        assert writes == [(0xfe, 4)]
+        static_addr = test_config.static_memory_base_addr
+        with pytest.raises(IllegalWriteException):
+            memory_map.write_bytes(static_addr - 2, b'xyz')
+        assert memory_map[static_addr - 2:static_addr] != b'xy'
+
+    @pytest.mark.unit
+    def test_write_byte_unwatched(self, memory_map, test_config):
+        """An unwatched write should skip the watchers, but still not write to static memory."""
+        writes = []
+        memory_map.watch_writes(0x100, 0x110, lambda addr, length: writes.append((addr, length)))
+        memory_map.write_byte_unwatched(0x104, 0x1ff)
+        assert memory_map.read_byte(0x104) == 0xff
+        assert writes == []
+        with pytest.raises(IllegalWriteException):
+            memory_map.write_byte_unwatched(test_config.static_memory_base_addr, 0)
+
     @pytest.mark.unit
     def test_read_out_of_bounds_raises(self, memory_map):
         """Reading beyond memory bounds should raise InvalidMemoryException."""
@@ -0,0 +1,357 @@
+"""
+Tests for the object table.
+
+The object tables are built by hand so that both the version 3 and the
+version 4+ layouts are covered.
+"""
+import pytest
+from unittest.mock import Mock
+from zmachine.config import ZMachineConfig
+from zmachine.memory import MemoryMap
+from zmachine.object_table import ObjectTableV3, ObjectTableV4Plus
+from zmachine.error import InvalidArgumentException, InvalidObjectStateException
+
+
+OBJECT_TABLE_ADDR = 0x100
+PROPERTY_TABLES_ADDR = 0x300
+STATIC_MEMORY_ADDR = 0x800
+
+# Object tree used by all tests:
+#   1 (room)
+#   +-- 2
+#   +-- 3
+#       +-- 4
+OBJECT_TREE = {
+    # obj_id: (parent, sibling, child)
+    1: (0, 0, 2),
+    2: (1, 3, 0),
+    3: (1, 0, 4),
+    4: (3, 0, 0),
+}
+
+# Properties for each object, in descending order as required by the standard.
+OBJECT_PROPERTIES = {
+    1: {18: b'\x12\x34', 11: b'\x07', 5: b'\x01\x02\x03\x04'},
+    2: {17: b'\xab\xcd'},
+    3: {},
+    4: {9: b'\x00\x2a', 3: b'\x05'},
+}
+
+OBJECT_ATTRIBUTES = {
+    1: (0, 31),
+    2: (7,),
+    3: (),
+    4: (8, 16),
+}
+
+
+def _property_header(version: int, prop_num: int, data_len: int) -> bytes:
+    if version <= 3:
+        return bytes([((data_len - 1) << 5) | prop_num])
+    if data_len <= 2:
+        return bytes([((data_len - 1) << 6) | prop_num])
+    return bytes([0x80 | prop_num, 0x80 | (data_len & 0x3f)])
+
+
+def build_object_story(version: int) -> bytes:
+    """Build a minimal story file with a populated object table."""
+    data = bytearray(0x1000)
+    data[0] = version
+    data[0x0a:0x0c] = OBJECT_TABLE_ADDR.to_bytes(2, 'big')
+    data[0x0e:0x10] = STATIC_MEMORY_ADDR.to_bytes(2, 'big')
+    defaults_len = 31 if version <= 3 else 63
+    object_bytes = 9 if version <= 3 else 14
+    # Property defaults are the property number, to make them easy to recognize.
+    for prop_id in range(1, defaults_len + 1):
+        addr = OBJECT_TABLE_ADDR + (prop_id - 1) * 2
+        data[addr:addr + 2] = prop_id.to_bytes(2, 'big')
+    first_obj_addr = OBJECT_TABLE_ADDR + defaults_len * 2
+    prop_table_addr = PROPERTY_TABLES_ADDR
+    for obj_id, (parent, sibling, child) in OBJECT_TREE.items():
+        obj_addr = first_obj_addr + (obj_id - 1) * object_bytes
+        attribute_bytes = 4 if version <= 3 else 6
+        attributes = 0
+        for attr in OBJECT_ATTRIBUTES[obj_id]:
+            attributes |= 1 << (attribute_bytes * 8 - 1 - attr)
+        data[obj_addr:obj_addr + attribute_bytes] = attributes.to_bytes(attribute_bytes, 'big')
+        if version <= 3:
+            data[obj_addr + 4:obj_addr + 7] = bytes([parent, sibling, child])
+        else:
+            data[obj_addr + 6:obj_addr + 8] = parent.to_bytes(2, 'big')
+            data[obj_addr + 8:obj_addr + 10] = sibling.to_bytes(2, 'big')
+            data[obj_addr + 10:obj_addr + 12] = child.to_bytes(2, 'big')
+        data[obj_addr + object_bytes - 2:obj_addr + object_bytes] = prop_table_addr.to_bytes(2, 'big')
+        # Object name: a single word ("a" padded with shift characters).
+        table = bytearray([1, 0x98, 0xa5])
+        for prop_num, prop_data in OBJECT_PROPERTIES[obj_id].items():
+            table += _property_header(version, prop_num, len(prop_data)) + prop_data
+        table += b'\x00'
+        data[prop_table_addr:prop_table_addr + len(table)] = table
+        prop_table_addr += len(table)
+    return bytes(data)
+
+
+@pytest.fixture(params=[3, 5], ids=['v3', 'v5'])
+def object_table(request, tmp_path):
+    game_file = tmp_path / f"objects.z{request.param}"
+    game_file.write_bytes(build_object_story(request.param))
+    config = ZMachineConfig.from_game_file(str(game_file))
+    memory_map = MemoryMap(config)
+    if request.param <= 3:
+        return ObjectTableV3(memory_map)
+    return ObjectTableV4Plus(memory_map)
+
+
+@pytest.mark.unit
+class TestObjectProperties:
+    """Test suite for property lookups."""
+
+    @pytest.mark.unit
+    def test_get_property_data(self, object_table):
+        """Properties should be read from the object's property table."""
+        assert object_table.get_property_data(1, 18) == 0x1234
+        assert object_table.get_property_data(1, 11) == 0x07
+        assert object_table.get_property_data(2, 17) == 0xabcd
+        assert object_table.get_property_data(4, 3) == 0x05
+
+    @pytest.mark.unit
+    def test_missing_property_returns_default(self, object_table):
+        """A property the object doesn't have should return the default value."""
+        assert object_table.get_property_data(3, 18) == 18
+        assert object_table.get_property_data(2, 11) == 11
+
+    @pytest.mark.unit
+    def test_get_property_addr_and_len(self, object_table):
+        """Property addresses should point at the property data."""
+        prop_addr = object_table.get_property_addr(1, 5)
+        assert prop_addr is not None
+        assert object_table.get_property_data_len(prop_addr) == 4
+        assert object_table.memory_map[prop_addr:prop_addr + 4] == b'\x01\x02\x03\x04'
+        assert object_table.get_property_addr(1, 6) is None
+
+    @pytest.mark.unit
+    def test_get_next_property_num(self, object_table):
+        """get_next_prop should walk the properties in table order."""
+        assert object_table.get_next_property_num(1, 0) == 18
+        assert object_table.get_next_property_num(1, 18) == 11
+        assert object_table.get_next_property_num(1, 11) == 5
+        assert object_table.get_next_property_num(1, 5) == 0
+        assert object_table.get_next_property_num(3, 0) == 0
+
+    @pytest.mark.unit
+    def test_get_next_property_num_missing_raises(self, object_table):
+        """get_next_prop on a property the object doesn't have is an error."""
+        with pytest.raises(InvalidArgumentException):
+            object_table.get_next_property_num(1, 6)
+
+    @pytest.mark.unit
+    def test_moved_property_table(self, object_table):
+        """Writing an object's property table pointer should be picked up by later lookups."""
+        assert object_table.get_next_property_num(3, 0) == 0
+        pointer_offset = object_table.OBJECT_BYTES - 2
+        pointer = object_table.read_word(object_table.get_obj_addr(1) + pointer_offset)
+        object_table.memory_map.write_word(object_table.get_obj_addr(3) + pointer_offset, pointer)
+        assert object_table.get_next_property_num(3, 0) == 18
+        assert object_table.get_property_data(3, 11) == 0x07
+
+    @pytest.mark.unit
+    def test_set_property_data(self, object_table):
+        """put_prop should update the value seen by later lookups."""
+        object_table.set_property_data(1, 18, 0xbeef)
+        object_table.set_property_data(1, 11, 0x1ff)
+        assert object_table.get_property_data(1, 18) == 0xbeef
+        assert object_table.get_property_data(1, 11) == 0xff
+
+    @pytest.mark.unit
+    def test_set_property_data_invalid(self, object_table):
+        """put_prop on a missing or long property should raise."""
+        with pytest.raises(InvalidObjectStateException):
+            object_table.set_property_data(3, 18, 1)
+        with pytest.raises(InvalidObjectStateException):
+            object_table.set_property_data(1, 5, 1)
+
+    @pytest.mark.unit
+    def test_invalid_property_id_raises(self, object_table):
+        """Property numbers outside the defaults table are invalid."""
+        with pytest.raises(InvalidArgumentException):
+            object_table.get_property_addr(1, 0)
+        with pytest.raises(InvalidArgumentException):
+            object_table.get_property_data(1, 0)
+
+
+@pytest.mark.unit
+class TestObjectTree:
+    """Test suite for the object tree."""
+
+    @pytest.mark.unit
+    def test_object_count(self, object_table):
+        """The object count should stop at the first property table."""
+        first_obj_addr = object_table.OBJECT_TABLE + object_table.PROPERTY_DEFAULTS_LENGTH * 2
+        expected = (PROPERTY_TABLES_ADDR - first_obj_addr) // object_table.OBJECT_BYTES
+        assert object_table.object_count == expected
+
+    @pytest.mark.unit
+    def test_tree_accessors(self, object_table):
+        """Parent, sibling and child should match the object entries."""
+        for obj_id, (parent, sibling, child) in OBJECT_TREE.items():
+            assert object_table.get_object_parent_id(obj_id) == parent
+            assert object_table.get_object_sibling_id(obj_id) == sibling
+            assert object_table.get_object_child_id(obj_id) == child
+
+    @pytest.mark.unit
+    def test_insert_object(self, object_table):
+        """insert_obj should make the object the first child of the new parent."""
+        object_table.insert_object(4, 1)
+        assert object_table.get_object_child_id(1) == 4
+        assert object_table.get_object_sibling_id(4) == 2
+        assert object_table.get_object_parent_id(4) == 1
+        assert object_table.get_object_child_id(3) == 0
+        # The memory map should agree with the accessors.
+        obj_addr = object_table.get_obj_addr(4)
+        read_field = object_table.read_byte if object_table.version <= 3 else object_table.read_word
+        assert read_field(obj_addr + object_table.PARENT_OFFSET) == 1
+        assert read_field(obj_addr + object_table.SIBLING_OFFSET) == 2
+
+    @pytest.mark.unit
+    def test_orphan_middle_sibling(self, object_table):
+        """remove_obj should unlink the object from its sibling chain."""
+        object_table.insert_object(4, 1)
+        object_table.orphan_object(2)
+        assert object_table.get_object_child_id(1) == 4
+        assert object_table.get_object_sibling_id(4) == 3
+        assert object_table.get_object_parent_id(2) == 0
+        assert object_table.get_object_sibling_id(2) == 0
+
+    @pytest.mark.unit
+    def test_direct_memory_writes_are_seen(self, object_table):
+        """Writes to the object entries through the memory map (storeb/storew) should be seen."""
+        obj_addr = object_table.get_obj_addr(2)
+        if object_table.version <= 3:
+            object_table.memory_map.write_byte(obj_addr + object_table.PARENT_OFFSET, 3)
+        else:
+            object_table.memory_map.write_word(obj_addr + object_table.PARENT_OFFSET, 3)
+        assert object_table.get_object_parent_id(2) == 3
+
+    @pytest.mark.unit
+    def test_reset_dynamic_memory_reloads_tree(self, object_table):
+        """Restoring dynamic memory should reload the object tree."""
+        memory_map = object_table.memory_map
+        original = memory_map[:memory_map.static_memory_base_addr]
+        object_table.insert_object(4, 1)
+        memory_map.reset_dynamic_memory(original)
+        for obj_id, (parent, sibling, child) in OBJECT_TREE.items():
+            assert object_table.get_object_parent_id(obj_id) == parent
+            assert object_table.get_object_sibling_id(obj_id) == sibling
+            assert object_table.get_object_child_id(obj_id) == child
+
+
+@pytest.mark.unit
+class TestBulkQueries:
+    """Test suite for the bulk object queries."""
+
+    @staticmethod
+    def _attribute_mask(object_table, obj_id):
+        mask = 0
+        for attr in OBJECT_ATTRIBUTES[obj_id]:
+            mask |= 1 << (object_table.ATTRIBUTE_FLAGS - 1 - attr)
+        return mask
+
+    @pytest.mark.unit
+    def test_get_object_tree(self, object_table):
+        """The tree arrays should match the individual accessors."""
+        parents, siblings, children = object_table.get_object_tree()
+        assert len(parents) == object_table.object_count + 1
+        for obj_id, (parent, sibling, child) in OBJECT_TREE.items():
+            assert (parents[obj_id], siblings[obj_id], children[obj_id]) == (parent, sibling, child)
+
+    @pytest.mark.unit
+    def test_get_attribute_masks(self, object_table):
+        """Each mask should have one bit per attribute, attribute 0 first."""
+        masks = object_table.get_attribute_masks()
+        for obj_id in OBJECT_TREE:
+            assert masks[obj_id] == self._attribute_mask(object_table, obj_id)
+
+    @pytest.mark.unit
+    def test_get_all_properties(self, object_table):
+        """The property mapping should contain the raw property data in table order."""
+        properties = object_table.get_all_properties()
+        for obj_id, expected in OBJECT_PROPERTIES.items():
+            assert properties[obj_id] == expected
+            assert list(properties[obj_id]) == list(expected)
+
+    @pytest.mark.unit
+    def test_get_object_states(self, object_table):
+        """Object states should combine the tree, attributes and properties."""
+        states = object_table.get_object_states()
+        state = states[4]
+        assert (state.parent, state.sibling, state.child) == OBJECT_TREE[4]
+        assert state.attributes == self._attribute_mask(object_table, 4)
+        assert state.properties == OBJECT_PROPERTIES[4]
+
+    @pytest.mark.unit
+    def test_get_changed_objects(self, object_table):
+        """Only objects that changed since the previous call should be returned."""
+        assert len(object_table.get_changed_objects()) == object_table.object_count
+        assert object_table.get_changed_objects() == {}
+        object_table.insert_object(4, 1)
+        object_table.set_attribute_flag(2, 3, True)
+        object_table.set_property_data(1, 18, 0xbeef)
+        changed = object_table.get_changed_objects()
+        # Object 3 loses its child, object 1 gains one and has a new property value.
+        assert set(changed) == {1, 2, 3, 4}
+        assert changed[1].properties[18] == b'\xbe\xef'
+        assert changed[1].child == 4
+        assert object_table.get_changed_objects() == {}
+
+
+@pytest.mark.unit
+class TestAttributes:
+    """Test suite for attribute flags."""
+
+    @pytest.mark.unit
+    def test_get_attribute_flag(self, object_table):
+        """Attribute flags should match the object entries."""
+        for obj_id, attributes in OBJECT_ATTRIBUTES.items():
+            for attr_num in range(object_table.ATTRIBUTE_FLAGS):
+                assert object_table.get_attribute_flag(obj_id, attr_num) == (attr_num in attributes)
+
+    @pytest.mark.unit
+    def test_set_attribute_flag(self, object_table):
+        """Setting and clearing a flag should only change that flag."""
+        last_attr = object_table.ATTRIBUTE_FLAGS - 1
+        object_table.set_attribute_flag(3, last_attr, True)
+        object_table.set_attribute_flag(1, 0, False)
+        assert object_table.get_attribute_flag(3, last_attr)
+        assert not object_table.get_attribute_flag(1, 0)
+        assert object_table.get_attribute_flag(1, 31)
+        assert object_table.get_attributes(3) == 1
+        obj_addr = object_table.get_obj_addr(3)
+        assert object_table.read_byte(obj_addr + last_attr // 8) == 1
+
+    @pytest.mark.unit
+    def test_set_attribute_flag_keeps_tree(self, object_table):
+        """Attribute writes shouldn't reload the shadow copies of the object tree."""
+        object_table.load_object_tree = Mock()
+        object_table.set_attribute_flag(2, 3, True)
+        object_table.load_object_tree.assert_not_called()
+        assert object_table.get_attribute_flag(2, 3)
+
+    @pytest.mark.unit
+    def test_invalid_attribute_raises(self, object_table):
+        """Attribute numbers outside the attribute block are invalid."""
+        with pytest.raises(InvalidArgumentException):
+            object_table.get_attribute_flag(1, object_table.ATTRIBUTE_FLAGS)
+        with pytest.raises(InvalidArgumentException):
+            object_table.set_attribute_flag(1, object_table.ATTRIBUTE_FLAGS, True)
+        with pytest.raises(InvalidArgumentException):
+            object_table.set_attribute_flag(1, -1, True)
+        with pytest.raises(InvalidArgumentException):
+            object_table.find_objects_with_attribute(-1)
+
+    @pytest.mark.unit
+    def test_find_objects_with_attribute(self, object_table):
+        """The batch query should return every object with the attribute set."""
+        assert object_table.find_objects_with_attribute(7) == [2]
+        assert object_table.find_objects_with_attribute(5) == []
+        object_table.set_attribute_flag(4, 7, True)
+        assert object_table.find_objects_with_attribute(7) == [2, 4]
@@ -10,6 +10,7 @@ Z-Machine specification. Each test is based on the corresponding test in czech.i
 Tests call actual opcode functions from opcodes.py using a mock interpreter.
 """
 import pytest
+from tests.conftest import MockInterpreter
 from zmachine.opcodes import (
     op_je, op_jl, op_jg, op_jz,
     op_add, op_sub, op_mul, op_div, op_mod,
@@ -606,6 +607,19 @@ class TestMiscOpcodes:
         assert 1 <= result1 <= 100
         assert 1 <= result2 <= 100
     
+    @pytest.mark.unit
+    def test_random_uses_session_generator(self, mock_interpreter):
+        """Seeding with a negative range should make the sequence repeatable, whatever other sessions do."""
+        other_interpreter = MockInterpreter(version=5)
+        op_random(mock_interpreter, -42 & 0xffff)
+        first = [self._execute_random(mock_interpreter, 100) for _ in range(5)]
+        op_random(mock_interpreter, -42 & 0xffff)
+        second = []
+        for _ in range(5):
+            self._execute_random(other_interpreter, 100)
+            second.append(self._execute_random(mock_interpreter, 100))
+        assert first == second
+
     # Helper methods
     def _execute_test(self, interp, value, mask):
         """Execute test opcode: branch if (value & mask) == mask."""
@@ -3,8 +3,12 @@ Tests for output stream management.
 
 Tests the refactored output stream API from PR #10.
 """
+import errno
+import io
 import pytest
-from zmachine.output import OutputStreamManager, OutputStream, ScreenStream, MemoryStream
+from zmachine.output import OutputStreamManager, OutputStream, ScreenStream, MemoryStream, TranscriptStream, RecordStream
+from zmachine.filewriter import BufferedFileWriter
+from zmachine.event import EventManager, EventArgs, PostReadInputEventArgs
 from zmachine.enums import OutputStreamType
 from zmachine.error import StreamException
 
@@ -219,6 +223,35 @@ class TestMemoryStream:
         # Should be buffered (actual write happens on close)
         assert stream.is_active
     
+    @pytest.mark.unit
+    def test_memory_stream_writes_table_on_close(self, memory_map):
+        """Closing should write the length and the ZSCII text to the table, with newlines as carriage returns."""
+        stream = MemoryStream(memory_map)
+        stream.open(0x100)
+        stream.write("Hello", False)
+        stream.write("\nworld", False)
+        stream.close()
+        assert memory_map.read_word(0x100) == 11
+        assert memory_map[0x102:0x10d] == b'Hello\rworld'
+        assert not stream.is_active
+
+    @pytest.mark.unit
+    def test_memory_stream_nested_tables(self, memory_map):
+        """Each table should only get the text written while it was the innermost open table."""
+        stream = MemoryStream(memory_map)
+        stream.open(0x100)
+        stream.write("outer ", False)
+        stream.open(0x200)
+        stream.write("inner", False)
+        stream.close()
+        stream.write("again", False)
+        stream.close()
+        assert memory_map.read_word(0x200) == 5
+        assert memory_map[0x202:0x207] == b'inner'
+        assert memory_map.read_word(0x100) == 11
+        assert memory_map[0x102:0x10d] == b'outer again'
+        assert stream.buffer_ptr == 0
+
     @pytest.mark.unit
     def test_memory_stream_nested_opens_raises(self, memory_map):
         """Opening too many nested memory streams should raise."""
@@ -235,6 +268,145 @@ class TestMemoryStream:
             stream.open(0x2000)
 
 
+@pytest.mark.unit
+class TestTranscriptStream:
+    """Test suite for TranscriptStream."""
+
+    @pytest.mark.unit
+    def test_transcript_buffers_until_flush(
+        self, memory_map, mock_screen, mock_terminal_adapter, test_config, tmp_path
+    ):
+        """Transcript text should be buffered and written to the file in one piece."""
+        from zmachine.settings import RuntimeSettings
+
+        runtime_settings = RuntimeSettings(memory_map)
+        stream = TranscriptStream(test_config, runtime_settings, mock_screen, mock_terminal_adapter)
+        stream.script_full_path = str(tmp_path / "transcript.txt")
+        stream.open()
+        stream.write("West of House", True)
+        stream.write("You are standing", False)
+        stream.write(" in an open field.", True)
+        assert stream.buffer_ptr == len("West of House\nYou are standing in an open field.\n")
+        stream.flush_buffer()
+        assert stream.buffer_ptr == 0
+        stream.write(">look", True)
+        stream.flush_buffer()
+        # The file is written to disk on the flush interval, or at quit.
+        stream.on_quit_handler(None, EventArgs())
+        with open(stream.script_full_path) as s:
+            assert s.read() == "West of House\nYou are standing in an open field.\n>look\n"
+
+    @pytest.mark.unit
+    def test_transcript_file_stays_open(
+        self, memory_map, mock_screen, mock_terminal_adapter, test_config, tmp_path
+    ):
+        """The transcript file should be opened once, and closed when the stream is closed."""
+        from zmachine.settings import RuntimeSettings
+
+        runtime_settings = RuntimeSettings(memory_map)
+        stream = TranscriptStream(test_config, runtime_settings, mock_screen, mock_terminal_adapter, flush_interval_seconds=0)
+        stream.script_full_path = str(tmp_path / "transcript.txt")
+        stream.open()
+        stream.write("one", True)
+        stream.flush_buffer()
+        writer = stream.writer
+        stream.write("two", True)
+        stream.flush_buffer()
+        assert stream.writer is writer
+        with open(stream.script_full_path) as s:
+            assert s.read() == "one\ntwo\n"
+        stream.close()
+        assert writer.is_closed
+        assert stream.writer is None
+
+
+@pytest.mark.unit
+class TestRecordStream:
+    """Test suite for RecordStream."""
+
+    @pytest.mark.unit
+    def test_commands_are_recorded_until_quit(self, tmp_path):
+        """Commands should be appended to the record file, which is kept open until quit."""
+        record_file = tmp_path / "game.rec"
+        record_file.write_text("---\n")
+        event_manager = EventManager()
+        stream = RecordStream()
+        stream.register_delegates(event_manager)
+        stream.open(str(record_file))
+        writer = stream.writer
+        event_manager.post_read_input.invoke(None, PostReadInputEventArgs(command="look", terminating_char=13))
+        event_manager.post_read_input.invoke(None, PostReadInputEventArgs(command=None, terminating_char=129))
+        assert stream.writer is writer
+        event_manager.on_quit.invoke(None, EventArgs())
+        assert writer.is_closed
+        assert not stream.is_active
+        assert record_file.read_text() == "---\nlook\n[129]\n"
+
+
+@pytest.mark.unit
+class TestBufferedFileWriter:
+    """Test suite for BufferedFileWriter."""
+
+    @pytest.mark.unit
+    def test_text_is_flushed_on_interval(self, tmp_path):
+        """Text should stay in the buffer until the flush interval has passed."""
+        path = tmp_path / "out.txt"
+        writer = BufferedFileWriter(str(path), 'w', flush_interval_seconds=3600)
+        writer.write("buffered")
+        assert path.read_text() == ""
+        writer.flush_interval_seconds = 0
+        writer.write(" and flushed")
+        assert path.read_text() == "buffered and flushed"
+        writer.close()
+
+    @pytest.mark.unit
+    def test_explicit_flush_and_close(self, tmp_path):
+        """flush() and close() should write out the buffer regardless of the interval."""
+        path = tmp_path / "out.txt"
+        writer = BufferedFileWriter(str(path), 'w', flush_interval_seconds=3600)
+        writer.write("a")
+        writer.flush()
+        assert path.read_text() == "a"
+        writer.write("b")
+        writer.close()
+        assert writer.is_closed
+        assert path.read_text() == "ab"
+        writer.close()
+
+    @pytest.mark.unit
+    def test_background_writer(self, tmp_path):
+        """Writes on the background thread should be in order, and done when flushed or closed."""
+        path = tmp_path / "out.txt"
+        writer = BufferedFileWriter(str(path), 'a', flush_interval_seconds=3600, background=True)
+        for i in range(100):
+            writer.write(f"{i}\n")
+        writer.flush()
+        assert path.read_text() == ''.join(f"{i}\n" for i in range(100))
+        writer.write("last\n")
+        writer.close()
+        assert writer.is_closed
+        assert path.read_text().endswith("99\nlast\n")
+
+    @pytest.mark.unit
+    def test_background_write_error(self, tmp_path):
+        """An error writing on the background thread should be raised on the game thread, not hang it."""
+        class FullDisk(io.StringIO):
+            def write(self, text):
+                raise OSError(errno.ENOSPC, "No space left on device")
+
+        writer = BufferedFileWriter(str(tmp_path / "out.txt"), 'a', flush_interval_seconds=3600, background=True)
+        writer._file.close()
+        writer._file = FullDisk()
+        writer.write("lost")
+        with pytest.raises(OSError):
+            writer.flush()
+        assert writer.is_closed
+        with pytest.raises(OSError):
+            writer.write("more")
+        with pytest.raises(OSError):
+            writer.close()
+
+
 @pytest.mark.integration
 class TestOutputStreamIntegration:
     """Integration tests for output stream interactions."""
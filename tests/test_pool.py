@@ -0,0 +1,84 @@
+"""
+Tests for the pre-forked session pool.
+"""
+import os
+import select
+import signal
+import socket
+import pytest
+from zmachine.pool import SessionPool, preload_story
+from tests.conftest import ZORK1
+
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists(ZORK1) or not hasattr(os, 'fork'), reason="Story file or fork not available")
+
+
+def read_until_prompt(connection: socket.socket) -> str:
+    output = b''
+    while not output.endswith(b'>'):
+        data = connection.recv(4096)
+        assert data != b'', "Connection closed before the prompt"
+        output += data
+    return output.decode()
+
+
+@pytest.mark.integration
+class TestSessionPool:
+    """Test suite for the session pool."""
+
+    @pytest.mark.integration
+    def test_preload_fills_caches(self):
+        """Preloading should index the dictionary, decode the opening text and take the warm start snapshot."""
+        story = preload_story(ZORK1)
+        assert len(story.dictionary_index) > 600
+        assert story.warm_start['read']['method'] == 'do_read'
+        assert any("open field west of a white house" in text for text, _ in story.string_cache.values())
+
+    @pytest.mark.integration
+    def test_sessions_are_spread_across_workers(self):
+        """Each connection should go to the least loaded worker, and be played there."""
+        pool = SessionPool([ZORK1], worker_count=2)
+        pool.start()
+        try:
+            clients = []
+            assigned = []
+            for _ in range(4):
+                client, connection = socket.socketpair()
+                assigned.append(pool.assign(connection).pid)
+                clients.append(client)
+            assert len(set(assigned)) == 2
+            assert all(worker.sessions == 2 for worker in pool.workers)
+            for client in clients:
+                assert "There is a small mailbox here." in read_until_prompt(client)
+                client.sendall(b"open mailbox\n")
+                assert "reveals a leaflet" in read_until_prompt(client)
+            clients[0].close()
+            clients[1].close()
+            # Wait for the workers to report the ended sessions.
+            while sum(worker.sessions for worker in pool.workers) > 2:
+                pool.update_loads()
+            for client in clients[2:]:
+                client.close()
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.integration
+    def test_dead_worker_is_replaced(self):
+        """A connection handed to a dead worker should go to another, and the dead worker be replaced."""
+        pool = SessionPool([ZORK1], worker_count=2)
+        pool.start()
+        try:
+            dead = pool.workers[0]
+            os.kill(dead.pid, signal.SIGKILL)
+            # Wait for the worker's end of the control socket to be closed.
+            select.select([dead.control], [], [], 5)
+            client, connection = socket.socketpair()
+            worker = pool.assign(connection)
+            assert worker.pid != dead.pid
+            assert len(pool.workers) == 2
+            assert dead not in pool.workers
+            assert "There is a small mailbox here." in read_until_prompt(client)
+            client.close()
+        finally:
+            pool.shutdown()
@@ -0,0 +1,182 @@
+"""
+Tests for profiling the opcodes an interpreter runs.
+"""
+import os
+import pstats
+import pytest
+from unittest.mock import Mock
+from zmachine.builder import ZMachineBuilder
+from zmachine.profiler import OpcodeProfiler, RoutineProfiler, FORM_LONG, FORM_SHORT, FORM_VARIABLE
+from tests.conftest import ZORK1
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestOpcodeProfiler:
+    """Test suite for the opcode profiler."""
+
+    @pytest.fixture
+    def builder(self):
+        return ZMachineBuilder(ZORK1, terminal='headless', seed=1)
+
+    @pytest.mark.integration
+    def test_attach_and_detach(self, builder):
+        """Profiling should set the instruction hook, run any hook already set inside it, and put it back when detached."""
+        interpreter = builder.interpreter
+        profiler = OpcodeProfiler(interpreter)
+        inner = OpcodeProfiler(interpreter)
+        inner.attach()
+        profiler.attach()
+        assert interpreter.instruction_hook == profiler.run_instruction
+        profiler.run_instruction()
+        assert sum(profiler.counts) == sum(inner.counts) == 1
+        profiler.detach()
+        assert interpreter.instruction_hook == inner.run_instruction
+        inner.detach()
+        assert interpreter.instruction_hook is None
+        assert 'run_instruction' not in vars(interpreter)
+
+    @pytest.mark.integration
+    def test_profile_counts_every_instruction(self, builder):
+        """The profile should be readable while the game runs, and count every instruction."""
+        interpreter = builder.interpreter
+        interpreter.count_instructions = True
+        profiler = OpcodeProfiler(interpreter)
+        profiler.attach()
+        session = interpreter.run_resumable()
+        next(session)
+        session.send("open mailbox")
+        profile = profiler.get_profile()
+        # A read that waits for input isn't in the instruction count until it's resumed.
+        reads, = [stats.count for stats in profile if stats.name == 'READ']
+        assert reads == 2
+        assert sum(stats.count for stats in profile) == interpreter.instruction_count + reads
+        assert [stats.total_ns for stats in profile] == sorted((stats.total_ns for stats in profile), reverse=True)
+        names = {(stats.name, stats.form) for stats in profile}
+        assert ('CALL', FORM_VARIABLE) in names
+        assert ('JZ', FORM_SHORT) in names
+        assert ('JE', FORM_LONG) in names
+        forms = {stats.name: stats.count for stats in profiler.get_totals(lambda s: s.form)}
+        assert sum(forms.values()) == interpreter.instruction_count + reads
+        report = profiler.format_report()
+        assert report.startswith(f"{interpreter.instruction_count + reads} instructions in ")
+        profiler.reset()
+        assert profiler.get_profile() == []
+        session.close()
+
+    @pytest.mark.integration
+    def test_describe(self, builder):
+        """Opcode bytes should be named and classified by form."""
+        profiler = OpcodeProfiler(builder.interpreter)
+        assert profiler.describe(0x14) == ('ADD', FORM_LONG)
+        assert profiler.describe(0x54) == ('ADD', FORM_LONG)
+        assert profiler.describe(0xd4) == ('ADD', FORM_VARIABLE)
+        assert profiler.describe(0xa0) == ('JZ', FORM_SHORT)
+        assert profiler.describe(0xb0) == ('RTRUE', FORM_SHORT)
+        assert profiler.describe(0xe0) == ('CALL', FORM_VARIABLE)
+
+
+@pytest.mark.unit
+class TestRoutineProfilerCounts:
+    """Test suite for attributing instructions to routines, with a stand-in interpreter."""
+
+    @pytest.fixture
+    def interpreter(self):
+        interpreter = Mock()
+        interpreter.version = 3
+        interpreter.instruction_count = 0
+        interpreter.call_stack.frame_ptr = 1
+
+        def do_routine(call_addr, args, routine_type):
+            interpreter.call_stack.frame_ptr += 1
+            interpreter.routine_hook.on_call(call_addr)
+
+        def do_return(retval):
+            interpreter.routine_hook.on_return()
+            interpreter.call_stack.frame_ptr -= 1
+        interpreter.do_routine.side_effect = do_routine
+        interpreter.do_return.side_effect = do_return
+        return interpreter
+
+    @pytest.mark.unit
+    def test_inclusive_and_exclusive_counts(self, interpreter):
+        """Instructions should be counted with and without the callees, and recursion counted once."""
+        profiler = RoutineProfiler(interpreter)
+        profiler.attach()
+
+        def run(count):
+            interpreter.instruction_count += count
+        interpreter.do_routine(0x100, (), 0)
+        run(2)
+        interpreter.do_routine(0x200, (), 0)
+        run(3)
+        interpreter.do_routine(0x200, (), 0)
+        run(4)
+        interpreter.do_return(0)
+        interpreter.do_return(0)
+        run(1)
+        routines, edges = profiler.get_profile()
+        stats = {s.addr: s for s in routines}
+        assert stats[0x100].calls == 1
+        assert (stats[0x100].inclusive_instructions, stats[0x100].exclusive_instructions) == (10, 3)
+        assert stats[0x100].packed_addr == 0x80
+        assert stats[0x200].calls == 2
+        assert (stats[0x200].inclusive_instructions, stats[0x200].exclusive_instructions) == (7, 7)
+        assert {(e.caller, e.callee): e.calls for e in edges} == {(0, 0x100): 1, (0x100, 0x200): 1, (0x200, 0x200): 1}
+        # The open call to 0x100 was counted as far as it had got.
+        interpreter.do_return(0)
+        returned = {s.addr: (s.calls, s.inclusive_instructions, s.exclusive_instructions) for s in profiler.get_profile()[0]}
+        assert returned == {addr: (s.calls, s.inclusive_instructions, s.exclusive_instructions) for addr, s in stats.items()}
+
+    @pytest.mark.unit
+    def test_dropped_frames_are_closed(self, interpreter):
+        """Frames dropped without returning should be closed by the next return below them."""
+        profiler = RoutineProfiler(interpreter)
+        profiler.attach()
+        interpreter.do_routine(0x100, (), 0)
+        interpreter.do_routine(0x200, (), 0)
+        interpreter.call_stack.frame_ptr = 2
+        interpreter.do_return(0)
+        assert profiler._calls == []
+        assert set(profiler.routines) == {0x100, 0x200}
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestRoutineProfiler:
+    """Test suite for the routine profiler."""
+
+    @pytest.mark.integration
+    def test_profile_game(self, tmp_path):
+        """Routines should be counted, labelled and exported while the game runs."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless', seed=1)
+        interpreter = builder.interpreter
+        profiler = RoutineProfiler(interpreter)
+        profiler.attach()
+        session = interpreter.run_resumable()
+        next(session)
+        session.send("open mailbox")
+        routines, edges = profiler.get_profile()
+        assert sum(stats.calls for stats in routines) == sum(edge.calls for edge in edges)
+        assert all(stats.exclusive_instructions <= stats.inclusive_instructions for stats in routines)
+        assert sum(stats.exclusive_instructions for stats in routines) <= interpreter.instruction_count
+        assert any(stats.label == "Opening the" for stats in routines)
+        assert [stats.exclusive_ns for stats in routines] == sorted((s.exclusive_ns for s in routines), reverse=True)
+
+        profiler.write(str(tmp_path / "zork1.prof"))
+        loaded = pstats.Stats(str(tmp_path / "zork1.prof"))
+        assert loaded.total_calls == sum(stats.calls for stats in routines)
+        callgrind = tmp_path / "callgrind.out.zork1"
+        profiler.write(str(callgrind))
+        text = callgrind.read_text()
+        assert text.startswith("# callgrind format")
+        assert text.count("\nfn=(") == len(routines)
+        assert text.count("\ncfn=(") == len([edge for edge in edges if edge.caller != 0])
+        report = tmp_path / "report.txt"
+        profiler.write(str(report))
+        assert report.read_text().startswith(f"{len(routines)} routines")
+
+        profiler.detach()
+        assert interpreter.routine_hook is None
+        session.send("take leaflet")
+        session.close()
@@ -0,0 +1,206 @@
+"""
+Tests for reading playback files and replaying them without a terminal.
+"""
+import os
+import pytest
+from unittest.mock import Mock
+from zmachine.playback import PlaybackReader
+from zmachine.input import PlaybackInputStream
+from zmachine.replay import replay, run_regressions, check_golden, golden_file_path
+from zmachine.error import PlaybackFileException
+from tests.conftest import ZORK1
+
+
+@pytest.mark.unit
+class TestPlaybackReader:
+    """Test suite for the streaming playback reader."""
+
+    def write_recording(self, path, count):
+        path.write_text("# SEED: 7\n---\n" + "".join(f"command {i}\n" for i in range(count)))
+
+    @pytest.mark.unit
+    def test_header_and_commands(self, tmp_path):
+        """The header should be parsed, and blank commands kept as newlines."""
+        path = tmp_path / "game.rec"
+        path.write_text("# GAME: ZORK1.z5\n# SEED: 1234\n---\nopen mailbox\n\n[129]\n")
+        with PlaybackReader(str(path)) as reader:
+            assert reader.game == "ZORK1.z5"
+            assert reader.seed == 1234
+            assert list(reader) == ["open mailbox", "\n", "[129]"]
+
+    @pytest.mark.unit
+    def test_invalid_header_raises(self, tmp_path):
+        """Lines before the separator must be metadata."""
+        path = tmp_path / "game.rec"
+        path.write_text("open mailbox\n---\nlook\n")
+        with pytest.raises(PlaybackFileException, match="Invalid playback file format"):
+            PlaybackReader(str(path))
+
+    @pytest.mark.unit
+    def test_empty_file_raises(self, tmp_path):
+        """A playback file needs at least one command."""
+        path = tmp_path / "game.rec"
+        path.write_text("# SEED: 1\n---\n")
+        with pytest.raises(PlaybackFileException, match="empty"):
+            PlaybackReader(str(path))
+
+    @pytest.mark.unit
+    def test_commands_are_read_lazily(self, tmp_path):
+        """Commands should be read one at a time, and the file closed after the last one."""
+        path = tmp_path / "game.rec"
+        self.write_recording(path, 3)
+        reader = PlaybackReader(str(path))
+        assert reader.seed == 7
+        commands = iter(reader)
+        assert next(commands) == "command 0"
+        assert reader.command_index == 1
+        assert list(commands) == ["command 1", "command 2"]
+        assert reader._file.closed
+
+    @pytest.mark.unit
+    def test_seek_with_index(self, tmp_path):
+        """Seeking should go straight to a command, using an index that is saved next to the recording."""
+        path = tmp_path / "game.rec"
+        self.write_recording(path, 1000)
+        with PlaybackReader(str(path)) as reader:
+            reader.INDEX_STRIDE = 64
+            reader.seek(700)
+            assert next(iter(reader)) == "command 700"
+            assert reader.command_count == 1000
+        index_path = str(path) + PlaybackReader.INDEX_SUFFIX
+        assert os.path.exists(index_path)
+        with PlaybackReader(str(path)) as reader:
+            reader.INDEX_STRIDE = 64
+            reader._build_index = Mock()
+            reader.seek(1000)
+            assert list(reader) == []
+            reader._build_index.assert_not_called()
+        with pytest.raises(PlaybackFileException, match="out of range"):
+            with PlaybackReader(str(path)) as reader:
+                reader.INDEX_STRIDE = 64
+                reader.seek(1001)
+
+    @pytest.mark.unit
+    def test_index_is_rebuilt_when_recording_changes(self, tmp_path):
+        """A stale index should not be used."""
+        path = tmp_path / "game.rec"
+        self.write_recording(path, 10)
+        with PlaybackReader(str(path)) as reader:
+            assert reader.command_count == 10
+        self.write_recording(path, 20)
+        os.utime(path, ns=(0, 0))
+        with PlaybackReader(str(path)) as reader:
+            assert reader.command_count == 20
+            reader.seek(15)
+            assert next(iter(reader)) == "command 15"
+
+    @pytest.mark.unit
+    def test_playback_stream_switches_to_keyboard_after_last_command(self):
+        """The playback stream should read ahead, and select the keyboard after the last command."""
+        input_source = Mock()
+        stream = PlaybackInputStream(Mock(), input_source)
+        stream.open(iter(["look", "[13]"]))
+        text_buffer = [0] * 10
+        stream.read_input(0, text_buffer, Mock(), 0, echo=False)
+        assert text_buffer[:5] == [ord(c) for c in "look"] + [13]
+        input_source.select_keyboard_stream.assert_not_called()
+        text_buffer = [0]
+        stream.read_input(0, text_buffer, Mock(), 0, echo=False)
+        assert text_buffer == [13]
+        input_source.select_keyboard_stream.assert_called_once()
+
+    @pytest.mark.unit
+    def test_abandoned_playback_closes_recording(self, tmp_path):
+        """A recording that stops being played before its last command should be closed."""
+        path = tmp_path / "game.rec"
+        path.write_text("# SEED: 1\n---\nlook\n[x]\nopen mailbox\n")
+        input_source = Mock()
+        reader = PlaybackReader(str(path))
+        stream = PlaybackInputStream(Mock(), input_source)
+        stream.open(reader)
+        stream.read_input(0, [0] * 10, Mock(), 0, echo=False)
+        assert not reader._file.closed
+        # A command that isn't a single character when one is read puts the keyboard back.
+        stream.read_input(0, [0], Mock(), 0, echo=False)
+        input_source.select_keyboard_stream.assert_called_once()
+        assert reader._file.closed
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestReplay:
+    """Test suite for fast replay."""
+
+    @pytest.mark.integration
+    def test_replay_reports_stats_and_final_screen(self, tmp_path):
+        """Replaying should run every command and report the work done."""
+        path = tmp_path / "zork1.rec"
+        path.write_text("# GAME: ZORK1.z5\n# SEED: 42\n---\nopen mailbox\ntake leaflet\nn\n")
+        result = replay(ZORK1, str(path))
+        assert result.turns == 3
+        assert result.instructions > 0
+        assert result.instructions_per_second > 0
+        assert ">OPEN MAILBOX\nOpening the small mailbox reveals a leaflet." in result.transcript
+        assert len(result.screen) == 25
+        assert result.screen[0].startswith(" North of House")
+        assert result.screen[-1].rstrip() == ">"
+
+    @pytest.mark.integration
+    def test_replay_checks_game(self, tmp_path):
+        """A recording of a different game should not be replayed."""
+        path = tmp_path / "zork2.rec"
+        path.write_text("# GAME: ZORK2.z5\n---\nlook\n")
+        with pytest.raises(PlaybackFileException, match="does not match"):
+            replay(ZORK1, str(path))
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestRegressionRunner:
+    """Test suite for replaying recordings in parallel and checking them against golden files."""
+
+    @pytest.mark.integration
+    def test_recordings_are_checked_against_golden_files(self, tmp_path):
+        """Golden files should be written on the first run, and catch a transcript that changes."""
+        games_dir = os.path.dirname(ZORK1)
+        first = tmp_path / "first.rec"
+        first.write_text("# GAME: ZORK1.z5\n# SEED: 1\n---\nopen mailbox\ntake leaflet\n")
+        second = tmp_path / "second.rec"
+        second.write_text("# GAME: ZORK1.z5\n# SEED: 1\n---\nn\n")
+        missing = tmp_path / "missing.rec"
+        missing.write_text("# GAME: NOSUCHGAME.z5\n---\nlook\n")
+        recordings = [str(first), str(second), str(missing)]
+        results = run_regressions(recordings, games_dir=games_dir, jobs=2)
+        assert [result.recording for result in results] == recordings
+        assert results[0].instructions > 0
+        assert results[0].digest != results[1].digest
+        assert results[2].digest is None
+        assert "FileNotFoundError" in results[2].error
+        assert [check_golden(result, None, update=False) for result in results] == ['new', 'new', 'ERROR']
+
+        results = run_regressions(recordings[:2], games_dir=games_dir, jobs=1)
+        assert [check_golden(result, None, update=False) for result in results] == ['ok', 'ok']
+        second.write_text("# GAME: ZORK1.z5\n# SEED: 1\n---\ns\n")
+        result, = run_regressions([str(second)], games_dir=games_dir, jobs=1)
+        assert check_golden(result, None, update=False) == 'FAIL'
+        assert check_golden(result, None, update=True) == 'updated'
+        with open(golden_file_path(str(second), None)) as s:
+            assert s.read().strip() == result.digest
+
+    @pytest.mark.integration
+    def test_crashed_replay_is_an_error(self, tmp_path):
+        """A game that crashes during a replay should be reported, not given a golden file."""
+        with open(ZORK1, 'rb') as s:
+            story = bytearray(s.read())
+        # An unknown opcode at the first instruction.
+        initial_pc = story[6] << 8 | story[7]
+        story[initial_pc] = 0xff
+        story_file = tmp_path / "ZORK1.z5"
+        story_file.write_bytes(story)
+        recording = tmp_path / "crash.rec"
+        recording.write_text("# GAME: ZORK1.z5\n---\nlook\n")
+        result, = run_regressions([str(recording)], str(story_file), jobs=1)
+        assert result.digest is None
+        assert "UnrecognizedOpcodeException" in result.error
+        assert check_golden(result, None, update=False) == 'ERROR'
+        assert not os.path.exists(golden_file_path(str(recording), None))
@@ -0,0 +1,119 @@
+"""
+Tests for running the interpreter as a generator that yields at input.
+"""
+import os
+import pytest
+from unittest.mock import Mock
+from zmachine.builder import ZMachineBuilder
+from zmachine.input import ResumableInputStream
+from zmachine.enums import InputRequest
+from zmachine.error import InputPendingException
+from tests.conftest import ZORK1
+
+
+@pytest.mark.unit
+class TestResumableInputStream:
+    """Test suite for the resumable input stream."""
+
+    @pytest.fixture
+    def stream(self):
+        return ResumableInputStream(Mock(), Mock(), Mock())
+
+    @pytest.mark.unit
+    def test_read_without_input_raises(self, stream):
+        """Reading before input is provided should report what the game is waiting for."""
+        with pytest.raises(InputPendingException) as e:
+            stream.read_input(50, [0], Mock(), 0)
+        assert e.value.request == InputRequest(read_char=True, timeout_ms=50)
+        assert not e.value.flush_output
+
+    @pytest.mark.unit
+    def test_provided_command_is_written_after_prefilled_text(self, stream):
+        """The command should be lowercased and follow any text already in the buffer."""
+        text_buffer = [ord('a'), 0, 0, 0, 0, 0]
+        stream.provide_input("BC\n")
+        stream.read_input(0, text_buffer, Mock(), 0)
+        assert text_buffer == [ord('a'), ord('b'), ord('c'), 13, 0, 0]
+        stream.terminal_adapter.write_to_screen.assert_called_once_with("BC\n")
+        # Input is only used once.
+        with pytest.raises(InputPendingException):
+            stream.read_input(0, text_buffer, Mock(), 0)
+
+    @pytest.mark.unit
+    def test_non_printable_input_is_ignored(self, stream):
+        """Characters that can't be typed at the keyboard should be dropped, not written to the buffer."""
+        text_buffer = [0] * 12
+        stream.provide_input("look caf\u00e9 \u2603\t!\n")
+        stream.read_input(0, text_buffer, Mock(), 0)
+        assert bytearray(text_buffer[:text_buffer.index(13)]).decode() == "look caf !"
+        text_buffer = [0]
+        stream.provide_input("\u00e9")
+        stream.read_input(0, text_buffer, Mock(), 0)
+        assert text_buffer == [13]
+
+    @pytest.mark.unit
+    def test_timeout_calls_interrupt_routine(self, stream):
+        """A timed out read should stop if the interrupt routine returns true, and keep waiting otherwise."""
+        text_buffer = [0] * 5
+        stream.provide_input(None)
+        stream.read_input(10, text_buffer, Mock(return_value=1), 0x100)
+        assert text_buffer[0] == 0
+        stream.provide_input(None)
+        with pytest.raises(InputPendingException) as e:
+            stream.read_input(10, text_buffer, Mock(return_value=0), 0x100)
+        assert e.value.flush_output
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestResumableSession:
+    """Test suite for driving a game through the generator."""
+
+    @pytest.mark.integration
+    def test_game_yields_at_input(self):
+        """The game should run to each read and continue with the command sent back."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless')
+        session = builder.interpreter.run_resumable()
+        assert next(session) == InputRequest(read_char=False, timeout_ms=0)
+        assert "There is a small mailbox here." in builder.terminal_adapter.read_output()
+        assert session.send("open mailbox") == InputRequest(read_char=False, timeout_ms=0)
+        assert "Opening the small mailbox reveals a leaflet." in builder.terminal_adapter.read_output()
+        # Instructions are only counted when asked.
+        assert builder.interpreter.instruction_count == 0
+
+    @pytest.mark.integration
+    def test_non_ascii_command(self):
+        """A command with characters the game can't read should be played without them."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless')
+        session = builder.interpreter.run_resumable()
+        next(session)
+        assert session.send("open mailb\u00f6x") == InputRequest(read_char=False, timeout_ms=0)
+        assert "I don't know the word \"mailbx\"." in builder.terminal_adapter.read_output()
+
+    @pytest.mark.integration
+    def test_file_commands_fail_without_prompting(self):
+        """Save, restore and script can't prompt for a file, so the game should carry on."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless')
+        session = builder.interpreter.run_resumable()
+        next(session)
+        for command in ('save', 'restore'):
+            assert session.send(command) == InputRequest(read_char=False, timeout_ms=0)
+            assert 'Failed.' in builder.terminal_adapter.read_output()
+        assert session.send('script') == InputRequest(read_char=False, timeout_ms=0)
+        assert not builder.interpreter.runtime_settings.transcript_active_flag
+        assert not builder.interpreter.output_manager.transcript_stream.is_active
+
+    @pytest.mark.integration
+    def test_instruction_budget(self):
+        """The generator should yield None each time the instruction budget runs out."""
+        builder = ZMachineBuilder(ZORK1, terminal='headless')
+        interpreter = builder.interpreter
+        interpreter.count_instructions = True
+        session = interpreter.run_resumable(instruction_budget=100)
+        assert next(session) is None
+        assert interpreter.instruction_count == 100
+        request = session.send(None)
+        while request is None:
+            request = next(session)
+        assert isinstance(request, InputRequest)
+        session.close()
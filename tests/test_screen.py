@@ -8,7 +8,7 @@ Critical tests include:
 - Color handling
 """
 import pytest
-from zmachine.screen import BaseScreen, ScreenV3, ScreenV4, ScreenV5, Window
+from zmachine.screen import BaseScreen, ScreenV3, ScreenV4, ScreenV5, Window, LineWrapper
 from zmachine.event import EventManager
 from zmachine.enums import WindowPosition, TextStyle, Color
 from zmachine.constants import DEFAULT_BACKGROUND_COLOR, DEFAULT_FOREGROUND_COLOR
@@ -42,6 +42,16 @@ class TestBaseScreen:
         assert screen.text_buffer_ptr == 0
         assert "test text" in ''.join(mock_terminal_adapter.screen_output)
     
+    @pytest.mark.unit
+    def test_buffer_wraps_from_cursor_column(self, mock_terminal_adapter):
+        """Buffered text should be wrapped from the column the terminal cursor is at."""
+        screen = ScreenV4(mock_terminal_adapter, self.event_manager)
+        screen.buffer_mode = True
+        mock_terminal_adapter.move_cursor(23, 75)
+        screen.print("hello world", False)
+        screen.flush_buffer(screen.lower_window)
+        assert mock_terminal_adapter.screen_output[-2:] == ["hello", "world"]
+
     @pytest.mark.unit
     def test_active_window_id_property(self, mock_terminal_adapter):
         """active_window_id should return correct window."""
@@ -75,6 +85,20 @@ class TestBaseScreen:
         assert "buffered" in output
         assert "direct" in output
 
+    @pytest.mark.unit
+    def test_screen_updated_once_before_input(self, mock_terminal_adapter):
+        """Output should only be written to the terminal when input is read."""
+        from zmachine.event import EventArgs
+        screen = ScreenV4(mock_terminal_adapter, self.event_manager)
+        screen.buffer_mode = False
+        screen.set_window(WindowPosition.UPPER)
+        for i in range(10):
+            screen.print(f"line {i}", True)
+        screen.set_window(WindowPosition.LOWER)
+        assert mock_terminal_adapter.update_count == 0
+        self.event_manager.pre_read_input.invoke(self, EventArgs())
+        assert mock_terminal_adapter.update_count == 1
+
 
 @pytest.mark.unit
 class TestScreenV3:
@@ -422,4 +446,36 @@ class TestWindow:
         window.sync_cursor(3, 7)
         
         assert window.y_cursor == 3
-        assert window.x_cursor == 7
\ No newline at end of file
+        assert window.x_cursor == 7
+
+@pytest.mark.unit
+class TestLineWrapper:
+    """Test suite for word wrapping."""
+
+    @pytest.mark.unit
+    def test_wraps_at_word_boundaries(self):
+        """Lines should break between words, keeping explicit newlines."""
+        wrapper = LineWrapper(10)
+        assert wrapper.wrap("The quick brown fox jumps\nover", 0) == ["The quick\n", "brown fox\n", "jumps\n", "over"]
+
+    @pytest.mark.unit
+    def test_short_line_is_unchanged(self):
+        """Text that fits on the line should be written as is."""
+        wrapper = LineWrapper(10)
+        assert wrapper.wrap("short", 0) == ["short"]
+        assert wrapper.wrap("short", 6) == ["\n", "short"]
+
+    @pytest.mark.unit
+    def test_leading_spaces_are_kept(self):
+        """Indentation should be kept on the first line."""
+        wrapper = LineWrapper(10)
+        # A line that fills the screen width wraps by itself, without a newline.
+        assert wrapper.wrap("  indented text here", 0) == ["  indented", "text here"]
+
+    @pytest.mark.unit
+    def test_cached_result_is_a_copy(self):
+        """Changing a returned list should not change later results."""
+        wrapper = LineWrapper(10)
+        lines = wrapper.wrap("The quick brown fox", 0)
+        lines.append("extra")
+        assert wrapper.wrap("The quick brown fox", 0) == ["The quick\n", "brown fox"]
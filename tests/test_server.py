@@ -0,0 +1,87 @@
+"""
+Tests for hosting many games on an asyncio event loop.
+"""
+import asyncio
+import os
+import pytest
+from zmachine.server import ZMachineServer
+from zmachine.story import StoryImage
+from zmachine.builder import ZMachineBuilder
+from tests.conftest import ZORK1
+
+
+pytestmark = pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+
+
+async def play(port: int, commands: list[str]) -> str:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    output = b''
+    for command in commands:
+        output += await reader.readuntil(b'>')
+        writer.write(command.encode() + b'\n')
+        await writer.drain()
+    writer.write_eof()
+    output += await reader.read()
+    writer.close()
+    return output.decode()
+
+
+@pytest.mark.unit
+class TestStoryImage:
+    """Test suite for sharing a loaded story file."""
+
+    @pytest.mark.unit
+    def test_sessions_share_image_but_not_memory(self):
+        """Each session should start from the shared image, and have its own memory."""
+        story = StoryImage.load(ZORK1)
+        first = ZMachineBuilder(ZORK1, terminal='headless', story=story).interpreter
+        second = ZMachineBuilder(ZORK1, terminal='headless', story=story).interpreter
+        assert first.config is second.config
+        first.memory_map.write_byte(0x100, 0xaa)
+        assert second.memory_map.read_byte(0x100) == story.data[0x100]
+
+
+@pytest.mark.integration
+class TestZMachineServer:
+    """Test suite for the multi-session server."""
+
+    @pytest.mark.integration
+    def test_concurrent_sessions(self):
+        """Sessions should be played independently, from one shared copy of the story."""
+        async def run():
+            server = ZMachineServer(instruction_budget=500)
+            listener = await server.start_tcp_server(ZORK1)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                results = await asyncio.gather(
+                    play(port, ["open mailbox", "take leaflet"]),
+                    play(port, ["n", "e"]),
+                    play(port, ["open mailbox"]))
+            return server, results
+        server, results = asyncio.run(run())
+        assert len(server.stories) == 1
+        assert server.sessions == {}
+        assert ">take leaflet\nTaken." in results[0]
+        assert "Behind House" in results[1]
+        assert "Taken." not in results[2]
+
+    @pytest.mark.integration
+    def test_session_that_fails_to_start(self, monkeypatch, caplog):
+        """A session that can't be built should be logged, close the connection and not be kept."""
+        def fail(story):
+            raise MemoryError("out of memory")
+        monkeypatch.setattr('zmachine.server.warm_start', fail)
+
+        async def run():
+            server = ZMachineServer()
+            listener = await server.start_tcp_server(ZORK1)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                output = await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+            return server, output
+        server, output = asyncio.run(run())
+        assert output == b''
+        assert server.sessions == {}
+        assert "Session 1: out of memory" in caplog.messages
@@ -6,7 +6,12 @@ These are foundational for read/tokenize operations.
 
 Z-character encoding is used to compress text in Z-Machine games.
 """
+import os
 import pytest
+from zmachine.memory import MemoryMap
+from zmachine.story import StoryImage
+from zmachine.text import TextUtils
+from tests.conftest import ZORK1
 
 
 @pytest.mark.unit
@@ -132,6 +137,41 @@ class TestZCharEncoding:
         assert result == [0x46, 0x94, 0xC0, 0xA5]
 
 
+@pytest.mark.integration
+@pytest.mark.skipif(not os.path.exists(ZORK1), reason="Story file not available")
+class TestStoryCaches:
+    """
+    Test the dictionary index and string cache shared by sessions of a story.
+    """
+
+    @pytest.mark.integration
+    def test_dictionary_index_matches_search(self):
+        """Looking up a word in the index should find the same entry as the search."""
+        story = StoryImage.load(ZORK1)
+        memory_map = MemoryMap(story.config, story.data)
+        searched = TextUtils(memory_map)
+        indexed = TextUtils(memory_map, story.dictionary_index, story.string_cache)
+        for word in ["mailbox", "open", "xyzzy", "n", "lamp", ",", "notaword"]:
+            assert indexed.lookup_dictionary(word) == searched.lookup_dictionary(word)
+        assert len(story.dictionary_index) > 0
+
+    @pytest.mark.integration
+    def test_only_static_strings_are_cached(self):
+        """Strings in static memory should be decoded once, and others every time."""
+        story = StoryImage.load(ZORK1)
+        memory_map = MemoryMap(story.config, story.data)
+        text_utils = TextUtils(memory_map, story.dictionary_index, story.string_cache)
+        # Dictionary entries are in static memory, and start with the encoded word.
+        static_addr = text_utils.lookup_dictionary("mailbox")
+        text, end_addr = text_utils.read_string(static_addr)
+        assert (text, end_addr) == ("mailbo", static_addr + 4)
+        assert story.string_cache == {static_addr: (text, end_addr)}
+        dynamic_addr = 0x1000
+        memory_map.write_bytes(dynamic_addr, bytes(text_utils.zscii_encode("lamp")))
+        assert text_utils.read_string(dynamic_addr) == ("lamp", dynamic_addr + 4)
+        assert len(story.string_cache) == 1
+
+
 # TODO: Add tests for:
 # - Abbreviation table lookup
 # - Unicode table (V5+)
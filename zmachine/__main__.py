@@ -1,8 +1,15 @@
+import os
 import sys
 import argparse
 import logging
 from .logging import setup_logging
 from .builder import ZMachineBuilder
+from .headless import HeadlessAdapter
+from .constants import FILE_FLUSH_INTERVAL_SECONDS
+from .playback import PlaybackReader
+from .replay import replay
+from .profiler import OpcodeProfiler, RoutineProfiler
+from .error import PlaybackFileException
 
 
 def main():
@@ -27,12 +34,61 @@ def main():
         action='store_true',
         help='Enable memory access logging'
     )
+    parser.add_argument(
+        '--terminal',
+        choices=['curses', 'ansi', 'headless'],
+        default='curses',
+        help='Terminal to run on; ansi drives the terminal with escape sequences instead of curses, headless reads commands from stdin and writes the game output to stdout'
+    )
+    parser.add_argument(
+        '--flush-interval',
+        type=float,
+        default=FILE_FLUSH_INTERVAL_SECONDS,
+        help='Seconds between writes of the transcript and record files to disk'
+    )
+    parser.add_argument(
+        '--background-writer',
+        action='store_true',
+        help='Write the transcript and record files on a separate thread'
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='FILE',
+        help='Play back a recorded command file from the start of the game'
+    )
+    parser.add_argument(
+        '--fast',
+        action='store_true',
+        help='With --replay, run the commands without a terminal as fast as possible and report the speed'
+    )
+    parser.add_argument(
+        '--transcript',
+        metavar='FILE',
+        help='With --replay --fast, write the game output to a file instead of printing the final screen'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='-',
+        metavar='FILE',
+        help='Count the instructions run and the time spent in each opcode, and write the report to FILE (or stderr) at quit'
+    )
+    parser.add_argument(
+        '--profile-routines',
+        nargs='?',
+        const='-',
+        metavar='FILE',
+        help='Count the calls, instructions and time of each routine and its callers, and write the report to FILE '
+             '(or stderr) at quit; FILE is in pstats format if it ends in .prof, and callgrind format if it starts with callgrind.out'
+    )
     parser.add_argument(
         '--debug',
         action='store_true',
         help='Wait for debugger to attach on port 5678'
     )
     args = parser.parse_args()
+    if args.fast and args.replay is None:
+        parser.error('--fast requires --replay')
     
     if args.debug:
         import debugpy
@@ -59,8 +115,65 @@ def main():
         log_memory=args.log_memory
     )
     
-    builder = ZMachineBuilder(args.story_file)
+    if args.fast:
+        try:
+            result = replay(args.story_file, args.replay,
+                            profile=args.profile is not None, profile_routines=args.profile_routines is not None)
+        except PlaybackFileException as e:
+            parser.error(str(e))
+        if args.transcript is not None:
+            with open(args.transcript, 'w') as s:
+                s.write(result.transcript)
+        else:
+            print('\n'.join(line.rstrip() for line in result.screen))
+        print(result.format_stats(), file=sys.stderr)
+        if result.profile is not None:
+            write_profile(result.profile, args.profile)
+        if result.routine_profile is not None:
+            write_profile(result.routine_profile, args.profile_routines)
+        return
+
+    builder = ZMachineBuilder(
+        args.story_file,
+        terminal=args.terminal,
+        flush_interval_seconds=args.flush_interval,
+        background_writer=args.background_writer
+    )
+    if isinstance(builder.terminal_adapter, HeadlessAdapter):
+        builder.terminal_adapter.open(sys.stdin, sys.stdout)
+    if args.replay is not None:
+        try:
+            playback = PlaybackReader(args.replay)
+        except PlaybackFileException as e:
+            builder.terminal_adapter.shutdown()
+            parser.error(str(e))
+        if playback.game is not None and playback.game != os.path.basename(args.story_file):
+            playback.close()
+            builder.terminal_adapter.shutdown()
+            parser.error("Playback file does not match the current game.")
+        if playback.seed is not None:
+            builder.interpreter.rng.seed(playback.seed)
+        builder.interpreter.input_source.select_playback_stream(playback)
+    profilers: list[tuple[OpcodeProfiler | RoutineProfiler, str]] = []
+    if args.profile is not None:
+        profilers.append((OpcodeProfiler(builder.interpreter), args.profile))
+    if args.profile_routines is not None:
+        profilers.append((RoutineProfiler(builder.interpreter), args.profile_routines))
+    for profiler, _ in profilers:
+        profiler.attach()
     builder.start()
+    # Written after the game quits and the terminal is restored.
+    for profiler, path in profilers:
+        write_profile(profiler, path)
+
+
+def write_profile(profiler: OpcodeProfiler | RoutineProfiler, path: str):
+    if path == '-':
+        print(profiler.format_report(), file=sys.stderr)
+    elif isinstance(profiler, RoutineProfiler):
+        profiler.write(path)
+    else:
+        profiler.write_report(path)
 
 
 if __name__ == '__main__':
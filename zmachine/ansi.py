@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+import atexit
+import select
+import shutil
+import termios
+import tty
+from typing import TextIO
+from .enums import TextStyle, Color
+from .config import ZMachineConfig
+
+
+class AnsiAdapter:
+    """Terminal adapter that drives the terminal with ANSI/VT100 escape sequences.
+    Output is buffered and written in one piece by update_screen(). The cursor
+    position and text style are tracked here, so the terminal is never queried."""
+    ANSI_TEXT_STYLES = {
+        TextStyle.REVERSE: '7',
+        TextStyle.BOLD: '1',
+        TextStyle.ITALIC: '3'
+    }
+
+    ANSI_COLORS = {
+        Color.BLACK: 0,
+        Color.RED: 1,
+        Color.GREEN: 2,
+        Color.YELLOW: 3,
+        Color.BLUE: 4,
+        Color.MAGENTA: 5,
+        Color.CYAN: 6,
+        Color.WHITE: 7
+    }
+
+    # Same batching as the curses adapter.
+    UPDATE_INTERVAL_SECONDS = 0.05
+    # How long to wait for the rest of an escape sequence after the escape key.
+    ESCAPE_DELAY_SECONDS = 0.05
+
+    def __init__(self, config: ZMachineConfig, input_file: TextIO = sys.stdin, output_file: TextIO = sys.stdout):
+        self.config = config
+        self.input_fd = input_file.fileno()
+        self.output_file = output_file
+        try:
+            self._width, self._height = os.get_terminal_size(output_file.fileno())
+        except OSError:
+            self._width, self._height = 0, 0
+        if self._width == 0 or self._height == 0:
+            # The terminal doesn't know its size; use $COLUMNS and $LINES like curses does.
+            self._width, self._height = shutil.get_terminal_size((80, 24))
+        self._output: list[str] = []
+        self._y_cursor = 0
+        self._x_cursor = 0
+        self._style_attributes = 0
+        self._colors: tuple[int, int] | None = None
+        # Characters on the cursor's line, as (style << 8) | char, for get_char_at.
+        self._line: list[int] = [ord(' ')] * self._width
+        self._timeout_ms = 0
+        self._pending_update = False
+        self._last_update = time.monotonic()
+        self._saved_tty_attributes = termios.tcgetattr(self.input_fd)
+        self._is_shut_down = False
+        self._initialize_terminal()
+        atexit.register(self.shutdown)
+
+    def _initialize_terminal(self):
+        # Like curses cbreak mode: keys are read as they are pressed, without echo,
+        # and Ctrl-C still works.
+        tty.setcbreak(self.input_fd)
+        # Switch to the alternate screen and clear it.
+        self._output.append('\x1b[?1049h\x1b[0m\x1b[2J\x1b[H')
+        self.update_screen()
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    def refresh(self):
+        self._pending_update = True
+        if time.monotonic() - self._last_update >= self.UPDATE_INTERVAL_SECONDS:
+            self.update_screen()
+
+    def update_screen(self):
+        if len(self._output) > 0:
+            self.output_file.write(''.join(self._output))
+            self.output_file.flush()
+            self._output.clear()
+        self._pending_update = False
+        self._last_update = time.monotonic()
+
+    def write_to_screen(self, text: str):
+        for line_num, line in enumerate(text.split('\n')):
+            if line_num > 0:
+                # Like curses, a newline clears the rest of the line.
+                self._output.append('\x1b[K')
+                self._next_line()
+            while len(line) > 0:
+                chunk = line[:self._width - self._x_cursor]
+                line = line[len(chunk):]
+                self._output.append(chunk)
+                style = self._style_attributes << 8
+                self._line[self._x_cursor:self._x_cursor + len(chunk)] = [style | ord(c) for c in chunk]
+                self._x_cursor += len(chunk)
+                if self._x_cursor >= self._width:
+                    # Move to the next line explicitly, so the cursor doesn't depend on
+                    # how the terminal handles writing to the last column.
+                    self._next_line()
+
+    def _next_line(self):
+        self._output.append('\r\n')
+        if self._y_cursor < self._height - 1:
+            self._y_cursor += 1
+        self._x_cursor = 0
+        self._line = [ord(' ')] * self._width
+
+    def get_input_char(self, echo: bool = True) -> int:
+        self.update_screen()
+        timeout = None if self._timeout_ms == 0 else self._timeout_ms / 1000
+        c = self._read_byte(timeout)
+        if echo:
+            if 32 <= c <= 126:
+                self.write_to_screen(chr(c))
+            if c in (10, 13):
+                self.write_to_screen('\n')
+        return c
+
+    def get_escape_sequence(self) -> list[int]:
+        escape_sequence = []
+        while (c := self._read_byte(self.ESCAPE_DELAY_SECONDS)) != -1:
+            escape_sequence += [c]
+        return escape_sequence
+
+    def get_input_string(self, prompt: str, lowercase: bool) -> str:
+        if len(prompt) > 0:
+            self.write_to_screen(prompt)
+        chars: list[str] = []
+        while (c := self.get_input_char(False)) not in (10, 13):
+            if c in (8, 127):
+                if len(chars) > 0:
+                    chars.pop()
+                    self.move_cursor(self._y_cursor, self._x_cursor - 1)
+                    self.clear_to_eol()
+            elif 32 <= c <= 126:
+                chars += [chr(c)]
+                self.write_to_screen(chr(c))
+        self.write_to_screen('\n')
+        response = ''.join(chars)
+        return response.lower() if lowercase else response
+
+    def _read_byte(self, timeout: float | None) -> int:
+        ready, _, _ = select.select([self.input_fd], [], [], timeout)
+        if len(ready) == 0:
+            return -1
+        data = os.read(self.input_fd, 1)
+        if len(data) == 0:
+            return -1
+        return data[0]
+
+    def set_timeout(self, timeout_ms: int):
+        self._timeout_ms = timeout_ms
+
+    def get_coordinates(self) -> tuple[int, int]:
+        return self._y_cursor, self._x_cursor
+
+    def move_cursor(self, y_pos: int, x_pos: int):
+        if y_pos != self._y_cursor:
+            self._line = [ord(' ')] * self._width
+        self._y_cursor, self._x_cursor = y_pos, x_pos
+        self._output.append(f'\x1b[{y_pos + 1};{x_pos + 1}H')
+
+    def get_char_at(self, y_pos: int, x_pos: int) -> int:
+        # Only the cursor's line is kept, which is all the hotkeys need.
+        if y_pos != self._y_cursor:
+            return ord(' ')
+        return self._line[x_pos]
+
+    def paint_char_at(self, y_pos: int, x_pos: int, char_and_attr: int):
+        ch, attr = char_and_attr & 0xFF, char_and_attr >> 8
+        style_attributes = self._style_attributes
+        self.move_cursor(y_pos, x_pos)
+        self.apply_style_attributes(attr)
+        # Written directly rather than with write_to_screen, so painting the last column doesn't scroll.
+        self._output.append(chr(ch))
+        self._line[x_pos] = char_and_attr
+        self.apply_style_attributes(style_attributes)
+        self.move_cursor(y_pos, min(x_pos + 1, self._width - 1))
+
+    def erase_screen(self):
+        self._output.append('\x1b[2J\x1b[H')
+        self._y_cursor, self._x_cursor = 0, 0
+        self._line = [ord(' ')] * self._width
+
+    def erase_window(self, top: int, height: int):
+        y_cursor, x_cursor = self._y_cursor, self._x_cursor
+        for y in range(top, top + height):
+            self._output.append(f'\x1b[{y + 1};1H\x1b[2K')
+        self.move_cursor(y_cursor, x_cursor)
+        if top <= y_cursor < top + height:
+            self._line = [ord(' ')] * self._width
+
+    def clear_to_eol(self):
+        self._output.append('\x1b[K')
+        self._line[self._x_cursor:] = [ord(' ')] * (self._width - self._x_cursor)
+
+    def apply_style_attributes(self, attributes: int):
+        self._style_attributes = attributes
+        self._apply_graphic_rendition()
+
+    def set_color(self, background_color: int, foreground_color: int):
+        self._colors = (background_color, foreground_color)
+        self._apply_graphic_rendition()
+
+    def _apply_graphic_rendition(self):
+        params = ['0']
+        params += [v for k, v in self.ANSI_TEXT_STYLES.items() if self._style_attributes & k == k]
+        if self._colors is not None:
+            background_color, foreground_color = self._colors
+            params += [f'{30 + self.ANSI_COLORS[Color(foreground_color)]}', f'{40 + self.ANSI_COLORS[Color(background_color)]}']
+        self._output.append(f'\x1b[{";".join(params)}m')
+
+    def set_scrollable_height(self, top: int):
+        # A scrolling region needs at least two lines.
+        if top >= self._height - 1:
+            return
+        # Setting the scrolling region moves the cursor home, so put it back afterwards.
+        self._output.append(f'\x1b[{top + 1};{self._height}r\x1b[{self._y_cursor + 1};{self._x_cursor + 1}H')
+
+    def sound_effect(self, sound_type: int):
+        if sound_type == 1:
+            self._output.append('\a')
+
+    def shutdown(self):
+        if self._is_shut_down:
+            return
+        self._is_shut_down = True
+        self._output.append('\x1b[0m\x1b[r\x1b[?1049l')
+        self.update_screen()
+        termios.tcsetattr(self.input_fd, termios.TCSADRAIN, self._saved_tty_attributes)
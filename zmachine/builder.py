@@ -1,30 +1,47 @@
+from random import Random
 from .screen import *
 from .curses import CursesAdapter
+from .headless import HeadlessAdapter, HeadlessScreen
 from .memory import MemoryMap
+from .object_table import ObjectTableV3, ObjectTableV4Plus
 from .event import EventManager
 from .input import InputStreamManager
 from .output import OutputStreamManager
 from .hotkey import HotkeyHandler
-from .protocol import ITerminalAdapter, IScreen
+from .protocol import ITerminalAdapter, IScreen, IObjectTable
 from .quetzal import Quetzal
 from .interpreter import ZMachineInterpreter
+from .text import TextUtils
 from .config import ZMachineConfig
 from .settings import RuntimeSettings
-from .constants import INTERPRETER_NUMBER, INTERPRETER_REVISION
+from .story import StoryImage
+from .constants import INTERPRETER_NUMBER, INTERPRETER_REVISION, FILE_FLUSH_INTERVAL_SECONDS
 
 
 class ZMachineBuilder:
-    def __init__(self, game_file: str):
-        config = ZMachineConfig.from_game_file(game_file)
+    def __init__(self,
+                 game_file: str,
+                 terminal: str = 'curses',
+                 flush_interval_seconds: float = FILE_FLUSH_INTERVAL_SECONDS,
+                 background_writer: bool = False,
+                 story: StoryImage | None = None,
+                 seed: int | None = None):
+        if story is None:
+            story = StoryImage.load(game_file)
+        config = story.config
         event_manager = EventManager()
-        memory_map = MemoryMap(config)
+        rng = Random(seed)
+        memory_map = MemoryMap(config, story.data)
         runtime_settings = RuntimeSettings(memory_map)
-        terminal_adapter = CursesAdapter(config)
+        object_table = self._initialize_object_table(config.version, memory_map)
+        terminal_adapter = self._initialize_terminal_adapter(terminal, config)
         screen = self._initialize_screen(config.version, terminal_adapter, event_manager)
         quetzal = Quetzal(memory_map, terminal_adapter)
         self._initialize_header(memory_map, terminal_adapter, config.version)
-        output_stream_manager = OutputStreamManager(screen, memory_map, terminal_adapter, config, runtime_settings, event_manager)
-        hotkey_handler = HotkeyHandler(config, runtime_settings, terminal_adapter, output_stream_manager)
+        output_stream_manager = OutputStreamManager(
+            screen, memory_map, terminal_adapter, config, runtime_settings, event_manager,
+            flush_interval_seconds, background_writer)
+        hotkey_handler = HotkeyHandler(config, runtime_settings, terminal_adapter, output_stream_manager, rng)
         input_stream_manager = InputStreamManager(screen, terminal_adapter, hotkey_handler, event_manager, config)
         self.interpreter = ZMachineInterpreter(
             memory_map, 
@@ -34,11 +51,30 @@ class ZMachineBuilder:
             input_stream_manager, 
             output_stream_manager,
             quetzal, 
-            event_manager
+            event_manager,
+            object_table,
+            text_utils=TextUtils(memory_map, story.dictionary_index, story.string_cache),
+            rng=rng
             )
+        self.terminal_adapter = terminal_adapter
+        self.story = story
+
+    @staticmethod
+    def _initialize_terminal_adapter(terminal: str, config: ZMachineConfig) -> ITerminalAdapter:
+        if terminal == 'curses':
+            return CursesAdapter(config)
+        if terminal == 'ansi':
+            # Imported here, as it needs termios and tty, which are only available on POSIX systems.
+            from .ansi import AnsiAdapter
+            return AnsiAdapter(config)
+        if terminal == 'headless':
+            return HeadlessAdapter(config)
+        raise Exception(f"Unrecognized terminal: {terminal}")
 
     @staticmethod
     def _initialize_screen(version: int, terminal_adapter: ITerminalAdapter, event_manager: EventManager) -> IScreen:
+        if isinstance(terminal_adapter, HeadlessAdapter):
+            return HeadlessScreen(version, terminal_adapter, event_manager)
         if version == 3:
             return ScreenV3(terminal_adapter, event_manager)
         if version == 4:
@@ -46,6 +82,12 @@ class ZMachineBuilder:
         if version == 5:
             return ScreenV5(terminal_adapter, event_manager)
         raise Exception("Unrecognized configuration")
+
+    @staticmethod
+    def _initialize_object_table(version: int, memory_map: MemoryMap) -> IObjectTable:
+        if version <= 3:
+            return ObjectTableV3(memory_map)
+        return ObjectTableV4Plus(memory_map)
     
     def _initialize_header(self,
                            memory_map: MemoryMap,
@@ -41,6 +41,11 @@ class ZMachineConfig:
     def from_game_file(cls, game_file: str) -> 'ZMachineConfig':
         with open(game_file, 'rb') as s:
             game_data = s.read()
+        return cls.from_story_data(game_file, game_data)
+
+    @classmethod
+    def from_story_data(cls, game_file: str, game_data: bytes) -> 'ZMachineConfig':
+        """Read the configuration from the contents of a game file that has already been loaded."""
         version = game_data[0]
         if version not in SUPPORTED_VERSIONS:
             if 0 < version <= 6:
@@ -19,4 +19,11 @@ DEFAULT_BACKGROUND_COLOR: Final[Color] = Color.BLACK
 IFF_HEADER: Final[bytearray] = bytearray('FORM'.encode('UTF-8'))
 IFZS_ID: Final[bytearray] = bytearray('IFZS'.encode('UTF-8'))
 
-ESCAPE_CHAR: Final[int] = 27
\ No newline at end of file
+ESCAPE_CHAR: Final[int] = 27
+
+# Transcript and record files
+FILE_BUFFER_SIZE: Final[int] = 64 * 1024
+FILE_FLUSH_INTERVAL_SECONDS: Final[float] = 1.0
+
+# Multi-session server
+DEFAULT_INSTRUCTION_BUDGET: Final[int] = 10_000
@@ -1,5 +1,6 @@
 import curses
 import atexit
+import time
 from .enums import TextStyle, Color
 from .config import ZMachineConfig
 
@@ -24,12 +25,18 @@ class CursesAdapter:
     }
     CURSES_COLORS = {v: k for k, v in COLORS.items()}
 
+    # Screen updates are batched. refresh() only marks the screen as changed, and the
+    # terminal is updated by update_screen(), or by refresh() once the interval has passed.
+    UPDATE_INTERVAL_SECONDS = 0.05
+
     def __init__(self, config: ZMachineConfig):
         super().__init__()
         self.main_screen = curses.initscr()
         self.color_pairs = [[0] * 10 for _ in range(10)]
         self.color_pair_index = 1
         self.config = config
+        self._pending_update = False
+        self._last_update = time.monotonic()
         self._initialize_curses()
         atexit.register(self.shutdown)
 
@@ -52,11 +59,19 @@ class CursesAdapter:
         return curses.COLS
 
     def refresh(self):
-        self.main_screen.refresh()
+        self._pending_update = True
+        if time.monotonic() - self._last_update >= self.UPDATE_INTERVAL_SECONDS:
+            self.update_screen()
+
+    def update_screen(self):
+        if self._pending_update:
+            self.main_screen.noutrefresh()
+            curses.doupdate()
+            self._pending_update = False
+        self._last_update = time.monotonic()
 
     def write_to_screen(self, text: str):
         self.main_screen.addstr(text)
-        self.main_screen.noutrefresh()
 
     def get_input_char(self, echo: bool = True) -> int:
         c = self.main_screen.getch()
@@ -58,6 +58,11 @@ class TerminalMapping(NamedTuple):
     escape_sequence: tuple[int, ...]
     zscii_char: int
 
+class InputRequest(NamedTuple):
+    """Input the game is waiting for when running in resumable mode."""
+    read_char: bool
+    timeout_ms: int
+
 class TerminalEscape(Enum):
     CURSOR_UP = TerminalMapping((91, 65), Cursor.UP)
     CURSOR_DOWN = TerminalMapping((91, 66), Cursor.DOWN)
@@ -1,3 +1,4 @@
+from typing import Callable
 from .logging import error_logger as logger
 
 class ZMachineException(Exception):
@@ -53,3 +54,32 @@ class StreamException(ZMachineException):
 class VariableOutOfRangeException(ZMachineException):
     def __init__(self, varnum: int):
         super().__init__(f"Variable reference out of range: {varnum}")
+
+
+class EndOfInputException(ZMachineException):
+    def __init__(self):
+        # Running out of scripted input is how a headless session normally ends,
+        # so this isn't logged as an error.
+        Exception.__init__(self, "End of input")
+
+
+class PlaybackFileException(ZMachineException):
+    def __init__(self, message):
+        # Bad playback files are reported to the player, not logged as errors.
+        Exception.__init__(self, message)
+
+
+class InputPendingException(ZMachineException):
+    """Raised in resumable mode when the game reads input that hasn't been provided yet.
+    resume is set by the read opcode, to run it again once the input is available."""
+    def __init__(self, request, flush_output: bool = False):
+        # Waiting for input is normal control flow, not an error.
+        Exception.__init__(self, "Input pending")
+        self.request = request
+        self.flush_output = flush_output
+        self.resume: Callable[..., None] | None = None
+
+
+class HibernateException(ZMachineException):
+    """Raised when a session can't be hibernated or resumed."""
+    pass
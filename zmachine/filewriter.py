@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from .constants import FILE_BUFFER_SIZE, FILE_FLUSH_INTERVAL_SECONDS
+
+
+class BufferedFileWriter:
+    """Text file that is kept open for as long as it's being written to.
+    Writes go to a large buffer, which is flushed to the file once the flush interval
+    has passed since the last flush, and when the writer is flushed or closed.
+    With background=True, the file is written on a separate thread so that a slow
+    disk doesn't hold up the game."""
+    def __init__(self,
+                 path: str,
+                 mode: str = 'a',
+                 flush_interval_seconds: float = FILE_FLUSH_INTERVAL_SECONDS,
+                 background: bool = False):
+        self.path = path
+        self.flush_interval_seconds = flush_interval_seconds
+        self._file = open(path, mode, buffering=FILE_BUFFER_SIZE)
+        self._last_flush = time.monotonic()
+        self._is_dirty = False
+        # Writes for the background thread. Only used when there is one.
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        # The error that stopped the background thread, raised again on the game thread.
+        self._error: Exception | None = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name=f'BufferedFileWriter({path})', daemon=True)
+            self._thread.start()
+
+    @property
+    def is_closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, text: str):
+        if self._thread is not None:
+            self._raise_error()
+            self._queue.put(text)
+        else:
+            self._write(text)
+
+    def flush(self):
+        """Write the buffered text to the file. On the background thread, wait until it's done."""
+        if self._thread is not None:
+            done = threading.Event()
+            self._queue.put(done)
+            # Once the thread has failed, it may not be there to set the event.
+            if self._error is None:
+                done.wait()
+            self._raise_error()
+        else:
+            self._flush()
+
+    def close(self):
+        if not self.is_closed:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+            else:
+                self._file.close()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _write(self, text: str):
+        self._file.write(text)
+        self._is_dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval_seconds:
+            self._flush()
+
+    def _flush(self):
+        if self._is_dirty:
+            self._file.flush()
+            self._is_dirty = False
+        self._last_flush = time.monotonic()
+
+    def _run(self):
+        # Without an interval, every write is flushed and the thread only waits for writes.
+        timeout = self.flush_interval_seconds if self.flush_interval_seconds > 0 else None
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._flush()
+                    continue
+                if item is None:
+                    break
+                if isinstance(item, threading.Event):
+                    self._flush()
+                    item.set()
+                else:
+                    self._write(item)
+        except Exception as e:
+            self._error = e
+        finally:
+            try:
+                self._file.close()
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+            # Nothing more will be written, so don't leave a flush waiting.
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
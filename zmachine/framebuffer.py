@@ -0,0 +1,118 @@
+from typing import NamedTuple
+from .enums import TextStyle
+from .protocol import ITerminalAdapter
+from .constants import DEFAULT_BACKGROUND_COLOR, DEFAULT_FOREGROUND_COLOR
+
+
+class Cell(NamedTuple):
+    char: str
+    style: int
+    background_color: int
+    foreground_color: int
+
+
+BLANK_CELL = Cell(' ', TextStyle.ROMAN, DEFAULT_BACKGROUND_COLOR, DEFAULT_FOREGROUND_COLOR)
+# Placeholder for cells whose contents on the terminal aren't known, e.g. rows that
+# were part of the lower window. They are left alone until something is written to them.
+UNKNOWN_CELL = Cell(' ', -1, 0, 0)
+
+
+class Framebuffer:
+    """In-memory copy of the upper window as a grid of cells.
+    Writes only change the grid. flush() sends the cells that changed since the
+    last flush to the terminal, grouped into runs with the same style and colors."""
+    def __init__(self, height: int, width: int, use_color: bool = False):
+        self.height = height
+        self.width = width
+        self.use_color = use_color
+        self._cells: list[list[Cell]] = [[BLANK_CELL] * width for _ in range(height)]
+        # The cells as last sent to the terminal.
+        self._shown: list[list[Cell]] = [[BLANK_CELL] * width for _ in range(height)]
+        self._dirty_rows: set[int] = set()
+
+    @property
+    def is_dirty(self) -> bool:
+        return len(self._dirty_rows) > 0
+
+    def write(self, y_pos: int, x_pos: int, text: str, style: int, background_color: int, foreground_color: int) -> tuple[int, int]:
+        """Write text at the given position, wrapping at the right edge like the terminal does.
+        Returns the cursor position after the text."""
+        for line_num, line in enumerate(text.split("\n")):
+            if line_num > 0:
+                y_pos += 1
+                x_pos = 0
+            while len(line) > 0 and y_pos < self.height:
+                if x_pos >= self.width:
+                    y_pos += 1
+                    x_pos = 0
+                    continue
+                chunk = line[:self.width - x_pos]
+                line = line[len(chunk):]
+                self._cells[y_pos][x_pos:x_pos + len(chunk)] = [
+                    Cell(c, style, background_color, foreground_color) for c in chunk
+                ]
+                self._dirty_rows.add(y_pos)
+                x_pos += len(chunk)
+        if x_pos >= self.width:
+            y_pos, x_pos = y_pos + 1, 0
+        return y_pos, x_pos
+
+    def erase(self, top: int, height: int):
+        """Mark rows as erased. The terminal is expected to erase them as well."""
+        for y in range(max(top, 0), min(top + height, self.height)):
+            self._cells[y] = [BLANK_CELL] * self.width
+            self._shown[y] = [BLANK_CELL] * self.width
+            self._dirty_rows.discard(y)
+
+    def forget(self, top: int, height: int):
+        """Stop tracking the given rows, e.g. when they are no longer part of the upper window."""
+        for y in range(max(top, 0), min(top + height, self.height)):
+            self._cells[y] = [UNKNOWN_CELL] * self.width
+            self._shown[y] = [UNKNOWN_CELL] * self.width
+            self._dirty_rows.discard(y)
+
+    def get_cell(self, y_pos: int, x_pos: int) -> Cell:
+        return self._cells[y_pos][x_pos]
+
+    def get_rows(self) -> list[list[Cell]]:
+        """Return a copy of the grid."""
+        return [row[:] for row in self._cells]
+
+    def set_rows(self, rows: list[list[Cell]]):
+        """Replace the grid, e.g. when restoring a hibernated session. All rows are flushed again."""
+        self._cells = [row[:] for row in rows]
+        self._dirty_rows = set(range(self.height))
+
+    def get_lines(self, top: int = 0, height: int | None = None) -> list[str]:
+        """Return the text of the given rows, one string per row."""
+        if height is None:
+            height = self.height - top
+        return [''.join(cell.char for cell in row) for row in self._cells[top:top + height]]
+
+    def flush(self, terminal_adapter: ITerminalAdapter):
+        """Send the changed cells to the terminal. The cursor, style and colors are not restored."""
+        for y in sorted(self._dirty_rows):
+            row = self._cells[y]
+            shown = self._shown[y]
+            x = 0
+            while x < self.width:
+                cell = row[x]
+                if cell == shown[x]:
+                    x += 1
+                    continue
+                # Unchanged cells with the same style in between changes are sent again,
+                # rather than starting a new run after each one.
+                start = x
+                end = x + 1
+                while x < self.width and row[x][1:] == cell[1:]:
+                    if row[x] != shown[x]:
+                        end = x + 1
+                    x += 1
+                x = end
+                terminal_adapter.move_cursor(y, start)
+                terminal_adapter.apply_style_attributes(cell.style)
+                if self.use_color:
+                    terminal_adapter.set_color(cell.background_color, cell.foreground_color)
+                terminal_adapter.write_to_screen(''.join(c.char for c in row[start:end]))
+            self._shown[y] = row[:]
+        self._dirty_rows.clear()
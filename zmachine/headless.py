@@ -0,0 +1,303 @@
+from collections import deque
+from typing import Iterable, Iterator, TextIO
+from .config import ZMachineConfig
+from .event import EventManager, EventArgs
+from .enums import WindowPosition, TextStyle
+from .error import EndOfInputException, InvalidScreenOperationException
+from .framebuffer import Framebuffer
+from .screen import LineWrapper
+from .logging import screen_logger as logger
+from .constants import DEFAULT_BACKGROUND_COLOR, DEFAULT_FOREGROUND_COLOR
+
+DEFAULT_HEADLESS_HEIGHT = 25
+DEFAULT_HEADLESS_WIDTH = 80
+
+
+class HeadlessAdapter:
+    """Terminal adapter that runs without a TTY.
+    Input is read from a queue of lines, and text written to the scrolling part
+    of the screen is appended to a list of chunks for the host to collect."""
+    def __init__(self,
+                 config: ZMachineConfig,
+                 height: int = DEFAULT_HEADLESS_HEIGHT,
+                 width: int = DEFAULT_HEADLESS_WIDTH):
+        self.config = config
+        self._height = height
+        self._width = width
+        self.output: list[str] = []
+        self.output_file: TextIO | None = None
+        self._input_chars: deque[int] = deque()
+        self._input_lines: Iterator[str] | None = None
+        self._y_cursor = height - 1
+        self._x_cursor = 0
+        self.timeout_ms = 0
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    def open(self, input_lines: Iterable[str], output_file: TextIO | None = None):
+        """Read input from the given lines when the input queue runs out.
+        If an output file is given, the output is written to it each time input is read."""
+        self._input_lines = iter(input_lines)
+        self.output_file = output_file
+
+    def feed(self, text: str):
+        """Queue text to be read as keyboard input."""
+        self._input_chars.extend(ord(c) for c in text)
+
+    def read_output(self) -> str:
+        """Return the text written since the last call and clear the output."""
+        text = ''.join(self.output)
+        self.output.clear()
+        return text
+
+    def flush_output(self):
+        if self.output_file is not None and len(self.output) > 0:
+            self.output_file.write(self.read_output())
+            self.output_file.flush()
+
+    def refresh(self):
+        pass
+
+    def update_screen(self):
+        pass
+
+    def set_scrollable_height(self, top: int):
+        pass
+
+    def write_to_screen(self, text: str):
+        self.output.append(text)
+
+    def get_input_char(self, echo: bool = True) -> int:
+        if len(self._input_chars) == 0:
+            self._read_next_line()
+        c = self._input_chars.popleft()
+        if echo:
+            if 32 <= c <= 126:
+                self.output.append(chr(c))
+            if c in (10, 13):
+                self.output.append("\n")
+        return c
+
+    def get_escape_sequence(self) -> list[int]:
+        # Special keys can't be sent as text, so an escape is always a plain escape.
+        return []
+
+    def get_input_string(self, prompt: str, lowercase: bool) -> str:
+        self.output.append(prompt)
+        chars = []
+        while (c := self.get_input_char(False)) not in (10, 13):
+            chars += [chr(c)]
+        response = ''.join(chars)
+        self.output.append(response + "\n")
+        return response.lower() if lowercase else response
+
+    def set_timeout(self, timeout_ms: int):
+        self.timeout_ms = timeout_ms
+
+    def get_coordinates(self) -> tuple[int, int]:
+        return self._y_cursor, self._x_cursor
+
+    def move_cursor(self, y_pos: int, x_pos: int):
+        self._y_cursor, self._x_cursor = y_pos, x_pos
+
+    def get_char_at(self, y_pos: int, x_pos: int) -> int:
+        return ord(' ')
+
+    def paint_char_at(self, y_pos: int, x_pos: int, char: int):
+        pass
+
+    def erase_screen(self):
+        pass
+
+    def erase_window(self, top: int, height: int):
+        pass
+
+    def clear_to_eol(self):
+        pass
+
+    def apply_style_attributes(self, attributes: int):
+        pass
+
+    def set_color(self, background_color: int, foreground_color: int):
+        pass
+
+    def sound_effect(self, sound_type: int):
+        pass
+
+    def shutdown(self):
+        self.flush_output()
+
+    def _read_next_line(self):
+        self.flush_output()
+        line = None if self._input_lines is None else next(self._input_lines, None)
+        if line is None:
+            raise EndOfInputException()
+        self.feed(line if line.endswith("\n") else line + "\n")
+
+
+class HeadlessScreen:
+    """Screen for the headless adapter.
+    The upper window is kept as a character grid, and lower window text is passed
+    straight through to the adapter's output without word wrapping or paging."""
+    def __init__(self, version: int, terminal_adapter: HeadlessAdapter, event_manager: EventManager):
+        self._version = version
+        self.terminal_adapter = terminal_adapter
+        self.height = terminal_adapter.height
+        self.width = terminal_adapter.width
+        self.status_line = ''
+        self.upper_window = Framebuffer(self.height, self.width)
+        # The v3 status line occupies the top line of the screen.
+        self.upper_window_top = 1 if version <= 3 else 0
+        self.upper_window_height = 0
+        self.y_cursor = self.upper_window_top
+        self.x_cursor = 0
+        self.style_attributes: int = TextStyle.ROMAN
+        self.background_color: int = DEFAULT_BACKGROUND_COLOR
+        self.foreground_color: int = DEFAULT_FOREGROUND_COLOR
+        self._active_window_id = WindowPosition.LOWER
+        self._pause_enabled = False
+        self._buffer_mode = True
+        event_manager.on_quit += self.on_quit_handler
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def buffer_mode(self) -> bool:
+        return self._buffer_mode
+
+    @buffer_mode.setter
+    def buffer_mode(self, value: bool) -> None:
+        self._buffer_mode = value
+
+    @property
+    def pause_enabled(self) -> bool:
+        return self._pause_enabled
+
+    @pause_enabled.setter
+    def pause_enabled(self, value: bool) -> None:
+        # Output never pauses, the flag is only kept for callers that read it back.
+        self._pause_enabled = value
+
+    @property
+    def active_window_id(self) -> WindowPosition:
+        return self._active_window_id
+
+    def get_upper_window_lines(self) -> list[str]:
+        """Return the text of the upper window, one string per line."""
+        top = self.upper_window_top
+        return self.upper_window.get_lines(top, self.upper_window_height)
+
+    def get_screen_lines(self, lower_window_text: str) -> list[str]:
+        """Return the whole screen as it would look on a terminal, one string per line.
+        The lower window shows the end of the given text, word wrapped."""
+        lines = [self.status_line.ljust(self.width)] if self.version <= 3 else []
+        lines += self.get_upper_window_lines()
+        lower_window_height = self.height - len(lines)
+        lower_lines = []
+        line = ''
+        for chunk in LineWrapper(self.width).wrap(lower_window_text, 0):
+            line += chunk.rstrip("\n")
+            if chunk.endswith("\n") or len(line) >= self.width:
+                lower_lines.append(line)
+                line = ''
+        lower_lines.append(line)
+        lower_lines = [''] * lower_window_height + lower_lines
+        lines += [line.ljust(self.width) for line in lower_lines[-lower_window_height:]]
+        return lines
+
+    def refresh_status_line(self, location: str, status: str) -> None:
+        if self.version > 3:
+            raise NotImplementedError(f"Status line is not implemented in v{self.version} screen.")
+        # Same layout as the curses status line.
+        line = [' '] * self.width
+        line[1:1 + len(location)] = location
+        status_pos = self.width - len(status) - 3
+        line[status_pos:status_pos + len(status)] = status
+        self.status_line = ''.join(line[:self.width])
+
+    def print(self, text: str, newline: bool = False) -> None:
+        if self._active_window_id == WindowPosition.LOWER:
+            self.terminal_adapter.write_to_screen(text + "\n" if newline else text)
+        else:
+            self.write_to_upper_window(text + "\n" if newline else text)
+
+    def write_to_upper_window(self, text: str):
+        self.y_cursor, self.x_cursor = self.upper_window.write(
+            self.y_cursor, self.x_cursor, text, self.style_attributes, self.background_color, self.foreground_color)
+
+    def reset_output_line_count(self) -> None:
+        pass
+
+    def set_window(self, window_id: int) -> None:
+        logger.info(f"Setting active window to {window_id}")
+        if window_id == WindowPosition.LOWER:
+            self._active_window_id = WindowPosition.LOWER
+        elif window_id == WindowPosition.UPPER:
+            self._active_window_id = WindowPosition.UPPER
+            self.y_cursor, self.x_cursor = self.upper_window_top, 0
+        else:
+            raise InvalidScreenOperationException("Invalid window ID.")
+
+    def split_window(self, lines: int) -> None:
+        logger.info(f"Splitting window at line {lines}")
+        self.upper_window_height = min(lines, self.height - self.upper_window_top)
+        if self.version <= 3:
+            self.erase_upper_window()
+
+    def erase_window(self, window_id: int) -> None:
+        if window_id == -1:
+            self.split_window(0)
+            self.erase_upper_window()
+        elif window_id == -2 or window_id == WindowPosition.UPPER:
+            self.erase_upper_window()
+
+    def erase_upper_window(self):
+        self.upper_window.erase(0, self.height)
+        self.y_cursor, self.x_cursor = self.upper_window_top, 0
+
+    def sound_effect(self, type: int) -> None:
+        pass
+
+    def set_cursor(self, y_pos: int, x_pos: int) -> None:
+        if self._active_window_id == WindowPosition.LOWER:
+            return
+        if y_pos >= self.height or x_pos >= self.width:
+            raise InvalidScreenOperationException("Cursor moved outside the screen bounds.")
+        self.y_cursor, self.x_cursor = y_pos, x_pos
+
+    def set_text_style(self, style: int) -> None:
+        if style == TextStyle.ROMAN:
+            self.style_attributes = TextStyle.ROMAN
+        else:
+            self.style_attributes |= style
+
+    def set_color(self, background_color: int, foreground_color: int) -> None:
+        if background_color == 1:
+            self.background_color = DEFAULT_BACKGROUND_COLOR
+        elif background_color != 0:
+            self.background_color = background_color
+        if foreground_color == 1:
+            self.foreground_color = DEFAULT_FOREGROUND_COLOR
+        elif foreground_color != 0:
+            self.foreground_color = foreground_color
+
+    def print_table(self, table: list[str]) -> None:
+        y, x = self.y_cursor, self.x_cursor
+        for row in table:
+            if self._active_window_id == WindowPosition.UPPER:
+                self.y_cursor, self.x_cursor = y, x
+                self.write_to_upper_window(row)
+                y += 1
+            else:
+                self.terminal_adapter.write_to_screen(row + "\n")
+
+    def on_quit_handler(self, sender, e: EventArgs):
+        self.terminal_adapter.shutdown()
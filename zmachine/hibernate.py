@@ -0,0 +1,218 @@
+import base64
+import functools
+import json
+import zlib
+from .builder import ZMachineBuilder
+from .story import StoryImage
+from .headless import HeadlessAdapter, HeadlessScreen
+from .interpreter import ZMachineInterpreter
+from .output import MemoryStream, RecordStream, TranscriptStream
+from .framebuffer import Cell
+from .enums import InputRequest, WindowPosition
+from .error import HibernateException, InputPendingException
+
+HIBERNATE_MAGIC = b'ZHIB'
+HIBERNATE_VERSION = 1
+# Read opcodes that can be pending, by the name of the interpreter method.
+_READ_METHODS = ('do_read', 'do_read_char')
+
+
+def hibernate(builder: ZMachineBuilder) -> bytes:
+    """Save a headless session that is blocked at a read to a compact blob.
+    The blob holds everything needed to carry on where the session left off: dynamic memory
+    (as a difference from the story file), the call stack, the undo history, the screen and
+    output streams, the random number generator, and the read that is waiting for input."""
+    state = capture_state(builder)
+    return HIBERNATE_MAGIC + bytes([HIBERNATE_VERSION]) + zlib.compress(json.dumps(state, default=_encode).encode('utf-8'))
+
+
+def resume(story: StoryImage, blob: bytes, restore_random: bool = True) -> ZMachineBuilder:
+    """Rebuild a hibernated session. Run it with interpreter.run_resumable(), which starts by
+    yielding the read the session was waiting for.
+    If restore_random is False, the random number generator is left as it is."""
+    if blob[:4] != HIBERNATE_MAGIC or blob[4] != HIBERNATE_VERSION:
+        raise HibernateException("Not a hibernated session.")
+    return restore_state(story, json.loads(zlib.decompress(blob[5:])), restore_random)
+
+
+def warm_start(story: StoryImage) -> ZMachineBuilder:
+    """Start a new headless session at the game's first prompt, without running the boot sequence.
+    The first call runs the game to its first prompt and keeps a snapshot in the story image;
+    later sessions are cloned from it. The banner and opening text are waiting in the
+    terminal adapter's output, as they would be after booting."""
+    capture_warm_start(story)
+    # Each session gets its own random numbers, not a copy of the snapshot's.
+    return restore_state(story, story.warm_start, restore_random=False)
+
+
+def capture_warm_start(story: StoryImage):
+    """Run the game to its first prompt and keep the snapshot in the story image, unless it's already there."""
+    if len(story.warm_start) > 0:
+        return
+    builder = ZMachineBuilder(story.config.game_file, terminal='headless', story=story)
+    game = builder.interpreter.run_resumable()
+    next(game)
+    story.warm_start.update(capture_state(builder))
+    game.close()
+
+
+def capture_state(builder: ZMachineBuilder) -> dict:
+    """Capture the state of a headless session that is blocked at a read.
+    The state is kept as plain values, bytes and tuples, to be encoded by hibernate()
+    or kept in memory as a snapshot."""
+    interpreter = builder.interpreter
+    screen, terminal_adapter = _headless(builder)
+    pending_read = interpreter.pending_read
+    # The read opcodes set resume to a partial of their own method.
+    if pending_read is None or not isinstance(pending_read.resume, functools.partial):
+        raise HibernateException("Only a session waiting for input can be hibernated.")
+    call_stack_bytes = interpreter.call_stack.serialize()
+    if len(call_stack_bytes) == 0:
+        raise HibernateException("Can't hibernate inside an interrupt routine.")
+    story = builder.story
+    config = interpreter.config
+    static_memory_base_addr = config.static_memory_base_addr
+    # Changed bytes are non-zero, and the zero runs compress to almost nothing.
+    memory_delta = _xor(interpreter.memory_map[:static_memory_base_addr], story.data[:static_memory_base_addr])
+    memory_stream, transcript_stream, record_stream = _output_streams(interpreter)
+    # Transcript text not yet written goes to the file now, rather than into the state.
+    transcript_stream.flush_buffer()
+    # Rows below the upper window aren't shown by the headless screen.
+    upper_window_rows = screen.upper_window.get_rows()[:screen.upper_window_top + screen.upper_window_height]
+    return {
+        'release': config.release_number.hex(),
+        'serial': config.serial_number.hex(),
+        'pc': interpreter.pc,
+        'instruction_count': interpreter.instruction_count,
+        'memory': memory_delta,
+        'call_stack': bytes(call_stack_bytes),
+        'undo': [bytes(frame) for frame in interpreter.undo_stack.stack[:interpreter.undo_stack.sp]],
+        'read': {
+            'method': pending_read.resume.func.__name__,
+            'args': list(pending_read.resume.args),
+            'read_char': pending_read.request.read_char,
+            'timeout_ms': pending_read.request.timeout_ms,
+            'flush_output': pending_read.flush_output,
+        },
+        'screen': {
+            'status_line': screen.status_line,
+            'upper_window': upper_window_rows,
+            'upper_window_height': screen.upper_window_height,
+            'cursor': (screen.y_cursor, screen.x_cursor),
+            'style': screen.style_attributes,
+            'colors': (screen.background_color, screen.foreground_color),
+            'window': int(screen.active_window_id),
+            'buffer_mode': screen.buffer_mode,
+            'output': terminal_adapter.read_output(),
+        },
+        'memory_stream': {
+            'tables': memory_stream.table_stack[:memory_stream.stack_ptr],
+            'buffer': bytes(memory_stream.buffer),
+        },
+        'transcript_stream': {
+            'script_path': transcript_stream.script_full_path,
+            'transcript_path': transcript_stream.transcript_full_path,
+            'mode': transcript_stream.script_file_mode,
+        },
+        'record_stream': {
+            'path': record_stream.record_full_path if record_stream.is_active else None,
+        },
+        'random': interpreter.rng.getstate(),
+    }
+
+
+def restore_state(story: StoryImage, state: dict, restore_random: bool = True) -> ZMachineBuilder:
+    """Build a headless session from state captured with capture_state()."""
+    config = story.config
+    if state['release'] != config.release_number.hex() or state['serial'] != config.serial_number.hex():
+        raise HibernateException("Hibernated session is for a different game.")
+    builder = ZMachineBuilder(config.game_file, terminal='headless', story=story)
+    interpreter = builder.interpreter
+
+    memory_delta = _decode(state['memory'])
+    dynamic_memory = _xor(memory_delta, story.data[:len(memory_delta)])
+    interpreter.memory_map.reset_dynamic_memory(dynamic_memory)
+    # Restoring dynamic memory keeps the current transcript and fixed pitch bits, but these should be restored too.
+    interpreter.memory_map.write_word(0x10, int.from_bytes(dynamic_memory[0x10:0x12], "big"))
+    interpreter.call_stack.deserialize(_decode(state['call_stack']))
+    interpreter.pc = state['pc']
+    interpreter.instruction_count = state['instruction_count']
+    undo_frames = [_decode(frame) for frame in state['undo']]
+    interpreter.undo_stack.stack[:len(undo_frames)] = undo_frames
+    interpreter.undo_stack.sp = len(undo_frames)
+
+    read = state['read']
+    if read['method'] not in _READ_METHODS:
+        raise HibernateException(f"Invalid pending read: {read['method']}")
+    pending_read = InputPendingException(InputRequest(read['read_char'], read['timeout_ms']), read['flush_output'])
+    pending_read.resume = functools.partial(getattr(interpreter, read['method']), *read['args'])
+    interpreter.pending_read = pending_read
+
+    screen, terminal_adapter = _headless(builder)
+    screen_state = state['screen']
+    screen.status_line = screen_state['status_line']
+    if len(screen_state['upper_window']) > 0:
+        rows = screen.upper_window.get_rows()
+        rows[:len(screen_state['upper_window'])] = [[Cell(*cell) for cell in row] for row in screen_state['upper_window']]
+        screen.upper_window.set_rows(rows)
+    screen.upper_window_height = screen_state['upper_window_height']
+    screen.set_window(WindowPosition(screen_state['window']))
+    screen.y_cursor, screen.x_cursor = screen_state['cursor']
+    screen.style_attributes = screen_state['style']
+    screen.background_color, screen.foreground_color = screen_state['colors']
+    screen.buffer_mode = screen_state['buffer_mode']
+    terminal_adapter.write_to_screen(screen_state['output'])
+
+    memory_stream, transcript_stream, record_stream = _output_streams(interpreter)
+    tables = [tuple(table) for table in state['memory_stream']['tables']]
+    memory_stream.table_stack[:len(tables)] = tables
+    memory_stream.stack_ptr = len(tables)
+    memory_stream.buffer[:] = _decode(state['memory_stream']['buffer'])
+    memory_stream.is_active = len(tables) > 0
+    transcript_state = state['transcript_stream']
+    transcript_stream.script_full_path = transcript_state['script_path']
+    transcript_stream.transcript_full_path = transcript_state['transcript_path']
+    transcript_stream.script_file_mode = transcript_state['mode']
+    transcript_stream.is_active = interpreter.runtime_settings.transcript_active_flag
+    if state['record_stream']['path'] is not None:
+        record_stream.open(state['record_stream']['path'])
+
+    if restore_random:
+        version, internal_state, gauss_next = state['random']
+        interpreter.rng.setstate((version, tuple(internal_state), gauss_next))
+    return builder
+
+
+def _headless(builder: ZMachineBuilder) -> tuple[HeadlessScreen, HeadlessAdapter]:
+    screen = builder.interpreter.screen
+    terminal_adapter = builder.terminal_adapter
+    if not isinstance(screen, HeadlessScreen) or not isinstance(terminal_adapter, HeadlessAdapter):
+        raise HibernateException("Only headless sessions can be hibernated.")
+    return screen, terminal_adapter
+
+
+def _output_streams(interpreter: ZMachineInterpreter) -> tuple[MemoryStream, TranscriptStream, RecordStream]:
+    output_manager = interpreter.output_manager
+    memory_stream = output_manager.memory_stream
+    transcript_stream = output_manager.transcript_stream
+    record_stream = output_manager.record_stream
+    if (not isinstance(memory_stream, MemoryStream) or not isinstance(transcript_stream, TranscriptStream)
+            or not isinstance(record_stream, RecordStream)):
+        raise HibernateException("Only sessions with the standard output streams can be hibernated.")
+    return memory_stream, transcript_stream, record_stream
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(len(a), "big")
+
+
+def _encode(data: bytes) -> str:
+    # Called by json.dumps for the bytes values in the state.
+    if not isinstance(data, bytes):
+        raise TypeError(f"Can't encode {type(data).__name__}")
+    return base64.b64encode(data).decode('ascii')
+
+
+def _decode(data: bytes | str) -> bytes:
+    # Values are bytes in a snapshot, and base64 strings once read back from a blob.
+    return data if isinstance(data, bytes) else base64.b64decode(data)
@@ -1,10 +1,12 @@
 import os
-import random
 import time
+from random import Random
 from functools import wraps
 from .protocol import ITerminalAdapter, IInputSource, IOutputStreamManager
 from .config import ZMachineConfig
 from .settings import RuntimeSettings
+from .playback import PlaybackReader
+from .error import PlaybackFileException
 
 def hotkey_wrapper(hotkey_func):
     @wraps(hotkey_func)
@@ -15,7 +17,7 @@ def hotkey_wrapper(hotkey_func):
             result = hotkey_func(self, *args, **kwargs)
         finally:
             self.restore_current_line_chars(line_chars)
-            self.terminal_adapter.refresh()
+            self.terminal_adapter.update_screen()
         return result
     return wrapper
 
@@ -24,11 +26,14 @@ class HotkeyHandler:
                  config: ZMachineConfig, 
                  runtime_settings: RuntimeSettings,
                  terminal_adapter: ITerminalAdapter, 
-                 output_stream_manager: IOutputStreamManager):
+                 output_stream_manager: IOutputStreamManager,
+                 rng: Random):
         self.config = config
         self.runtime_settings = runtime_settings
         self.terminal_adapter = terminal_adapter
         self.output_stream_manager = output_stream_manager
+        # The interpreter's random number generator, seeded for recording and playback.
+        self.rng = rng
 
     def get_current_line_chars(self) -> list[int]:
         y_pos, x_pos = self.terminal_adapter.get_coordinates()
@@ -67,7 +72,7 @@ class HotkeyHandler:
     def set_random_seed(self):
         seed = self.terminal_adapter.get_input_string("Enter random seed: ", lowercase=False)
         if seed.isdigit():
-            random.seed(int(seed))
+            self.rng.seed(int(seed))
             self.terminal_adapter.write_to_screen(f"Random seed set to {seed}\n")
         else:
             self.terminal_adapter.write_to_screen("Invalid seed. Enter a numeric value.\n")
@@ -99,7 +104,7 @@ class HotkeyHandler:
             f.write(f'# GAME: {filename}\n')
             f.write(f'# SEED: {new_seed}\n')
             f.write('---\n')
-        random.seed(new_seed)
+        self.rng.seed(new_seed)
         self.terminal_adapter.write_to_screen(f"Recording input to {record_file_path} with seed {new_seed}\n")
         self.output_stream_manager.record_stream.open(record_file_path)
 
@@ -111,9 +116,6 @@ class HotkeyHandler:
     def playback_recorded_input(self, input_source: IInputSource) -> bool:
         """Prompt the user for a playback file and switch to the playback input stream if successful."""
         game_file = self.config.game_file
-        commands = []
-        seed: int | None = None
-        in_metadata_section = True
         filepath = os.path.dirname(game_file)
         filename = os.path.basename(game_file)
         base_filename = os.path.splitext(filename)[0]
@@ -126,35 +128,20 @@ class HotkeyHandler:
         if not os.path.exists(playback_file_path):
             self.terminal_adapter.write_to_screen("Unable to open playback file.\n")
             return False
-        with open(playback_file_path, 'r') as playback_file:
-            for line in playback_file:
-                if in_metadata_section:
-                    if line.startswith('# SEED:'):
-                        seed_str = line.split(':', 1)[1].strip()
-                        if seed_str.isdigit():
-                            seed = int(seed_str) 
-                    elif line.startswith('# GAME:'):
-                        game_str = line.split(':', 1)[1].strip()
-                        if game_str != filename:
-                            self.terminal_adapter.write_to_screen("Playback file does not match the current game.\n")
-                            return False
-                    elif line.startswith('---'):
-                        in_metadata_section = False
-                    else:
-                        self.terminal_adapter.write_to_screen("Invalid playback file format.\n")
-                        return False
-                else:
-                    if line == '\n':
-                        commands += [line]
-                    else:
-                        commands += [line.strip()]
-            if len(commands) == 0:
-                self.terminal_adapter.write_to_screen("Playback file is empty.\n")
-                return False
-            if seed is None:
-                self.terminal_adapter.write_to_screen("Warning: No random seed found in recording.\n")
-            else:
-                random.seed(seed)
-                self.terminal_adapter.write_to_screen(f"Random seed set to {seed}\n")
-            input_source.select_playback_stream(commands)
+        try:
+            playback = PlaybackReader(playback_file_path)
+        except PlaybackFileException as e:
+            self.terminal_adapter.write_to_screen(f"{e}\n")
+            return False
+        if playback.game is not None and playback.game != filename:
+            playback.close()
+            self.terminal_adapter.write_to_screen("Playback file does not match the current game.\n")
+            return False
+        if playback.seed is None:
+            self.terminal_adapter.write_to_screen("Warning: No random seed found in recording.\n")
+        else:
+            self.rng.seed(playback.seed)
+            self.terminal_adapter.write_to_screen(f"Random seed set to {playback.seed}\n")
+        # Commands are read from the file as they are played.
+        input_source.select_playback_stream(playback)
         return True
\ No newline at end of file
@@ -1,11 +1,13 @@
 import re
 from abc import ABC, abstractmethod
-from typing import Callable
-from .enums import TerminalEscape, InputStreamType, Hotkey
+from typing import Callable, Iterable, Iterator
+from .enums import TerminalEscape, InputStreamType, Hotkey, InputRequest
 from .config import ZMachineConfig
 from .constants import ESCAPE_CHAR
+from .error import InputPendingException, PlaybackFileException
 from .event import EventManager, EventArgs, PostReadInputEventArgs
 from .protocol import IScreen, ITerminalAdapter, IInputSource, IHotkeyHandler
+from .playback import PlaybackReader
 
 class KeyboardInputParser:
     def __init__(self, terminal_adapter: ITerminalAdapter):
@@ -46,9 +48,10 @@ class InputStreamManager:
         self.event_manager = event_manager
         self.keyboard_input_stream = KeyboardInputStream(terminal_adapter, self, screen, hotkey_handler, config)
         self.playback_input_stream = PlaybackInputStream(terminal_adapter, self)
+        self.resumable_input_stream = ResumableInputStream(terminal_adapter, self, screen)
         self.active_stream: InputStream = self.keyboard_input_stream
 
-    def select_playback_stream(self, commands: list[str]):
+    def select_playback_stream(self, commands: Iterable[str]):
         self.playback_input_stream.open(commands)
         self.screen.pause_enabled = False
         self.active_stream = self.playback_input_stream
@@ -57,6 +60,12 @@ class InputStreamManager:
         self.screen.pause_enabled = True
         self.active_stream = self.keyboard_input_stream
 
+    def select_resumable_stream(self):
+        self.active_stream = self.resumable_input_stream
+
+    def provide_input(self, text: str | None):
+        self.resumable_input_stream.provide_input(text)
+
     def read_input(self,
         timeout_ms: int,
         text_buffer: list[int],
@@ -192,15 +201,36 @@ class KeyboardInputStream(InputStream):
 
 
 class PlaybackInputStream(InputStream):
+    READ_CHAR_PATTERN = re.compile(r'^\[(\d+)\]$')
+    # "command text" or "command text[terminating_char]"
+    COMMAND_PATTERN = re.compile(r'^(.+?)(?:\[(\d+)\])?$')
+
     def __init__(self, terminal_adapter: ITerminalAdapter, input_source: IInputSource):
         super().__init__(terminal_adapter, input_source)
-        self.commands: list[str] = []
+        self.playback: Iterable[str] = ()
+        self.commands: Iterator[str] = iter(())
         self.command_index = 0
+        # The next command is read ahead, to know when the last one has been played.
+        self.next_command: str | None = None
 
-    def open(self, commands: list[str]):
-        self.commands = commands
+    def open(self, commands: Iterable[str]):
+        self.close()
+        self.playback = commands
+        self.commands = iter(commands)
         self.command_index = 0
-    
+        self.next_command = next(self.commands, None)
+
+    def close(self):
+        """Close the recording the commands are read from, if they're read from one."""
+        if isinstance(self.playback, PlaybackReader):
+            self.playback.close()
+        self.playback = ()
+
+    def stop(self):
+        """Stop playing back and go back to the keyboard."""
+        self.close()
+        self.input_source.select_keyboard_stream()
+
     def read_input(self,
         timeout_ms: int,
         text_buffer: list[int],
@@ -211,29 +241,31 @@ class PlaybackInputStream(InputStream):
         buffer_pos = 0
         while buffer_pos < len(text_buffer) and text_buffer[buffer_pos] != 0:
             buffer_pos += 1
-        command = self.commands[self.command_index].strip()
+        if self.next_command is None:
+            raise PlaybackFileException("No more commands to play back.")
+        command = self.next_command.strip()
         if command == '':
             text_buffer[buffer_pos] = 13
         # If the text buffer length is 1 (read_char), the command should be a single character.
         # If not, the playback file is out of sync and playback will stop here.
         elif len(text_buffer) == 1:
-            matches = re.match(r'^\[(\d+)\]$', command)
+            matches = self.READ_CHAR_PATTERN.match(command)
             if matches is None:
                 self.terminal_adapter.write_to_screen(f"Invalid command in playback file: {self.command_index}: {command}\n")
                 text_buffer[0] = 13
-                self.input_source.select_keyboard_stream()
+                self.stop()
+                return
             else:
                 zscii_code = int(matches.groups()[0])
                 text_buffer[0] = zscii_code
                 if echo and 32 <= zscii_code <= 126:
                     self.terminal_adapter.write_to_screen(chr(zscii_code))
         else:
-            # Parse format: "command text" or "command text[terminating_char]"
-            matches = re.match(r'^(.+?)(?:\[(\d+)\])?$', command)
+            matches = self.COMMAND_PATTERN.match(command)
             if matches is None:
                 self.terminal_adapter.write_to_screen(f"Invalid command in playback file: {self.command_index}: {command}\n")
                 text_buffer[buffer_pos] = 13
-                self.input_source.select_keyboard_stream()
+                self.stop()
                 return
             groups = matches.groups()
             command_text = groups[0]
@@ -252,5 +284,60 @@ class PlaybackInputStream(InputStream):
                 buffer_pos += 1
             text_buffer[buffer_pos] = terminating_char
         self.command_index += 1
-        if self.command_index == len(self.commands):
-            self.input_source.select_keyboard_stream()
\ No newline at end of file
+        self.next_command = next(self.commands, None)
+        if self.next_command is None:
+            self.stop()
+
+
+class TimedOut:
+    """Provided to a resumable read in place of text when the read timed out."""
+    pass
+
+
+class ResumableInputStream(InputStream):
+    """Input provided by the host of a resumable session.
+    Reading raises InputPendingException until the host provides the input, after
+    which the read opcode is run again and takes it from here."""
+    TIMED_OUT = TimedOut()
+
+    def __init__(self, terminal_adapter: ITerminalAdapter, input_source: IInputSource, screen: IScreen):
+        super().__init__(terminal_adapter, input_source)
+        self.screen = screen
+        self.pending_input: str | TimedOut | None = None
+
+    def provide_input(self, text: str | None):
+        self.pending_input = self.TIMED_OUT if text is None else text
+
+    def read_input(self,
+        timeout_ms: int,
+        text_buffer: list[int],
+        interrupt_routine_caller: Callable[[int], int],
+        interrupt_routine_addr: int,
+        echo: bool = True
+    ):
+        read_char = len(text_buffer) == 1
+        pending_input, self.pending_input = self.pending_input, None
+        if pending_input is None:
+            raise InputPendingException(InputRequest(read_char, timeout_ms))
+        if isinstance(pending_input, TimedOut):
+            if interrupt_routine_caller(interrupt_routine_addr) != 0:
+                text_buffer[0] = 0
+                return
+            # Keep waiting. The routine may have printed something, which has to be shown first.
+            raise InputPendingException(InputRequest(read_char, timeout_ms), flush_output=True)
+        # Non-printable characters are ignored, as they are when typed at the keyboard.
+        text = ''.join(c for c in pending_input.rstrip('\n') if 32 <= ord(c) <= 126)
+        if read_char:
+            text_buffer[0] = 13 if text == '' else ord(text[0])
+            return
+        buffer_pos = 0
+        while buffer_pos < len(text_buffer) and text_buffer[buffer_pos] != 0:
+            buffer_pos += 1
+        command = text[:len(text_buffer) - buffer_pos - 1]
+        if echo:
+            self.terminal_adapter.write_to_screen(command + '\n')
+            self.screen.reset_output_line_count()
+        for c in command.lower():
+            text_buffer[buffer_pos] = ord(c)
+            buffer_pos += 1
+        text_buffer[buffer_pos] = 13
@@ -1,13 +1,15 @@
+import functools
+from random import Random
+from typing import Callable, Generator
 from . import opcodes
 from .config import ZMachineConfig
 from .settings import RuntimeSettings
 from .memory import MemoryMap
-from .object_table import ObjectTable
 from .event import EventArgs, EventManager
-from .protocol import IObjectTable, IScreen, IInputSource, IOutputStreamManager, IQuetzal
+from .protocol import IObjectTable, IScreen, IInputSource, IOutputStreamManager, IQuetzal, IRoutineHook
 from .text import TextUtils
 from .undo import UndoStack
-from .enums import WindowPosition, StatusType, RoutineType, OutputStreamType
+from .enums import WindowPosition, StatusType, RoutineType, OutputStreamType, InputRequest
 from .stack import CallStack, EvalStack
 from .logging import LogLevel, opcodes_logger, interpreter_logger
 from .error import *
@@ -23,7 +25,10 @@ class ZMachineInterpreter:
                  output_manager: IOutputStreamManager,
                  quetzal: IQuetzal,
                  event_manager: EventManager, 
-                 debug: bool = False):
+                 object_table: IObjectTable,
+                 debug: bool = False,
+                 text_utils: TextUtils | None = None,
+                 rng: Random | None = None):
         self.memory_map = memory_map
         self.config = config
         self.runtime_settings = runtime_settings
@@ -32,15 +37,31 @@ class ZMachineInterpreter:
         self.output_manager = output_manager
         self.event_manager = event_manager
         self.pc = self.config.initial_pc
-        self.text_utils = TextUtils(memory_map)
+        self.text_utils = text_utils if text_utils is not None else TextUtils(memory_map)
         self.quetzal = quetzal
-        self._object_table = ObjectTable(memory_map)
+        self._object_table = object_table
+        # Each session has its own random number generator, so seeding one doesn't affect the others.
+        self._rng = rng if rng is not None else Random()
         self.opcodes = opcodes.get_opcodes(self.version)
         self.extended_opcodes = opcodes.get_extended_opcodes(self.version)
         self.call_stack = CallStack()
         self.undo_stack = UndoStack()
         self.text_buffer = [0] * 240
         self.quit = False
+        self.instruction_count = 0
+        # Instructions are only counted in instruction_count when this is set, as counting costs a little on each one.
+        self.count_instructions = False
+        # do_run prints an error in the game and stops, unless this is set, when the error is raised
+        # to the caller instead (e.g. a replay that has to report that the game crashed).
+        self.raise_errors = False
+        # Runs each instruction in place of run_instruction when set, e.g. to profile it, and must call
+        # run_instruction itself. It and count_instructions are read when the game starts running,
+        # and by run_resumable after each yield.
+        self.instruction_hook: Callable[[], None] | None = None
+        # Told about each routine call and return, and each string printed from memory, when set.
+        self.routine_hook: IRoutineHook | None = None
+        # The read the game is blocked at, when running with run_resumable.
+        self.pending_read: InputPendingException | None = None
         if self.version <= 3:
             self.status_line_type = (self.read_byte(0x1) & 0x2) >> 1
             self.event_manager.pre_read_input += self.pre_read_input_handler
@@ -53,15 +74,68 @@ class ZMachineInterpreter:
     def object_table(self) -> IObjectTable:
         return self._object_table
 
+    @property
+    def rng(self) -> Random:
+        return self._rng
+
     def do_run(self):
+        run_instruction = self.get_instruction_runner()
         try:
             while not self.quit:
-                self.run_instruction()
+                run_instruction()
+        except EndOfInputException:
+            pass
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(e.__str__())
         finally:
             self.event_manager.on_quit.invoke(self, EventArgs())
 
+    def run_resumable(self, instruction_budget: int = 0) -> Generator[InputRequest | None, str | None, None]:
+        """Run the game as a generator that yields instead of blocking on input.
+        An InputRequest is yielded when the game reads input, and the input is sent back
+        to continue. Sending None means the read timed out.
+        If instruction_budget is set, None is yielded after that many instructions so the
+        caller can do other work; send None to continue.
+        If pending_read is already set (e.g. the session was resumed from hibernation), its
+        request is yielded first.
+        Input only comes from the caller, so the game can't prompt for files: saving and
+        restoring fail, and transcripts aren't written."""
+        self.input_source.select_resumable_stream()
+        self.runtime_settings.file_prompts_enabled = False
+        resume: Callable[[], None] | None = None
+        try:
+            while not self.quit:
+                if self.pending_read is not None:
+                    if self.pending_read.flush_output:
+                        self.event_manager.pre_read_input.invoke(self, EventArgs())
+                    text = yield self.pending_read.request
+                    self.input_source.provide_input(text)
+                    resume = self.pending_read.resume
+                    self.pending_read = None
+                budget = instruction_budget
+                run_instruction = self.get_instruction_runner()
+                while not self.quit:
+                    try:
+                        if resume is not None:
+                            step, resume = resume, None
+                            step()
+                        else:
+                            run_instruction()
+                    except InputPendingException as e:
+                        self.pending_read = e
+                        break
+                    if budget > 0:
+                        budget -= 1
+                        if budget == 0:
+                            yield None
+                            break
+        except EndOfInputException:
+            pass
+        finally:
+            self.event_manager.on_quit.invoke(self, EventArgs())
+
     def do_quit(self):
         self.do_show_status()
         self.quit = True
@@ -117,9 +191,13 @@ class ZMachineInterpreter:
         self.screen.erase_window(WindowPosition.LOWER)
 
     def do_save(self) -> bool:
+        if not self.runtime_settings.file_prompts_enabled:
+            return False
         return self.quetzal.do_save(self.pc, self.call_stack)
 
     def do_restore(self) -> bool:
+        if not self.runtime_settings.file_prompts_enabled:
+            return False
         restored_pc, success = self.quetzal.do_restore(self.call_stack)
         if success:
             self.pc = restored_pc
@@ -148,6 +226,18 @@ class ZMachineInterpreter:
         self.pc = pc
         self.do_store(2)
 
+    def get_instruction_runner(self) -> Callable[[], None]:
+        """Return the function that runs the next instruction: the instruction hook, or run_instruction
+        if there's no hook, counting the instruction if count_instructions is set."""
+        run_instruction = self.instruction_hook or self.run_instruction
+        if not self.count_instructions:
+            return run_instruction
+
+        def run_counted_instruction():
+            run_instruction()
+            self.instruction_count += 1
+        return run_counted_instruction
+
     def run_instruction(self):
         def large_constant_operand():
             return self.read_from_pc(2)
@@ -343,8 +433,12 @@ class ZMachineInterpreter:
             arg_count=len(args),
             routine_type=routine_type
         )
+        if self.routine_hook is not None:
+            self.routine_hook.on_call(call_addr)
 
     def do_return(self, retval: int):
+        if self.routine_hook is not None:
+            self.routine_hook.on_return()
         stack_frame = self.call_stack.pop()
         store_varnum = stack_frame.store_varnum
         return_pc = stack_frame.return_pc
@@ -363,8 +457,9 @@ class ZMachineInterpreter:
             return True
         frame_id = self.call_stack.catch()
         self.do_routine(call_addr, (), RoutineType.DIRECT_CALL)
+        run_instruction = self.instruction_hook or self.run_instruction
         while self.call_stack.catch() > frame_id:
-            self.run_instruction()
+            run_instruction()
         if self.call_stack.catch() != frame_id:
             return 1
         return self.stack_pop()
@@ -417,11 +512,16 @@ class ZMachineInterpreter:
                 self.text_buffer[i] = self.read_byte(text_buffer_addr + i + 2)
         text_addr_offset = 1 if self.version <= 4 else 2
         current_pc = self.pc
-        self.input_source.read_input(timeout_ms=timeout_ms,
-                                     text_buffer=self.text_buffer,
-                                     interrupt_routine_caller=self.do_direct_call,
-                                     interrupt_routine_addr=call_addr,
-                                     echo=True)
+        try:
+            self.input_source.read_input(timeout_ms=timeout_ms,
+                                         text_buffer=self.text_buffer,
+                                         interrupt_routine_caller=self.do_direct_call,
+                                         interrupt_routine_addr=call_addr,
+                                         echo=True)
+        except InputPendingException as e:
+            # The operands have been read, but the store byte hasn't. Run the read again with the same operands.
+            e.resume = functools.partial(self.do_read, text_buffer_addr, parse_buffer_addr, time, routine)
+            raise
         # For version 4 or lower, write the characters from the input buffer (without the
         # terminating character) from byte 1 onwards in the text buffer, followed by a 0 byte.
         # For version 5+, write the number of typed characters in byte 1, followed by the character
@@ -448,11 +548,15 @@ class ZMachineInterpreter:
 
     def do_read_char(self, time: int = 0, routine: int = 0):
         text_buffer = [0]
-        self.input_source.read_input(timeout_ms = time * 100,
-                                     text_buffer=text_buffer,
-                                     interrupt_routine_caller=self.do_direct_call,
-                                     interrupt_routine_addr=self.unpack_addr(routine),
-                                     echo=False)
+        try:
+            self.input_source.read_input(timeout_ms = time * 100,
+                                         text_buffer=text_buffer,
+                                         interrupt_routine_caller=self.do_direct_call,
+                                         interrupt_routine_addr=self.unpack_addr(routine),
+                                         echo=False)
+        except InputPendingException as e:
+            e.resume = functools.partial(self.do_read_char, time, routine)
+            raise
         self.do_store(text_buffer[0])
 
     def do_tokenize(self, text_addr: int, parse_buffer: int, dictionary_addr: int = 0, flag: int = 0):
@@ -546,9 +650,9 @@ class ZMachineInterpreter:
         self.pc = self.print_from_addr(self.pc, newline)
 
     def print_from_addr(self, addr, newline=False):
-        zchars: list[int] = []
-        addr = self.text_utils.read_zchars(addr, zchars)
-        text = self.text_utils.zscii_decode(zchars)
+        text, addr = self.text_utils.read_string(addr)
+        if self.routine_hook is not None:
+            self.routine_hook.on_print(text)
         self.write_to_output_streams(text, newline)
         return addr
 
@@ -564,6 +668,4 @@ class ZMachineInterpreter:
         self.screen.print_table(table)
 
     def string_from_addr(self, addr: int) -> str:
-        zchars: list[int] = []
-        self.text_utils.read_zchars(addr, zchars)
-        return self.text_utils.zscii_decode(zchars)
\ No newline at end of file
+        return self.text_utils.read_string(addr)[0]
\ No newline at end of file
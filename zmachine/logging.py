@@ -125,4 +125,5 @@ output_logger = logging.getLogger('zmachine.output')
 quetzal_logger = logging.getLogger('zmachine.quetzal')
 interpreter_logger = logging.getLogger('zmachine.interpreter')
 error_logger = logging.getLogger('zmachine.error')
-call_stack_logger = logging.getLogger('zmachine.call_stack')
\ No newline at end of file
+call_stack_logger = logging.getLogger('zmachine.call_stack')
+server_logger = logging.getLogger('zmachine.server')
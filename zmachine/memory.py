@@ -1,15 +1,27 @@
+from typing import Callable
 from .error import IllegalWriteException, InvalidMemoryException
 from .config import ZMachineConfig
+from .event import Event, EventArgs
 from .logging import LogLevel, memory_logger as logger
 from .constants import DEFAULT_BACKGROUND_COLOR, DEFAULT_FOREGROUND_COLOR
 
 class MemoryMap:
-    def __init__(self, config: ZMachineConfig):
+    def __init__(self, config: ZMachineConfig, story_data: bytes | None = None):
         self.config = config
-        with open(config.game_file, 'rb') as f:
-            data = f.read()
-        self._memory_map = bytearray(data)
+        if story_data is None:
+            with open(config.game_file, 'rb') as f:
+                story_data = f.read()
+        self._memory_map = bytearray(story_data)
+        # Read-only view for bulk readers. The memory map is never resized, so the view stays valid.
+        self._view = memoryview(self._memory_map).toreadonly()
         self._version = self._memory_map[0]
+        # Components that keep a copy of part of dynamic memory (e.g. the object tree)
+        # register the address range they mirror, and are told when it is written to.
+        self._write_watchers: list[tuple[int, int, Callable[[int, int], None]]] = []
+        self._watch_start = 0
+        self._watch_end = 0
+        # Raised after dynamic memory has been replaced by a restart, restore or undo.
+        self.on_reset = Event[EventArgs]()
         if self._version <= 3:
             # Split screen available.
             self.flags1_mask = 0x20
@@ -26,6 +38,11 @@ class MemoryMap:
     def static_memory_base_addr(self) -> int:
         return self.config.static_memory_base_addr
 
+    @property
+    def view(self) -> memoryview:
+        """A read-only view of the whole memory map."""
+        return self._view
+
     def __getitem__(self, item: int | slice):
         if isinstance(item, slice):
             return self._memory_map[item.start:item.stop:item.step]
@@ -70,6 +87,17 @@ class MemoryMap:
         if addr >= self.config.static_memory_base_addr:
             raise IllegalWriteException(addr)
         self._memory_map[addr] = val & 0xff
+        if self._watch_start <= addr < self._watch_end:
+            self.notify_write_watchers(addr, 1)
+
+    def write_byte_unwatched(self, addr: int, val: int):
+        """Write a byte without calling the write watchers. For a watcher writing memory
+        that isn't part of the copy it keeps (e.g. attribute flags in the object entries)."""
+        if logger.isEnabledFor(LogLevel.DEBUG):
+            logger.debug(f"WRITE 0x{addr:04X} = 0x{val:02X}")
+        if addr >= self.config.static_memory_base_addr:
+            raise IllegalWriteException(addr)
+        self._memory_map[addr] = val & 0xff
 
     def write_word(self, addr: int, val: int):
         if logger.isEnabledFor(LogLevel.DEBUG):
@@ -78,6 +106,29 @@ class MemoryMap:
             raise IllegalWriteException(addr)
         self._memory_map[addr] = val >> 8 & 0xff
         self._memory_map[addr + 1] = val & 0xff
+        if self._watch_start <= addr + 1 and addr < self._watch_end:
+            self.notify_write_watchers(addr, 2)
+
+    def write_bytes(self, addr: int, data: bytes | bytearray):
+        """Write a block of bytes with a single bounds check."""
+        if logger.isEnabledFor(LogLevel.DEBUG):
+            logger.debug(f"WRITE 0x{addr:04X}:0x{addr + len(data) - 1:04X} = {data.hex()}")
+        if addr + len(data) > self.config.static_memory_base_addr:
+            raise IllegalWriteException(addr)
+        self._memory_map[addr:addr + len(data)] = data
+        if self._watch_start < addr + len(data) and addr < self._watch_end:
+            self.notify_write_watchers(addr, len(data))
+
+    def watch_writes(self, start: int, end: int, callback: Callable[[int, int], None]):
+        """Call back with (address, length) whenever memory in [start, end) is written."""
+        self._write_watchers += [(start, end, callback)]
+        self._watch_start = min(start for start, _, _ in self._write_watchers)
+        self._watch_end = max(end for _, end, _ in self._write_watchers)
+
+    def notify_write_watchers(self, addr: int, length: int):
+        for start, end, callback in self._write_watchers:
+            if start < addr + length and addr < end:
+                callback(addr, length)
 
     def reset_dynamic_memory(self, dynamic_mem: bytes):
         # To be called after restart or restore.
@@ -95,6 +146,7 @@ class MemoryMap:
         self.write_word(0x10, flags2 & flags2_mask)
         for addr, val in restore_values.items():
             self.write_word(addr, val)
+        self.on_reset.invoke(self, EventArgs())
 
     def set_screen_flags(self):
         flags1 = self.read_byte(0x1)
@@ -1,20 +1,72 @@
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass
+from typing import Callable
 from .memory import MemoryMap
+from .event import EventArgs
 from .error import *
 
 
-class ObjectTable:
+@dataclass(frozen=True)
+class ObjectState:
+    """A copy of one object's entry and property values, as returned by the bulk queries."""
+    parent: int
+    sibling: int
+    child: int
+    # Attribute 0 is the most significant bit, as in the object entry.
+    attributes: int
+    properties: dict[int, bytes]
+
+
+class ObjectTable(ABC):
+    """Object table logic shared by all versions.
+    The version-specific layout is provided by ObjectTableV3 and ObjectTableV4Plus."""
+    PROPERTY_DEFAULTS_LENGTH: int = 0
+    OBJECT_BYTES: int = 0
+    MAX_OBJECTS: int = 0
+    ATTRIBUTE_FLAGS: int = 0
+    PARENT_OFFSET: int = 0
+    SIBLING_OFFSET: int = 0
+    CHILD_OFFSET: int = 0
+    # Parent, sibling and child are bytes in version 3 and words in later versions.
+    # The accessors are bound by the subclass before the tree is loaded.
+    _read_tree_field: Callable[[int], int]
+    _write_tree_field: Callable[[int, int], None]
+
     def __init__(self, memory_map: MemoryMap):
         self.memory_map = memory_map
         self.config = memory_map.config
         self.version = self.config.version
         self.OBJECT_TABLE = self.config.object_table_addr
-        self.PROPERTY_DEFAULTS_LENGTH = 31 if self.version <= 3 else 63
-        self.OBJECT_BYTES = 9 if self.version <= 3 else 14
-        self.MAX_OBJECTS = 0xff if self.version <= 3 else 0xffff
-        self.ATTRIBUTE_FLAGS = 32 if self.version <= 3 else 48
-        self.PARENT_OFFSET = 4 if self.version <= 3 else 6
-        self.SIBLING_OFFSET = 5 if self.version <= 3 else 8
-        self.CHILD_OFFSET = 6 if self.version <= 3 else 10
+        # The layout of each property table is fixed when the story is compiled,
+        # only the property values change at runtime. An object's property list
+        # is walked once, the first time it is needed, and the result is cached.
+        self._property_index: dict[int, dict[int, tuple[int, int]]] = {}
+        # The property after each one in the table, for get_next_property_num. 0 maps to the
+        # first property, and the last property maps to 0.
+        self._next_property_nums: dict[int, dict[int, int]] = {}
+        # Attribute flags are tested directly against the memory buffer, with the
+        # byte offset and bit mask of each attribute worked out up front.
+        self._view = memory_map.view
+        self._attribute_bytes = self.ATTRIBUTE_FLAGS >> 3
+        self._attribute_masks = [(attr_num >> 3, 0x80 >> (attr_num & 0x7)) for attr_num in range(self.ATTRIBUTE_FLAGS)]
+        # Shadow copies of the object tree, indexed by object ID. Writes go to the memory
+        # map, which calls back to refresh the shadow copies. This also picks up direct
+        # writes to the object entries by the game (e.g. with storeb/storew).
+        self._entries_addr = self.OBJECT_TABLE + self.PROPERTY_DEFAULTS_LENGTH * 2
+        self.object_count = self.count_objects()
+        self._obj_addrs = [0] + [self._entries_addr + self.OBJECT_BYTES * i for i in range(self.object_count)]
+        self._parents = array('H', [0] * (self.object_count + 1))
+        self._siblings = array('H', [0] * (self.object_count + 1))
+        self._children = array('H', [0] * (self.object_count + 1))
+        self.load_object_tree()
+        # Raw object entry and property bytes as of the last call to get_changed_objects().
+        self._last_seen: list[bytes | None] = [None] * (self.object_count + 1)
+        memory_map.watch_writes(
+            self._entries_addr,
+            self._entries_addr + self.object_count * self.OBJECT_BYTES,
+            self.on_object_entry_write)
+        memory_map.on_reset += self.on_memory_reset_handler
 
     def read_byte(self, addr: int) -> int:
         return self.memory_map.read_byte(addr)
@@ -32,11 +84,11 @@ class ObjectTable:
         self.memory_map.write_word(addr, val)
 
     def get_obj_addr(self, obj_id: int) -> int:
+        if 0 < obj_id <= self.object_count:
+            return self._obj_addrs[obj_id]
         if obj_id <= 0 or obj_id > self.MAX_OBJECTS:
             raise InvalidMemoryException(f"Object ID '{obj_id}' out of range")
-        obj_addr = self.OBJECT_TABLE + \
-            self.PROPERTY_DEFAULTS_LENGTH * 2 + \
-            self.OBJECT_BYTES * (obj_id - 1)
+        obj_addr = self._entries_addr + self.OBJECT_BYTES * (obj_id - 1)
         # HACK: Beyond Zork was shipped with a bug where the dictionary entry for an object
         # was encoded instead of the object ID. This would put the object address outside of the
         # bounds of the file. The official interpreter would return 0 in this case, which
@@ -45,28 +97,44 @@ class ObjectTable:
             obj_addr = 0
         return obj_addr
 
+    def get_attributes(self, obj_id: int) -> int:
+        """Return the attribute flags of the given object as one integer.
+        Attribute 0 is the most significant bit, as in the object entry."""
+        addr = self.get_obj_addr(obj_id)
+        return int.from_bytes(self._view[addr:addr + self._attribute_bytes], "big")
+
     def get_attribute_flag(self, obj_id: int, attr_num: int) -> bool:
         if attr_num < 0 or attr_num >= self.ATTRIBUTE_FLAGS:
             raise InvalidArgumentException(f'Invalid attribute: {attr_num}')
-        byte_offset = attr_num >> 3
-        bit_offset = attr_num & 0x7
-        attr_flag = 0x80 >> bit_offset
-        obj_addr = self.get_obj_addr(obj_id)
-        return self.read_byte(obj_addr + byte_offset) & attr_flag == attr_flag
+        byte_offset, attr_flag = self._attribute_masks[attr_num]
+        if 0 < obj_id <= self.object_count:
+            return self._view[self._obj_addrs[obj_id] + byte_offset] & attr_flag != 0
+        return self.read_byte(self.get_obj_addr(obj_id) + byte_offset) & attr_flag != 0
 
     def set_attribute_flag(self, obj_id: int, attr_num: int, value: bool):
-        if attr_num >= self.ATTRIBUTE_FLAGS:
+        if attr_num < 0 or attr_num >= self.ATTRIBUTE_FLAGS:
             raise InvalidArgumentException(f'Invalid attribute: {attr_num}')
-        byte_offset = attr_num >> 3
-        bit_offset = attr_num & 0x7
-        attr_flag = 0x80 >> bit_offset
-        obj_addr = self.get_obj_addr(obj_id)
-        attribute_byte = self.read_byte(obj_addr + byte_offset)
+        byte_offset, attr_flag = self._attribute_masks[attr_num]
+        if 0 < obj_id <= self.object_count:
+            attr_addr = self._obj_addrs[obj_id] + byte_offset
+        else:
+            attr_addr = self.get_obj_addr(obj_id) + byte_offset
+        attribute_byte = self._view[attr_addr]
         if value:
             attribute_byte |= attr_flag
         else:
-            attribute_byte &= (~attr_flag & 0xff)
-        self.write_byte(obj_addr + byte_offset, attribute_byte)
+            attribute_byte &= ~attr_flag
+        # Attributes aren't part of the shadow copies of the tree, so there's nothing to refresh.
+        self.memory_map.write_byte_unwatched(attr_addr, attribute_byte)
+
+    def find_objects_with_attribute(self, attr_num: int) -> list[int]:
+        """Return the IDs of all objects that have the given attribute set."""
+        if attr_num < 0 or attr_num >= self.ATTRIBUTE_FLAGS:
+            raise InvalidArgumentException(f'Invalid attribute: {attr_num}')
+        view = self._view
+        byte_offset, attr_flag = self._attribute_masks[attr_num]
+        obj_addrs = self._obj_addrs
+        return [obj_id for obj_id in range(1, self.object_count + 1) if view[obj_addrs[obj_id] + byte_offset] & attr_flag]
 
     def get_object_text_zchars(self, obj_id: int) -> list[int]:
         obj_addr = self.get_obj_addr(obj_id)
@@ -79,44 +147,71 @@ class ObjectTable:
             result[3*i:3*i+3] = [(word >> 10) & 0x1f, (word >> 5) & 0x1f, word & 0x1f]
         return result
 
+    def count_objects(self) -> int:
+        # The number of objects isn't stored in the story file. The object entries
+        # are followed by the property tables, so count entries up to the lowest
+        # property table address.
+        obj_addr = self._entries_addr
+        lowest_prop_addr = self.config.static_memory_base_addr
+        count = 0
+        while obj_addr + self.OBJECT_BYTES <= lowest_prop_addr and count < self.MAX_OBJECTS:
+            prop_addr = self.read_word(obj_addr + self.OBJECT_BYTES - 2)
+            if obj_addr < prop_addr < lowest_prop_addr:
+                lowest_prop_addr = prop_addr
+            count += 1
+            obj_addr += self.OBJECT_BYTES
+        return count
+
+    def load_object_tree(self, first_id: int = 1, last_id: int | None = None):
+        """Refresh the shadow copies of the object tree from memory."""
+        if last_id is None:
+            last_id = self.object_count
+        for obj_id in range(first_id, last_id + 1):
+            obj_addr = self._obj_addrs[obj_id]
+            self._parents[obj_id] = self._read_tree_field(obj_addr + self.PARENT_OFFSET)
+            self._siblings[obj_id] = self._read_tree_field(obj_addr + self.SIBLING_OFFSET)
+            self._children[obj_id] = self._read_tree_field(obj_addr + self.CHILD_OFFSET)
+
+    def on_object_entry_write(self, addr: int, length: int):
+        first_id = max((addr - self._entries_addr) // self.OBJECT_BYTES + 1, 1)
+        last_id = min((addr + length - 1 - self._entries_addr) // self.OBJECT_BYTES + 1, self.object_count)
+        self.load_object_tree(first_id, last_id)
+        # The property table pointer is the last word of the entry. If it moves, the object's
+        # property index is out of date.
+        for obj_id in range(first_id, last_id + 1):
+            pointer_addr = self._obj_addrs[obj_id] + self.OBJECT_BYTES - 2
+            if addr < pointer_addr + 2 and pointer_addr < addr + length:
+                self._property_index.pop(obj_id, None)
+                self._next_property_nums.pop(obj_id, None)
+
+    def on_memory_reset_handler(self, sender, e: EventArgs):
+        self.load_object_tree()
+        self._property_index.clear()
+        self._next_property_nums.clear()
+
     def get_object_parent_id(self, obj_id: int) -> int:
-        obj_addr = self.get_obj_addr(obj_id)
-        if self.version <= 3:
-            return self.read_byte(obj_addr + self.PARENT_OFFSET)
-        return self.read_word(obj_addr + self.PARENT_OFFSET)
+        if 0 < obj_id <= self.object_count:
+            return self._parents[obj_id]
+        return self._read_tree_field(self.get_obj_addr(obj_id) + self.PARENT_OFFSET)
 
     def set_object_parent_id(self, obj_id: int, val: int):
-        obj_addr = self.get_obj_addr(obj_id)
-        if self.version <= 3:
-            self.write_byte(obj_addr + self.PARENT_OFFSET, val)
-        else:
-            self.write_word(obj_addr + self.PARENT_OFFSET, val)
+        self._write_tree_field(self.get_obj_addr(obj_id) + self.PARENT_OFFSET, val)
 
     def get_object_sibling_id(self, obj_id: int) -> int:
-        obj_addr = self.get_obj_addr(obj_id)
-        if self.version <= 3:
-            return self.read_byte(obj_addr + self.SIBLING_OFFSET)
-        return self.read_word(obj_addr + self.SIBLING_OFFSET)
+        if 0 < obj_id <= self.object_count:
+            return self._siblings[obj_id]
+        return self._read_tree_field(self.get_obj_addr(obj_id) + self.SIBLING_OFFSET)
 
     def set_object_sibling_id(self, obj_id: int, val: int):
-        obj_addr = self.get_obj_addr(obj_id)
-        if self.version <= 3:
-            self.write_byte(obj_addr + self.SIBLING_OFFSET, val)
-        else:
-            self.write_word(obj_addr + self.SIBLING_OFFSET, val)
+        self._write_tree_field(self.get_obj_addr(obj_id) + self.SIBLING_OFFSET, val)
 
     def get_object_child_id(self, obj_id: int) -> int:
-        obj_addr = self.get_obj_addr(obj_id)
-        if self.version <= 3:
-            return self.read_byte(obj_addr + self.CHILD_OFFSET)
-        return self.read_word(obj_addr + self.CHILD_OFFSET)
+        if 0 < obj_id <= self.object_count:
+            return self._children[obj_id]
+        return self._read_tree_field(self.get_obj_addr(obj_id) + self.CHILD_OFFSET)
 
     def set_object_child_id(self, obj_id: int, val: int):
-        obj_addr = self.get_obj_addr(obj_id)
-        if self.version <= 3:
-            self.write_byte(obj_addr + self.CHILD_OFFSET, val)
-        else:
-            self.write_word(obj_addr + self.CHILD_OFFSET, val)
+        self._write_tree_field(self.get_obj_addr(obj_id) + self.CHILD_OFFSET, val)
 
     def orphan_object(self, obj_id: int):
         parent_id = self.get_object_parent_id(obj_id)
@@ -148,32 +243,17 @@ class ObjectTable:
             raise InvalidArgumentException(f"property id: {prop_id}")
         return self.read_word(self.OBJECT_TABLE + (prop_id - 1) * 2)
 
+    @abstractmethod
     def get_property_num(self, prop_addr: int) -> int:
-        size_byte = self.read_byte(prop_addr - 1)
-        if self.version <= 3:
-            return size_byte & 0x1f
-        if size_byte >= 0x80:
-            return self.read_byte(prop_addr - 2) & 0x3f
-        return size_byte & 0x3f
+        pass
 
+    @abstractmethod
     def get_property_data_len(self, prop_addr: int) -> int:
-        size_byte = self.read_byte(prop_addr - 1)
-        if self.version <= 3:
-            return (size_byte >> 5) + 1
-        if size_byte >= 0x80:
-            size = size_byte & 0x3f
-            if size == 0:
-                size = 64
-            return size
-        return (size_byte >> 6) + 1
+        pass
 
+    @abstractmethod
     def get_prop_data_addr(self, prop_header_addr: int) -> int | None:
-        size_byte = self.read_byte(prop_header_addr)
-        if size_byte == 0:
-            return None
-        if self.version <= 3 or size_byte < 0x80:
-            return prop_header_addr + 1
-        return prop_header_addr + 2
+        pass
 
     def get_first_property_addr(self, obj_id: int) -> int | None:
         obj_addr = self.get_obj_addr(obj_id)
@@ -186,36 +266,53 @@ class ObjectTable:
         next_prop_addr = prop_addr + self.get_property_data_len(prop_addr)
         return self.get_prop_data_addr(next_prop_addr)
 
-    def get_next_property_num(self, obj_id: int, prop_id: int) -> int:
-        if prop_id == 0:
+    def get_property_index(self, obj_id: int) -> dict[int, tuple[int, int]]:
+        """Return a mapping of property number to (data address, data length) for the given object."""
+        index = self._property_index.get(obj_id)
+        if index is None:
+            index = {}
+            next_nums = {}
+            prev_num = 0
             prop_addr = self.get_first_property_addr(obj_id)
-        else:
-            prop_addr = self.get_property_addr(obj_id, prop_id)
-            if prop_addr is None:
-                raise InvalidArgumentException(f'Object {obj_id} does not have property {prop_id}')
-            prop_addr = self.get_next_property_addr(prop_addr)
-        if prop_addr is None:
-            return 0
-        return self.get_property_num(prop_addr)
+            while prop_addr is not None:
+                prop_num = self.get_property_num(prop_addr)
+                data_len = self.get_property_data_len(prop_addr)
+                if prop_num not in index:
+                    index[prop_num] = (prop_addr, data_len)
+                    next_nums[prev_num] = prop_num
+                    prev_num = prop_num
+                prop_addr = self.get_prop_data_addr(prop_addr + data_len)
+            next_nums[prev_num] = 0
+            self._property_index[obj_id] = index
+            self._next_property_nums[obj_id] = next_nums
+        return index
+
+    def get_next_property_num(self, obj_id: int, prop_id: int) -> int:
+        next_nums = self._next_property_nums.get(obj_id)
+        if next_nums is None:
+            self.get_property_index(obj_id)
+            next_nums = self._next_property_nums[obj_id]
+        # Properties follow each other in the same (descending) order as the property table.
+        next_num = next_nums.get(prop_id)
+        if next_num is None:
+            raise InvalidArgumentException(f'Object {obj_id} does not have property {prop_id}')
+        return next_num
 
     def get_property_addr(self, obj_id: int, prop_id: int) -> int | None:
         if prop_id <= 0 or prop_id > self.PROPERTY_DEFAULTS_LENGTH:
             raise InvalidArgumentException(f"Invalid property id: {prop_id}")
-        prop_addr = self.get_first_property_addr(obj_id)
-        while prop_addr is not None:
-            property_num = self.get_property_num(prop_addr)
-            if property_num == prop_id:
-                return prop_addr
-            if property_num < prop_id:
-                break
-            prop_addr = self.get_next_property_addr(prop_addr)
-        return None
+        entry = self.get_property_index(obj_id).get(prop_id)
+        if entry is None:
+            return None
+        return entry[0]
 
     def get_property_data(self, obj_id: int, prop_id: int) -> int:
-        prop_addr = self.get_property_addr(obj_id, prop_id)
-        if prop_addr is None:
+        if prop_id <= 0 or prop_id > self.PROPERTY_DEFAULTS_LENGTH:
+            raise InvalidArgumentException(f"Invalid property id: {prop_id}")
+        entry = self.get_property_index(obj_id).get(prop_id)
+        if entry is None:
             return self.get_default_property_data(prop_id)
-        size = self.get_property_data_len(prop_addr)
+        prop_addr, size = entry
         if size == 1:
             return self.read_byte(prop_addr)
         if size == 2:
@@ -223,13 +320,129 @@ class ObjectTable:
         raise InvalidObjectStateException("Invalid size for reading property data")
 
     def set_property_data(self, obj_id: int, prop_id: int, val: int):
-        prop_addr = self.get_property_addr(obj_id, prop_id)
-        if prop_addr is None:
+        if prop_id <= 0 or prop_id > self.PROPERTY_DEFAULTS_LENGTH:
+            raise InvalidArgumentException(f"Invalid property id: {prop_id}")
+        entry = self.get_property_index(obj_id).get(prop_id)
+        if entry is None:
             raise InvalidObjectStateException(f"Property {prop_id} does not exist in object {obj_id}")
-        size = self.get_property_data_len(prop_addr)
+        prop_addr, size = entry
         if size == 1:
             self.write_byte(prop_addr, val)
         elif size == 2:
             self.write_word(prop_addr, val)
         else:
             raise InvalidObjectStateException("Invalid size for writing property data")
+
+    def get_object_tree(self) -> tuple[list[int], list[int], list[int]]:
+        """Return the parent, sibling and child of every object as three lists indexed by object ID."""
+        return self._parents.tolist(), self._siblings.tolist(), self._children.tolist()
+
+    def get_attribute_masks(self) -> list[int]:
+        """Return the attributes of every object as one integer per object, indexed by object ID.
+        Attribute 0 is the most significant bit, as in the object entry."""
+        view = self._view
+        size = self._attribute_bytes
+        return [0] + [int.from_bytes(view[addr:addr + size], "big") for addr in self._obj_addrs[1:]]
+
+    def get_all_properties(self) -> dict[int, dict[int, bytes]]:
+        """Return the property data of every object, keyed by object ID and then property number.
+        Properties are listed in the same order as the property table."""
+        view = self._view
+        return {
+            obj_id: {prop_num: bytes(view[addr:addr + size]) for prop_num, (addr, size) in self.get_property_index(obj_id).items()}
+            for obj_id in range(1, self.object_count + 1)
+        }
+
+    def get_object_states(self) -> dict[int, ObjectState]:
+        """Return the state of every object, keyed by object ID."""
+        view = self._view
+        return {obj_id: self._read_object_state(view, obj_id) for obj_id in range(1, self.object_count + 1)}
+
+    def get_changed_objects(self) -> dict[int, ObjectState]:
+        """Return the state of the objects that changed since the previous call, keyed by object ID.
+        The first call returns every object."""
+        view = self._view
+        entry_len = self.OBJECT_BYTES
+        changed = {}
+        for obj_id in range(1, self.object_count + 1):
+            addr = self._obj_addrs[obj_id]
+            raw = bytes(view[addr:addr + entry_len]) + b''.join(
+                view[prop_addr:prop_addr + size] for prop_addr, size in self.get_property_index(obj_id).values())
+            if raw != self._last_seen[obj_id]:
+                self._last_seen[obj_id] = raw
+                changed[obj_id] = self._read_object_state(view, obj_id)
+        return changed
+
+    def _read_object_state(self, view: memoryview, obj_id: int) -> ObjectState:
+        addr = self._obj_addrs[obj_id]
+        return ObjectState(
+            self._parents[obj_id],
+            self._siblings[obj_id],
+            self._children[obj_id],
+            int.from_bytes(view[addr:addr + self._attribute_bytes], "big"),
+            {prop_num: bytes(view[prop_addr:prop_addr + size]) for prop_num, (prop_addr, size) in self.get_property_index(obj_id).items()}
+        )
+
+
+class ObjectTableV3(ObjectTable):
+    PROPERTY_DEFAULTS_LENGTH = 31
+    OBJECT_BYTES = 9
+    MAX_OBJECTS = 0xff
+    ATTRIBUTE_FLAGS = 32
+    PARENT_OFFSET = 4
+    SIBLING_OFFSET = 5
+    CHILD_OFFSET = 6
+
+    def __init__(self, memory_map: MemoryMap):
+        self._read_tree_field = memory_map.read_byte
+        self._write_tree_field = memory_map.write_byte
+        super().__init__(memory_map)
+
+    def get_property_num(self, prop_addr: int) -> int:
+        return self.read_byte(prop_addr - 1) & 0x1f
+
+    def get_property_data_len(self, prop_addr: int) -> int:
+        return (self.read_byte(prop_addr - 1) >> 5) + 1
+
+    def get_prop_data_addr(self, prop_header_addr: int) -> int | None:
+        if self.read_byte(prop_header_addr) == 0:
+            return None
+        return prop_header_addr + 1
+
+
+class ObjectTableV4Plus(ObjectTable):
+    PROPERTY_DEFAULTS_LENGTH = 63
+    OBJECT_BYTES = 14
+    MAX_OBJECTS = 0xffff
+    ATTRIBUTE_FLAGS = 48
+    PARENT_OFFSET = 6
+    SIBLING_OFFSET = 8
+    CHILD_OFFSET = 10
+
+    def __init__(self, memory_map: MemoryMap):
+        self._read_tree_field = memory_map.read_word
+        self._write_tree_field = memory_map.write_word
+        super().__init__(memory_map)
+
+    def get_property_num(self, prop_addr: int) -> int:
+        size_byte = self.read_byte(prop_addr - 1)
+        if size_byte >= 0x80:
+            return self.read_byte(prop_addr - 2) & 0x3f
+        return size_byte & 0x3f
+
+    def get_property_data_len(self, prop_addr: int) -> int:
+        size_byte = self.read_byte(prop_addr - 1)
+        if size_byte >= 0x80:
+            size = size_byte & 0x3f
+            if size == 0:
+                size = 64
+            return size
+        return (size_byte >> 6) + 1
+
+    def get_prop_data_addr(self, prop_header_addr: int) -> int | None:
+        size_byte = self.read_byte(prop_header_addr)
+        if size_byte == 0:
+            return None
+        if size_byte < 0x80:
+            return prop_header_addr + 1
+        return prop_header_addr + 2
@@ -1,4 +1,3 @@
-import random
 import time
 from typing import Protocol, runtime_checkable
 from functools import wraps
@@ -555,11 +554,11 @@ def op_random(zm: IZMachineInterpreter, *operands: int):
     r = operands[0]
     result = 0
     if r > 0:
-        result = random.randint(1, r)
+        result = zm.rng.randint(1, r)
     elif r < 0:
-        random.seed(r)
+        zm.rng.seed(r)
     else:
-        random.seed(round(time.time() * 1000) % 1000)
+        zm.rng.seed(round(time.time() * 1000) % 1000)
     zm.do_store(result)
 
 
@@ -6,6 +6,8 @@ from .protocol import IScreen, ITerminalAdapter, IOutputStream, IMemoryOutputStr
 from .event import EventManager, EventArgs, PostReadInputEventArgs
 from .enums import WindowPosition, OutputStreamType
 from .error import StreamException
+from .filewriter import BufferedFileWriter
+from .constants import FILE_FLUSH_INTERVAL_SECONDS
 from .logging import output_logger as logger
 
 
@@ -16,12 +18,15 @@ class OutputStreamManager:
                  terminal_adapter: ITerminalAdapter, 
                  config: ZMachineConfig,
                  runtime_settings: RuntimeSettings,
-                 event_manager: EventManager
+                 event_manager: EventManager,
+                 flush_interval_seconds: float = FILE_FLUSH_INTERVAL_SECONDS,
+                 background_writer: bool = False
                 ):
         self._screen_stream = ScreenStream(screen)
-        self._transcript_stream = TranscriptStream(config, runtime_settings, screen, terminal_adapter)
+        self._transcript_stream = TranscriptStream(
+            config, runtime_settings, screen, terminal_adapter, flush_interval_seconds, background_writer)
         self._memory_stream = MemoryStream(memory_map)
-        self._record_stream = RecordStream()
+        self._record_stream = RecordStream(flush_interval_seconds, background_writer)
         self.streams = {
             OutputStreamType.SCREEN: self._screen_stream,
             OutputStreamType.TRANSCRIPT: self._transcript_stream,
@@ -101,21 +106,33 @@ class ScreenStream(OutputStream):
 
 
 class TranscriptStream(OutputStream):
-    _BUFFER_LENGTH = 1024
-
-    def __init__(self, config: ZMachineConfig, runtime_settings: RuntimeSettings, screen: IScreen, terminal_adapter: ITerminalAdapter):
+    def __init__(self,
+                 config: ZMachineConfig,
+                 runtime_settings: RuntimeSettings,
+                 screen: IScreen,
+                 terminal_adapter: ITerminalAdapter,
+                 flush_interval_seconds: float = FILE_FLUSH_INTERVAL_SECONDS,
+                 background_writer: bool = False):
         super().__init__()
         self.config = config
         self.runtime_settings = runtime_settings
         self.screen = screen
         self.terminal_adapter = terminal_adapter
-        self.buffer: list[str] = ['\0'] * self._BUFFER_LENGTH
+        # Text is kept as a list of chunks and joined once when flushed.
+        # buffer_ptr is the number of characters in the buffer.
+        self.buffer: list[str] = []
         self.buffer_ptr: int = 0
         self.script_full_path: str | None = None
         self.script_file_mode: str = 'w'
         self.transcript_full_path: str | None = None
+        # The transcript file is kept open from the first flush until the stream is closed.
+        self.flush_interval_seconds = flush_interval_seconds
+        self.background_writer = background_writer
+        self.writer: BufferedFileWriter | None = None
 
     def open(self):
+        if self.script_full_path is None and not self.runtime_settings.file_prompts_enabled:
+            return
         self.is_active = True
         if self.script_full_path is None:
             self.script_full_path = self.prompt_transcript_file()
@@ -126,21 +143,28 @@ class TranscriptStream(OutputStream):
         if not self.is_active or self.screen.active_window_id != WindowPosition.LOWER:
             return
         if self.script_full_path is None:
+            if not self.runtime_settings.file_prompts_enabled:
+                # The game set the transcript bit itself; turn it back off.
+                self.runtime_settings.transcript_active_flag = False
+                self.is_active = False
+                return
             self.script_full_path = self.prompt_transcript_file()
-        text_len = len(text)
-        while self.buffer_ptr + text_len + 1 >= len(self.buffer):
-            self.buffer += ['\0'] * self._BUFFER_LENGTH
-        prev_ptr = self.buffer_ptr
-        next_ptr = self.buffer_ptr + text_len
-        self.buffer[prev_ptr:next_ptr] = text
+        self.buffer.append(text)
+        self.buffer_ptr += len(text)
         if newline:
-            self.buffer[next_ptr] = "\n"
-            next_ptr += 1
-        self.buffer_ptr = next_ptr
+            self.buffer.append("\n")
+            self.buffer_ptr += 1
 
     def close(self):
         super().close()
         self.runtime_settings.transcript_active_flag = False
+        self.flush_buffer()
+        self.close_writer()
+
+    def close_writer(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
 
     def register_delegates(self, event_manager):
         super().register_delegates(event_manager)
@@ -152,11 +176,14 @@ class TranscriptStream(OutputStream):
         # File output is not word wrapped.
         if self.buffer_ptr == 0:
             return
-        text = ''.join(self.buffer[:self.buffer_ptr])
+        text = ''.join(self.buffer)
         if self.script_full_path is not None:
-            with open(self.script_full_path, self.script_file_mode) as s:
-                s.write(text)
-            self.script_file_mode = 'a'
+            if self.writer is None:
+                self.writer = BufferedFileWriter(
+                    self.script_full_path, self.script_file_mode, self.flush_interval_seconds, self.background_writer)
+                self.script_file_mode = 'a'
+            self.writer.write(text)
+        self.buffer.clear()
         self.buffer_ptr = 0
 
     def prompt_transcript_file(self) -> str:
@@ -186,18 +213,25 @@ class TranscriptStream(OutputStream):
 
     def on_quit_handler(self, sender, e: EventArgs):
         self.flush_buffer()
+        self.close_writer()
 
 
 class MemoryStream(OutputStream):
+    # Newlines are written to the table as ZSCII carriage returns.
+    ZSCII_TRANSLATION = str.maketrans('\n', '\r')
+
     def __init__(self, memory_map: MemoryMap):
         super().__init__()
-        self.BUFFER_LEN = 256
         self.memory_map = memory_map
         self.table_stack = [(0, 0)] * 16
-        self.buffer = [0] * self.BUFFER_LEN
-        self.buffer_ptr = 0
+        # Output for all the open tables, each starting where it was when the table was opened.
+        self.buffer = bytearray()
         self.stack_ptr = 0
 
+    @property
+    def buffer_ptr(self) -> int:
+        return len(self.buffer)
+
     def open(self, table_addr: int):
         self.is_active = True
         logger.info(f"Opening memory stream for table at address {table_addr:x}")
@@ -207,47 +241,52 @@ class MemoryStream(OutputStream):
         self.stack_ptr += 1
 
     def write(self, text: str, newline: bool):
-        # Add to the output buffer if necessary.
-        if self.buffer_ptr + len(text) >= len(self.buffer):
-            self.buffer += [0] * self.BUFFER_LEN
-        for c in text:
-            zscii_code = ord(c)
-            if zscii_code == 10:
-                zscii_code = 13
-            self.buffer[self.buffer_ptr] = zscii_code
-            self.buffer_ptr += 1
+        # Text is decoded one character per ZSCII code, so latin-1 gives the codes back.
+        self.buffer += text.translate(self.ZSCII_TRANSLATION).encode('latin-1', errors='replace')
 
     def close(self):
         if not self.is_active:
             raise StreamException("Memory stream is already closed")
         self.stack_ptr -= 1
         table_addr, buffer_start = self.table_stack[self.stack_ptr]
-        buffer_len = self.buffer_ptr - buffer_start
-        self.memory_map.write_word(table_addr, buffer_len)
-        for i in range(buffer_len):
-            self.memory_map.write_byte(table_addr + i + 2, self.buffer[buffer_start + i])
-        self.buffer_ptr = buffer_start
+        self.memory_map.write_word(table_addr, self.buffer_ptr - buffer_start)
+        self.memory_map.write_bytes(table_addr + 2, self.buffer[buffer_start:])
+        del self.buffer[buffer_start:]
         if self.stack_ptr == 0:
             self.is_active = False
 
 class RecordStream(OutputStream):
-    def __init__(self):
+    def __init__(self, flush_interval_seconds: float = FILE_FLUSH_INTERVAL_SECONDS, background_writer: bool = False):
         super().__init__()
         self.record_full_path = ''
+        self.flush_interval_seconds = flush_interval_seconds
+        self.background_writer = background_writer
+        self.writer: BufferedFileWriter | None = None
 
     def register_delegates(self, event_manager: EventManager):
         event_manager.post_read_input += self.post_read_input_handler
+        event_manager.on_quit += self.on_quit_handler
 
     def open(self, record_file_path: str):
         self.is_active = True
         self.record_full_path = record_file_path
+        # The file is kept open while recording, rather than opened for each command.
+        self.writer = BufferedFileWriter(record_file_path, 'a', self.flush_interval_seconds, self.background_writer)
+
+    def close(self):
+        super().close()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
 
     def post_read_input_handler(self, sender, e: PostReadInputEventArgs):
-        if not self.is_active:
+        if not self.is_active or self.writer is None:
             return
-        with open(self.record_full_path, 'a') as s:
-            if e.command is not None:
-                s.write(e.command)
-            if e.command is None or e.terminating_char != 13:
-                s.write(f'[{e.terminating_char}]')
-            s.write("\n")
\ No newline at end of file
+        line = e.command if e.command is not None else ''
+        if e.command is None or e.terminating_char != 13:
+            line += f'[{e.terminating_char}]'
+        self.writer.write(line + "\n")
+
+    def on_quit_handler(self, sender, e: EventArgs):
+        if self.is_active:
+            self.close()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import os
+import struct
+from array import array
+from typing import Iterator
+from .error import PlaybackFileException
+
+
+class PlaybackReader:
+    """Reads a recorded command file one command at a time.
+    The header is read and checked when the reader is created. Commands are read
+    lazily, so a recording of any length is played back in constant memory.
+    seek() uses a sidecar index of command offsets, which is built on first use
+    and rebuilt when the recording changes."""
+    # Offset of every INDEX_STRIDE-th command is kept in the index.
+    INDEX_STRIDE = 256
+    INDEX_SUFFIX = '.idx'
+    # Magic, stride, command count, and the size and modification time of the recording.
+    _INDEX_HEADER = struct.Struct('<4sIQQQ')
+    _INDEX_MAGIC = b'ZRIX'
+
+    def __init__(self, playback_file_path: str):
+        self.path = playback_file_path
+        self.game: str | None = None
+        self.seed: int | None = None
+        self._file = open(playback_file_path, 'rb')
+        self._commands_offset = 0
+        self._command_index = 0
+        self._index: array | None = None
+        self._command_count = 0
+        try:
+            self._read_header()
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self) -> 'PlaybackReader':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self) -> Iterator[str]:
+        """Read the commands from the current position. The file is closed after the last one."""
+        while (line := self._file.readline()) != b'':
+            self._command_index += 1
+            yield self._parse_command(line)
+        self.close()
+
+    @property
+    def command_index(self) -> int:
+        """Number of the next command to be read."""
+        return self._command_index
+
+    @property
+    def command_count(self) -> int:
+        """Number of commands in the recording, from the index."""
+        self._load_index()
+        return self._command_count
+
+    def seek(self, command_index: int):
+        """Move to the given command, so that it's the next one read."""
+        index = self._load_index()
+        if not 0 <= command_index <= self._command_count:
+            raise PlaybackFileException(f"Command {command_index} is out of range.")
+        self._file.seek(index[command_index // self.INDEX_STRIDE])
+        for _ in range(command_index % self.INDEX_STRIDE):
+            self._file.readline()
+        self._command_index = command_index
+
+    def close(self):
+        self._file.close()
+
+    def _read_header(self):
+        while True:
+            line = self._file.readline().decode('utf-8')
+            if line.startswith('# SEED:'):
+                seed_str = line.split(':', 1)[1].strip()
+                if seed_str.isdigit():
+                    self.seed = int(seed_str)
+            elif line.startswith('# GAME:'):
+                self.game = line.split(':', 1)[1].strip()
+            elif line.startswith('---'):
+                break
+            else:
+                raise PlaybackFileException("Invalid playback file format.")
+        self._commands_offset = self._file.tell()
+        if self._file.read(1) == b'':
+            raise PlaybackFileException("Playback file is empty.")
+        self._file.seek(self._commands_offset)
+
+    @staticmethod
+    def _parse_command(line: bytes) -> str:
+        if line == b'\n':
+            return '\n'
+        return line.decode('utf-8').strip()
+
+    def _load_index(self) -> array:
+        if self._index is not None:
+            return self._index
+        stat = os.stat(self.path)
+        index_path = self.path + self.INDEX_SUFFIX
+        try:
+            with open(index_path, 'rb') as s:
+                magic, stride, count, size, mtime = self._INDEX_HEADER.unpack(s.read(self._INDEX_HEADER.size))
+                if (magic, stride, size, mtime) == (self._INDEX_MAGIC, self.INDEX_STRIDE, stat.st_size, stat.st_mtime_ns):
+                    index = array('Q')
+                    index.frombytes(s.read())
+                    if index.itemsize != 8:
+                        raise ValueError('Unsupported index item size')
+                    self._index, self._command_count = index, count
+                    return index
+        except (OSError, ValueError, struct.error):
+            pass
+        return self._build_index(index_path, stat)
+
+    def _build_index(self, index_path: str, stat: os.stat_result) -> array:
+        position = self._file.tell()
+        index = array('Q')
+        count = 0
+        with open(self.path, 'rb') as s:
+            s.seek(self._commands_offset)
+            offset = self._commands_offset
+            for line in s:
+                if count % self.INDEX_STRIDE == 0:
+                    index.append(offset)
+                offset += len(line)
+                count += 1
+        if count % self.INDEX_STRIDE == 0:
+            # Offset for seeking to the end.
+            index.append(offset)
+        self._index, self._command_count = index, count
+        self._file.seek(position)
+        header = self._INDEX_HEADER.pack(self._INDEX_MAGIC, self.INDEX_STRIDE, count, stat.st_size, stat.st_mtime_ns)
+        temp_path = f'{index_path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as s:
+                s.write(header)
+                s.write(index.tobytes())
+            os.replace(temp_path, index_path)
+        except OSError:
+            # The index is only a cache. Keep it in memory if it can't be saved.
+            pass
+        return index
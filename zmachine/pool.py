@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import struct
+from dataclasses import dataclass
+from .hibernate import capture_warm_start
+from .memory import MemoryMap
+from .text import TextUtils
+from .server import ZMachineServer
+from .story import StoryImage
+from .error import ZMachineException
+from .constants import DEFAULT_INSTRUCTION_BUDGET
+from .logging import server_logger as logger
+
+# Sent from the pool to a worker with each connection: the index of the story to play.
+_ASSIGN_MESSAGE = struct.Struct('<H')
+# Sent from a worker to the pool each time a session ends.
+_SESSION_ENDED = b'\x00'
+
+
+def preload_story(story_file: str) -> StoryImage:
+    """Load a story and fill its caches, by taking the warm start snapshot and indexing the dictionary."""
+    story = StoryImage.load(story_file)
+    capture_warm_start(story)
+    TextUtils(MemoryMap(story.config, story.data), story.dictionary_index).build_dictionary_index()
+    return story
+
+
+@dataclass
+class Worker:
+    pid: int
+    control: socket.socket
+    """ The pool's end of the socket pair used to hand connections to the worker."""
+    sessions: int = 0
+    """ Number of sessions assigned to the worker that haven't ended yet."""
+
+
+class SessionPool:
+    """Pre-forked worker processes, each hosting many sessions on its own event loop.
+    The stories are loaded and their caches filled in the parent before forking, so the
+    workers share them copy-on-write and a new session only has to copy dynamic memory.
+    Connections are accepted by the parent and handed to the worker with the fewest sessions.
+    A worker that has died is replaced when a connection can't be handed to it.
+    Requires os.fork, so it runs on Unix only."""
+    def __init__(self,
+                 story_files: list[str],
+                 worker_count: int | None = None,
+                 instruction_budget: int = DEFAULT_INSTRUCTION_BUDGET):
+        self.story_files = story_files
+        self.worker_count = worker_count or os.cpu_count() or 1
+        self.instruction_budget = instruction_budget
+        self.stories = {story_file: preload_story(story_file) for story_file in story_files}
+        self.workers: list[Worker] = []
+        # The socket the parent accepts connections on, which the workers don't need.
+        self.listener: socket.socket | None = None
+
+    def start(self, listener: socket.socket | None = None):
+        """Fork the workers. The listener, if given, is closed in each worker."""
+        self.listener = listener
+        for _ in range(self.worker_count):
+            self.workers.append(self.start_worker())
+
+    def start_worker(self) -> Worker:
+        control, worker_control = socket.socketpair()
+        # Keep the garbage collector from touching the shared objects in the worker,
+        # which would copy the pages they are in.
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            if self.listener is not None:
+                self.listener.close()
+            control.close()
+            for worker in self.workers:
+                worker.control.close()
+            exit_code = 0
+            try:
+                asyncio.run(self._run_worker(worker_control))
+            except KeyboardInterrupt:
+                pass
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()}: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        gc.unfreeze()
+        worker_control.close()
+        control.setblocking(False)
+        return Worker(pid, control)
+
+    def replace_worker(self, worker: Worker) -> Worker:
+        """Stop a worker, which has died or stopped responding, and start another in its place."""
+        worker.control.close()
+        try:
+            os.kill(worker.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(worker.pid, 0)
+        self.workers.remove(worker)
+        replacement = self.start_worker()
+        self.workers.append(replacement)
+        return replacement
+
+    def assign(self, connection: socket.socket, story_file: str | None = None) -> Worker:
+        """Hand a connected socket to the least loaded worker, which plays the given story on it.
+        If the worker has died, it's replaced and the next least loaded worker is tried.
+        The pool's copy of the socket is closed."""
+        story_index = 0 if story_file is None else self.story_files.index(story_file)
+        self.update_loads()
+        try:
+            candidates = sorted(self.workers, key=lambda w: w.sessions)
+            for worker in candidates:
+                try:
+                    socket.send_fds(worker.control, [_ASSIGN_MESSAGE.pack(story_index)], [connection.fileno()])
+                except BlockingIOError:
+                    # The worker has fallen behind with its connections. Leave it to catch up.
+                    continue
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.error(f"Worker {worker.pid} has died")
+                    replacement = self.replace_worker(worker)
+                    # Replacements are tried too, but only as many as there are workers,
+                    # in case they can't start either.
+                    if len(candidates) < 2 * len(self.workers):
+                        candidates.append(replacement)
+                    continue
+                worker.sessions += 1
+                return worker
+            raise ZMachineException("No worker could take the connection.")
+        finally:
+            connection.close()
+
+    def update_loads(self):
+        for worker in self.workers:
+            try:
+                while (ended := worker.control.recv(4096)) != b'':
+                    worker.sessions -= len(ended)
+            except BlockingIOError:
+                pass
+
+    def serve(self, listener: socket.socket, story_file: str | None = None):
+        """Accept connections and hand them to the workers, until interrupted."""
+        while True:
+            connection, _ = listener.accept()
+            try:
+                self.assign(connection, story_file)
+            except ZMachineException as e:
+                logger.error(str(e))
+
+    def shutdown(self):
+        """Stop the workers. Sessions still running are disconnected."""
+        for worker in self.workers:
+            worker.control.close()
+        for worker in self.workers:
+            os.waitpid(worker.pid, 0)
+        self.workers.clear()
+
+    async def _run_worker(self, control: socket.socket):
+        server = ZMachineServer(self.instruction_budget, self.stories)
+        handlers = [server.client_handler(story_file) for story_file in self.story_files]
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        control.setblocking(False)
+
+        async def run_session(connection: socket.socket, story_index: int):
+            try:
+                reader, writer = await asyncio.open_connection(sock=connection)
+                await handlers[story_index](reader, writer)
+            finally:
+                control.send(_SESSION_ENDED)
+
+        def on_assign():
+            try:
+                message, fds, _, _ = socket.recv_fds(control, _ASSIGN_MESSAGE.size, 1)
+            except BlockingIOError:
+                return
+            if message == b'':
+                # The pool has shut down.
+                loop.remove_reader(control.fileno())
+                stopped.set()
+                return
+            story_index, = _ASSIGN_MESSAGE.unpack(message)
+            loop.create_task(run_session(socket.socket(fileno=fds[0]), story_index))
+
+        loop.add_reader(control.fileno(), on_assign)
+        await stopped.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host many games of a story over TCP, with a pool of worker processes.')
+    parser.add_argument('story_file')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8023, help='TCP port to listen on')
+    parser.add_argument('--workers', type=int, help='Number of worker processes; defaults to the number of CPUs')
+    parser.add_argument(
+        '--budget',
+        type=int,
+        default=DEFAULT_INSTRUCTION_BUDGET,
+        help='Instructions each session runs before giving the other sessions a turn'
+    )
+    args = parser.parse_args()
+    pool = SessionPool([args.story_file], args.workers, args.budget)
+    listener = socket.create_server((args.host, args.port))
+    pool.start(listener)
+    print(f"Serving {args.story_file} on {listener.getsockname()} with {pool.worker_count} workers")
+    try:
+        pool.serve(listener)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
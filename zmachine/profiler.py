@@ -0,0 +1,444 @@
+import marshal
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+from .interpreter import ZMachineInterpreter
+from .opcodes import OpcodeHandler
+
+# Instruction forms, by the range of the opcode byte. 0xbe starts an extended instruction.
+FORM_LONG = 'long'
+FORM_SHORT = 'short'
+FORM_VARIABLE = 'variable'
+FORM_EXTENDED = 'extended'
+_EXTENDED_OPCODE = 0xbe
+
+
+@dataclass(frozen=True)
+class OpcodeStats:
+    """Executions of one opcode in one form."""
+    name: str
+    form: str
+    count: int
+    total_ns: int
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count > 0 else 0.0
+
+
+class OpcodeProfiler:
+    """Counts the instructions an interpreter runs, and the time spent in each, by opcode and form.
+    The profiler is the interpreter's instruction_hook while it's attached, so an interpreter
+    that isn't profiled runs exactly as before. A hook already in place is run inside it;
+    profilers attached to the same interpreter are detached in the reverse order.
+    The time of an instruction includes decoding its operands, and anything it waits for:
+    a read includes the time the player takes to type, and any interrupt routines it calls.
+    The profile can be read at any time with get_profile() or format_report()."""
+    def __init__(self, interpreter: ZMachineInterpreter):
+        self.interpreter = interpreter
+        # Indexed by the opcode byte, and for extended instructions by the extended opcode number.
+        self.counts = [0] * 256
+        self.times = [0] * 256
+        self.extended_counts = [0] * 256
+        self.extended_times = [0] * 256
+        self._attached = False
+        # The hook in place when the profiler was attached, put back when it's detached.
+        self._previous_hook: Callable[[], None] | None = None
+        self._run_instruction: Callable[[], None] = interpreter.run_instruction
+
+    @property
+    def is_attached(self) -> bool:
+        return self._attached
+
+    def attach(self):
+        if self.is_attached:
+            return
+        interpreter = self.interpreter
+        self._previous_hook = interpreter.instruction_hook
+        self._run_instruction = self._previous_hook or interpreter.run_instruction
+        interpreter.instruction_hook = self.run_instruction
+        self._attached = True
+
+    def detach(self):
+        if not self.is_attached:
+            return
+        self.interpreter.instruction_hook = self._previous_hook
+        self._previous_hook = None
+        self._attached = False
+
+    def reset(self):
+        for table in (self.counts, self.times, self.extended_counts, self.extended_times):
+            table[:] = [0] * 256
+
+    def run_instruction(self):
+        read_byte = self.interpreter.memory_map.read_byte
+        pc = self.interpreter.pc
+        opcode = read_byte(pc)
+        counts, times = self.counts, self.times
+        if opcode == _EXTENDED_OPCODE:
+            opcode = read_byte(pc + 1)
+            counts, times = self.extended_counts, self.extended_times
+        start = time.perf_counter_ns()
+        try:
+            self._run_instruction()
+        finally:
+            times[opcode] += time.perf_counter_ns() - start
+            counts[opcode] += 1
+
+    def get_profile(self) -> list[OpcodeStats]:
+        """Return the opcodes run so far, by total time, most first.
+        Instructions of the same opcode and form are combined, whatever the types of their operands."""
+        totals: dict[tuple[str, str], tuple[int, int]] = {}
+
+        def add(name: str, form: str, count: int, total_ns: int):
+            if count > 0:
+                previous_count, previous_ns = totals.get((name, form), (0, 0))
+                totals[(name, form)] = (previous_count + count, previous_ns + total_ns)
+        for opcode in range(256):
+            add(*self.describe(opcode), self.counts[opcode], self.times[opcode])
+            name = self.opcode_name(self.interpreter.extended_opcodes, opcode)
+            add(name, FORM_EXTENDED, self.extended_counts[opcode], self.extended_times[opcode])
+        result = [OpcodeStats(name, form, count, total_ns) for (name, form), (count, total_ns) in totals.items()]
+        result.sort(key=lambda stats: stats.total_ns, reverse=True)
+        return result
+
+    def get_totals(self, key) -> list[OpcodeStats]:
+        """Combine the profile by name or by form, e.g. get_totals(lambda s: s.form)."""
+        totals: dict[str, tuple[int, int]] = {}
+        for stats in self.get_profile():
+            count, total_ns = totals.get(key(stats), (0, 0))
+            totals[key(stats)] = (count + stats.count, total_ns + stats.total_ns)
+        return [OpcodeStats(name, '', count, total_ns) for name, (count, total_ns) in totals.items()]
+
+    def describe(self, opcode: int) -> tuple[str, str]:
+        """Return the name and form of the instruction that starts with the given opcode byte."""
+        if opcode <= 0x7f:
+            return self.opcode_name(self.interpreter.opcodes, opcode & 0x1f), FORM_LONG
+        if opcode <= 0xaf:
+            return self.opcode_name(self.interpreter.opcodes, (opcode & 0xf) | 0x80), FORM_SHORT
+        if opcode <= 0xbf:
+            return self.opcode_name(self.interpreter.opcodes, (opcode & 0xf) | 0xb0), FORM_SHORT
+        if opcode <= 0xdf:
+            return self.opcode_name(self.interpreter.opcodes, opcode & 0x1f), FORM_VARIABLE
+        return self.opcode_name(self.interpreter.opcodes, opcode), FORM_VARIABLE
+
+    @staticmethod
+    def opcode_name(opcode_dict: dict[int, OpcodeHandler], opcode_number: int) -> str:
+        op = opcode_dict.get(opcode_number)
+        if op is None:
+            return f'UNKNOWN_{opcode_number:02X}'
+        return op.__name__[3:].upper()
+
+    def format_report(self) -> str:
+        profile = self.get_profile()
+        total_count = sum(stats.count for stats in profile)
+        total_ns = sum(stats.total_ns for stats in profile)
+        lines = [f"{total_count} instructions in {total_ns / 1e9:.3f}s", '']
+
+        def table(title: str, rows: list[OpcodeStats], show_form: bool):
+            lines.append(f"{title:24}{'form' if show_form else '':10}{'count':>12}{'total ms':>12}{'mean ns':>12}{'time %':>8}")
+            for stats in sorted(rows, key=lambda s: s.total_ns, reverse=True):
+                share = 100 * stats.total_ns / total_ns if total_ns > 0 else 0.0
+                lines.append(f"{stats.name:24}{stats.form if show_form else '':10}{stats.count:12}"
+                             f"{stats.total_ns / 1e6:12.3f}{stats.mean_ns:12.0f}{share:8.1f}")
+            lines.append('')
+        table('opcode', profile, True)
+        table('opcode (all forms)', self.get_totals(lambda s: s.name), False)
+        table('form', self.get_totals(lambda s: s.form), False)
+        return '\n'.join(lines)
+
+    def write_report(self, path: str):
+        with open(path, 'w') as s:
+            s.write(self.format_report())
+
+
+@dataclass(frozen=True)
+class RoutineStats:
+    """Calls to one routine. Inclusive counts include the routines it calls, exclusive counts don't."""
+    addr: int
+    """ Byte address of the routine."""
+    packed_addr: int
+    label: str
+    calls: int
+    inclusive_instructions: int
+    exclusive_instructions: int
+    inclusive_ns: int
+    exclusive_ns: int
+
+
+@dataclass(frozen=True)
+class CallEdge:
+    """Calls from one routine to another. The caller is 0 for calls from outside any routine."""
+    caller: int
+    callee: int
+    calls: int
+    inclusive_instructions: int
+    exclusive_instructions: int
+    inclusive_ns: int
+    exclusive_ns: int
+
+
+class _Call:
+    """A routine call that hasn't returned yet."""
+    __slots__ = ('addr', 'caller', 'depth', 'start_ns', 'start_instructions', 'child_ns', 'child_instructions')
+
+    def __init__(self, addr: int, caller: int, depth: int, start_ns: int, start_instructions: int):
+        self.addr = addr
+        self.caller = caller
+        self.depth = depth
+        """ Size of the call stack with the routine's frame on it."""
+        self.start_ns = start_ns
+        self.start_instructions = start_instructions
+        self.child_ns = 0
+        self.child_instructions = 0
+
+
+class RoutineProfiler:
+    """Counts the calls to each routine, and the instructions run and time spent in it, with and
+    without the routines it calls, and the same for each caller and callee pair.
+    It's the interpreter's routine_hook while it's attached: it follows the calls and returns,
+    and labels each routine with the first string it prints.
+    Instructions are counted with the interpreter's instruction count, which it turns on while
+    attached, and which doesn't include interrupt routines called during a read. Frames dropped without returning (by restore or
+    restart) are closed at the next return below them."""
+    # Counters of a routine, or an edge: calls, inclusive and exclusive instructions, inclusive and exclusive ns.
+    _CALLS, _INCLUSIVE_INSTRUCTIONS, _EXCLUSIVE_INSTRUCTIONS, _INCLUSIVE_NS, _EXCLUSIVE_NS = range(5)
+    LABEL_LENGTH = 40
+
+    def __init__(self, interpreter: ZMachineInterpreter):
+        self.interpreter = interpreter
+        self.routines: dict[int, list[int]] = {}
+        self.edges: dict[tuple[int, int], list[int]] = {}
+        self.labels: dict[int, str] = {}
+        self._calls: list[_Call] = []
+        # Number of calls in progress to each routine, so that recursive calls aren't counted twice.
+        self._active: dict[int, int] = {}
+        self._count_instructions = False
+
+    @property
+    def is_attached(self) -> bool:
+        return self.interpreter.routine_hook is self
+
+    def attach(self):
+        if self.is_attached:
+            return
+        interpreter = self.interpreter
+        self._count_instructions = interpreter.count_instructions
+        interpreter.count_instructions = True
+        interpreter.routine_hook = self
+
+    def detach(self):
+        if not self.is_attached:
+            return
+        interpreter = self.interpreter
+        interpreter.routine_hook = None
+        interpreter.count_instructions = self._count_instructions
+        self._calls.clear()
+        self._active.clear()
+
+    def reset(self):
+        self.routines.clear()
+        self.edges.clear()
+        self._calls.clear()
+        self._active.clear()
+
+    def on_call(self, call_addr: int):
+        interpreter = self.interpreter
+        caller = self._calls[-1].addr if len(self._calls) > 0 else 0
+        self._calls.append(_Call(call_addr, caller, interpreter.call_stack.frame_ptr,
+                                 time.perf_counter_ns(), interpreter.instruction_count))
+        self._active[call_addr] = self._active.get(call_addr, 0) + 1
+
+    def on_return(self):
+        depth = self.interpreter.call_stack.frame_ptr
+        now = time.perf_counter_ns()
+        while len(self._calls) > 0 and self._calls[-1].depth >= depth:
+            self._end_call(self._calls.pop(), now)
+
+    def on_print(self, text: str):
+        if len(self._calls) > 0 and self._calls[-1].addr not in self.labels:
+            text = ' '.join(text.split())
+            # Skip prompts and punctuation.
+            if any(c.isalpha() for c in text):
+                self.labels[self._calls[-1].addr] = text[:self.LABEL_LENGTH]
+
+    def _end_call(self, call: _Call, now: int):
+        inclusive_ns = now - call.start_ns
+        inclusive_instructions = self.interpreter.instruction_count - call.start_instructions
+        exclusive_ns = inclusive_ns - call.child_ns
+        exclusive_instructions = inclusive_instructions - call.child_instructions
+        self._active[call.addr] -= 1
+        outermost = self._active[call.addr] == 0
+        self._add(self.routines, call.addr, inclusive_instructions, exclusive_instructions,
+                  inclusive_ns, exclusive_ns, outermost)
+        self._add(self.edges, (call.caller, call.addr), inclusive_instructions, exclusive_instructions,
+                  inclusive_ns, exclusive_ns, True)
+        if len(self._calls) > 0:
+            parent = self._calls[-1]
+            parent.child_ns += inclusive_ns
+            parent.child_instructions += inclusive_instructions
+
+    @classmethod
+    def _add(cls, table: dict, key, inclusive_instructions: int, exclusive_instructions: int,
+             inclusive_ns: int, exclusive_ns: int, include_inclusive: bool):
+        counters = table.get(key)
+        if counters is None:
+            counters = table[key] = [0] * 5
+        counters[cls._CALLS] += 1
+        counters[cls._EXCLUSIVE_INSTRUCTIONS] += exclusive_instructions
+        counters[cls._EXCLUSIVE_NS] += exclusive_ns
+        # The inclusive counts of a recursive call are already part of the outer call's.
+        if include_inclusive:
+            counters[cls._INCLUSIVE_INSTRUCTIONS] += inclusive_instructions
+            counters[cls._INCLUSIVE_NS] += inclusive_ns
+
+    def _snapshot(self) -> tuple[dict[int, list[int]], dict[tuple[int, int], list[int]]]:
+        """The counters so far, including the calls that haven't returned yet, as if they returned now."""
+        routines = {addr: counters[:] for addr, counters in self.routines.items()}
+        edges = {key: counters[:] for key, counters in self.edges.items()}
+        now = time.perf_counter_ns()
+        instruction_count = self.interpreter.instruction_count
+        active: dict[int, int] = {}
+        for i, call in enumerate(self._calls):
+            inclusive_ns = now - call.start_ns
+            inclusive_instructions = instruction_count - call.start_instructions
+            exclusive_ns = inclusive_ns - call.child_ns
+            exclusive_instructions = inclusive_instructions - call.child_instructions
+            if i + 1 < len(self._calls):
+                child = self._calls[i + 1]
+                exclusive_ns -= now - child.start_ns
+                exclusive_instructions -= instruction_count - child.start_instructions
+            outermost = call.addr not in active
+            active[call.addr] = 1
+            self._add(routines, call.addr, inclusive_instructions, exclusive_instructions,
+                      inclusive_ns, exclusive_ns, outermost)
+            self._add(edges, (call.caller, call.addr), inclusive_instructions, exclusive_instructions,
+                      inclusive_ns, exclusive_ns, True)
+        return routines, edges
+
+    def get_profile(self) -> tuple[list[RoutineStats], list[CallEdge]]:
+        """Return the routines by exclusive time, most first, and the calls between them.
+        Calls that haven't returned yet are included up to now, so this can be called while the game runs."""
+        routines, edges = self._snapshot()
+        labels = self.get_labels(edges)
+        unpack_shift = 1 if self.interpreter.version <= 3 else 2
+        stats = [RoutineStats(addr, addr >> unpack_shift, labels.get(addr, ''), *counters)
+                 for addr, counters in routines.items()]
+        stats.sort(key=lambda s: s.exclusive_ns, reverse=True)
+        call_edges = [CallEdge(caller, callee, *counters) for (caller, callee), counters in edges.items()]
+        call_edges.sort(key=lambda e: e.inclusive_ns, reverse=True)
+        return stats, call_edges
+
+    def get_labels(self, edges: dict[tuple[int, int], list[int]]) -> dict[int, str]:
+        """Label each routine with the first string it printed. A routine that didn't print
+        anything is labelled with the nearest string printed by the routines it calls."""
+        labels = dict(self.labels)
+        callees: dict[int, list[tuple[int, int]]] = {}
+        for (caller, callee), counters in edges.items():
+            callees.setdefault(caller, []).append((counters[self._CALLS], callee))
+        # Breadth first, preferring the callees called most often.
+        for addr in {callee for _, callee in edges}:
+            if addr in labels:
+                continue
+            seen = {addr}
+            frontier = [addr]
+            while len(frontier) > 0 and addr not in labels:
+                next_frontier = []
+                for routine in frontier:
+                    for _, callee in sorted(callees.get(routine, []), reverse=True):
+                        if callee in self.labels:
+                            labels[addr] = f'~{self.labels[callee]}'
+                            break
+                        if callee not in seen:
+                            seen.add(callee)
+                            next_frontier.append(callee)
+                    if addr in labels:
+                        break
+                frontier = next_frontier
+        return labels
+
+    def routine_name(self, stats: RoutineStats) -> str:
+        return f'{stats.packed_addr:04x} {stats.label}'.rstrip()
+
+    def format_report(self, limit: int = 50) -> str:
+        routines, edges = self.get_profile()
+        total_ns = sum(stats.exclusive_ns for stats in routines)
+        lines = [f"{len(routines)} routines, {sum(stats.calls for stats in routines)} calls", '',
+                 f"{'routine':48}{'calls':>10}{'excl instr':>12}{'incl instr':>12}{'excl ms':>10}{'incl ms':>10}{'excl %':>8}"]
+        for stats in routines[:limit]:
+            share = 100 * stats.exclusive_ns / total_ns if total_ns > 0 else 0.0
+            lines.append(f"{self.routine_name(stats)[:47]:48}{stats.calls:10}{stats.exclusive_instructions:12}"
+                         f"{stats.inclusive_instructions:12}{stats.exclusive_ns / 1e6:10.3f}"
+                         f"{stats.inclusive_ns / 1e6:10.3f}{share:8.1f}")
+        lines += ['', f"{'caller':>8} -> {'callee':8}{'calls':>10}{'incl instr':>12}{'incl ms':>10}"]
+        unpack_shift = 1 if self.interpreter.version <= 3 else 2
+        for edge in edges[:limit]:
+            lines.append(f"{edge.caller >> unpack_shift:8x} -> {edge.callee >> unpack_shift:<8x}{edge.calls:10}"
+                         f"{edge.inclusive_instructions:12}{edge.inclusive_ns / 1e6:10.3f}")
+        lines.append('')
+        return '\n'.join(lines)
+
+    def write_report(self, path: str):
+        with open(path, 'w') as s:
+            s.write(self.format_report())
+
+    def write_callgrind(self, path: str):
+        """Write the profile in callgrind format, for KCachegrind and similar tools.
+        The events are instructions and nanoseconds."""
+        routines, edges = self.get_profile()
+        names = {stats.addr: self.routine_name(stats) for stats in routines}
+        ids = {addr: i + 1 for i, addr in enumerate(names)}
+        calls_from: dict[int, list[CallEdge]] = {}
+        for edge in edges:
+            calls_from.setdefault(edge.caller, []).append(edge)
+        named = set()
+
+        def function_name(addr: int) -> str:
+            # The name is given with the first use of an id, and the id alone after that.
+            if addr in named:
+                return f'({ids[addr]})'
+            named.add(addr)
+            return f'({ids[addr]}) {names[addr]}'
+        with open(path, 'w') as s:
+            s.write('# callgrind format\nversion: 1\ncreator: zmachine\n')
+            s.write('positions: line\nevents: Instructions Nanoseconds\n\n')
+            s.write(f'fl={os.path.basename(self.interpreter.config.game_file)}\n')
+            for stats in routines:
+                s.write(f'fn={function_name(stats.addr)}\n')
+                s.write(f'0 {stats.exclusive_instructions} {stats.exclusive_ns}\n')
+                for edge in calls_from.get(stats.addr, []):
+                    s.write(f'cfn={function_name(edge.callee)}\ncalls={edge.calls} 0\n')
+                    s.write(f'0 {edge.inclusive_instructions} {edge.inclusive_ns}\n')
+                s.write('\n')
+
+    def write_pstats(self, path: str):
+        """Write the profile in the format of cProfile, to be read with pstats.Stats.
+        Each routine is a function named after its packed address and label, in the story file."""
+        routines, edges = self.get_profile()
+        game_file = os.path.basename(self.interpreter.config.game_file)
+        functions = {stats.addr: (game_file, stats.packed_addr, self.routine_name(stats)) for stats in routines}
+        functions[0] = (game_file, 0, '<outside any routine>')
+        callers: dict[int, dict] = {addr: {} for addr in functions}
+        for edge in edges:
+            callers[edge.callee][functions[edge.caller]] = (
+                edge.calls, edge.calls, edge.exclusive_ns / 1e9, edge.inclusive_ns / 1e9)
+        stats_table = {
+            functions[stats.addr]: (stats.calls, stats.calls, stats.exclusive_ns / 1e9, stats.inclusive_ns / 1e9,
+                                    callers[stats.addr])
+            for stats in routines
+        }
+        stats_table[functions[0]] = (0, 0, 0.0, 0.0, {})
+        with open(path, 'wb') as s:
+            marshal.dump(stats_table, s)
+
+    def write(self, path: str):
+        """Write the profile in the format given by the file name: pstats for .prof or .pstats,
+        callgrind for callgrind.out.* or .callgrind, and a text report otherwise."""
+        name = os.path.basename(path)
+        if name.endswith(('.prof', '.pstats')):
+            self.write_pstats(path)
+        elif name.startswith('callgrind.out') or name.endswith('.callgrind'):
+            self.write_callgrind(path)
+        else:
+            self.write_report(path)
@@ -1,4 +1,5 @@
-from typing import Protocol, Callable, runtime_checkable
+from random import Random
+from typing import Protocol, Callable, Iterable, runtime_checkable
 from .enums import WindowPosition, RoutineType
 
 @runtime_checkable
@@ -98,6 +99,11 @@ class IZMachineInterpreter(Protocol):
     def object_table(self) -> IObjectTable:
         ...
 
+    @property
+    def rng(self) -> Random:
+        """The session's random number generator."""
+        ...
+
     def do_branch(self, is_truthy: int):
         ...
 
@@ -318,7 +324,11 @@ class ITerminalAdapter(Protocol):
         ...
 
     def refresh(self):
-        """Refresh the terminal display."""
+        """Mark the terminal display as changed. The update may be deferred until update_screen is called."""
+        ...
+
+    def update_screen(self):
+        """Write any pending changes to the terminal display."""
         ...
 
     def set_scrollable_height(self, top: int):
@@ -401,10 +411,18 @@ class IInputSource(Protocol):
         """Select the keyboard input stream as the active input source."""
         ...
 
-    def select_playback_stream(self, commands: list[str]):
+    def select_playback_stream(self, commands: Iterable[str]):
         """Select a playback stream with the given list of commands as the active input source."""
         ...
 
+    def select_resumable_stream(self):
+        """Select the stream that raises InputPendingException until input is provided with provide_input."""
+        ...
+
+    def provide_input(self, text: str | None):
+        """Provide the input for the resumable stream, or None if the read timed out."""
+        ...
+
     def read_input(self,
         timeout_ms: int,
         text_buffer: list[int],
@@ -414,6 +432,21 @@ class IInputSource(Protocol):
         """Read input with the given timeout and echo settings, storing the result in the provided text buffer."""
         ...
 
+@runtime_checkable
+class IRoutineHook(Protocol):
+    """Interface for following the routines the interpreter runs, e.g. to profile them."""
+    def on_call(self, call_addr: int):
+        """Called after the frame of a routine call is pushed."""
+        ...
+
+    def on_return(self):
+        """Called before the frame of the returning routine is popped."""
+        ...
+
+    def on_print(self, text: str):
+        """Called with each string printed from memory, before it's written."""
+        ...
+
 @runtime_checkable
 class IBaseOutputStream(Protocol):
     """Output stream interface that all output stream implementations must support."""
@@ -487,7 +520,7 @@ class IHotkeyHandler(Protocol):
         """Display a help message describing the available hotkeys."""
         ...
     def set_random_seed(self):
-        """Prompt the user to enter a random seed and set it for the random module."""
+        """Prompt the user to enter a random seed and set it for the session's random number generator."""
         ...
     def playback_recorded_input(self, input_source: IInputSource) -> bool:
         """Prompt the user to select a playback file and set the input stream to playback mode with the selected file, returning True if successful."""
@@ -0,0 +1,221 @@
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from .builder import ZMachineBuilder
+from .event import PostReadInputEventArgs
+from .headless import HeadlessAdapter, HeadlessScreen
+from .playback import PlaybackReader
+from .error import PlaybackFileException, ZMachineException
+from .profiler import OpcodeProfiler, RoutineProfiler
+
+
+@dataclass(frozen=True)
+class ReplayResult:
+    """Outcome of replaying a recorded command file on the headless terminal."""
+    instructions: int
+    turns: int
+    seconds: float
+    transcript: str
+    """ Everything written to the lower window, including the echoed commands."""
+    screen: list[str]
+    """ The final screen, one string per line."""
+    profile: OpcodeProfiler | None = None
+    """ The opcode profile, if the replay was profiled."""
+    routine_profile: RoutineProfiler | None = None
+    """ The routine profile, if the replay's routines were profiled."""
+
+    @property
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def turns_per_second(self) -> float:
+        return self.turns / self.seconds if self.seconds > 0 else 0.0
+
+    def format_stats(self) -> str:
+        return (f"{self.instructions} instructions, {self.turns} turns in {self.seconds:.3f}s: "
+                f"{self.instructions_per_second:,.0f} instructions/s, {self.turns_per_second:,.1f} turns/s")
+
+
+def replay(story_file: str,
+           playback_file_path: str,
+           profile: bool = False,
+           profile_routines: bool = False) -> ReplayResult:
+    """Run the commands in a playback file as fast as possible, without a terminal.
+    The game runs until the commands run out or it quits. An error in the game is raised.
+    If profile is set, the opcodes run are profiled, and if profile_routines is set, the routines."""
+    playback = PlaybackReader(playback_file_path)
+    if playback.game is not None and playback.game != os.path.basename(story_file):
+        playback.close()
+        raise PlaybackFileException("Playback file does not match the current game.")
+    builder = ZMachineBuilder(story_file, terminal='headless', seed=playback.seed)
+    interpreter = builder.interpreter
+    terminal_adapter, screen = builder.terminal_adapter, interpreter.screen
+    if not isinstance(terminal_adapter, HeadlessAdapter) or not isinstance(screen, HeadlessScreen):
+        raise ZMachineException("Replays are played on a headless terminal.")
+    interpreter.count_instructions = True
+    interpreter.raise_errors = True
+    turns = 0
+
+    def count_turn(sender, e: PostReadInputEventArgs):
+        nonlocal turns
+        turns += 1
+
+    interpreter.event_manager.post_read_input += count_turn
+    interpreter.input_source.select_playback_stream(playback)
+    profiler = None
+    if profile:
+        profiler = OpcodeProfiler(interpreter)
+        profiler.attach()
+    routine_profiler = None
+    if profile_routines:
+        routine_profiler = RoutineProfiler(interpreter)
+        routine_profiler.attach()
+    start = time.perf_counter()
+    builder.start()
+    seconds = time.perf_counter() - start
+    transcript = terminal_adapter.read_output()
+    return ReplayResult(
+        instructions=interpreter.instruction_count,
+        turns=turns,
+        seconds=seconds,
+        transcript=transcript,
+        screen=screen.get_screen_lines(transcript),
+        profile=profiler,
+        routine_profile=routine_profiler
+    )
+
+
+GOLDEN_SUFFIX = '.golden'
+
+
+@dataclass(frozen=True)
+class RegressionResult:
+    """Outcome of replaying one recording in the regression runner."""
+    recording: str
+    digest: str | None
+    """ SHA-256 of the transcript, or None if the replay failed."""
+    instructions: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+
+    @property
+    def instructions_per_second(self) -> float:
+        return self.instructions / self.seconds if self.seconds > 0 else 0.0
+
+
+def transcript_digest(transcript: str) -> str:
+    return hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+
+
+def find_story_file(playback_file_path: str, games_dir: str) -> str:
+    """Find the story file named in a recording's header, in the games directory."""
+    with PlaybackReader(playback_file_path) as playback:
+        game = playback.game
+    if game is None:
+        raise PlaybackFileException("Playback file does not name its game.")
+    return os.path.join(games_dir, game)
+
+
+def run_recording(playback_file_path: str, story_file: str | None, games_dir: str) -> RegressionResult:
+    """Replay a recording and hash its transcript. Errors are reported in the result,
+    so that one bad recording doesn't stop the others."""
+    try:
+        if story_file is None:
+            story_file = find_story_file(playback_file_path, games_dir)
+        result = replay(story_file, playback_file_path)
+    except Exception as e:
+        return RegressionResult(playback_file_path, None, error=f"{type(e).__name__}: {e}")
+    return RegressionResult(playback_file_path, transcript_digest(result.transcript), result.instructions, result.seconds)
+
+
+def golden_file_path(playback_file_path: str, golden_dir: str | None) -> str:
+    if golden_dir is None:
+        return playback_file_path + GOLDEN_SUFFIX
+    return os.path.join(golden_dir, os.path.basename(playback_file_path) + GOLDEN_SUFFIX)
+
+
+def check_golden(result: RegressionResult, golden_dir: str | None, update: bool) -> str:
+    """Compare a result with its golden file, writing the file if it's missing or update is set.
+    Returns the status to report: ok, new, updated, FAIL, or ERROR."""
+    if result.digest is None:
+        return 'ERROR'
+    path = golden_file_path(result.recording, golden_dir)
+    expected = None
+    if os.path.exists(path):
+        with open(path, 'r') as s:
+            expected = s.read().strip()
+    if expected == result.digest:
+        return 'ok'
+    if expected is not None and not update:
+        return 'FAIL'
+    with open(path, 'w') as s:
+        s.write(result.digest + '\n')
+    return 'new' if expected is None else 'updated'
+
+
+def run_regressions(recordings: list[str],
+                    story_file: str | None = None,
+                    games_dir: str = 'games',
+                    jobs: int | None = None) -> list[RegressionResult]:
+    """Replay recordings in parallel, one process per CPU by default.
+    Each recording is played with the story named in its header, unless story_file is given.
+    Results are in the same order as the recordings."""
+    if jobs == 1:
+        return [run_recording(recording, story_file, games_dir) for recording in recordings]
+    count = len(recordings)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(run_recording, recordings, [story_file] * count, [games_dir] * count))
+
+
+def expand_recordings(paths: list[str]) -> list[str]:
+    """Expand directories to the recordings (*.rec) in them."""
+    recordings = []
+    for path in paths:
+        if os.path.isdir(path):
+            recordings.extend(sorted(glob.glob(os.path.join(path, '**', '*.rec'), recursive=True)))
+        else:
+            recordings.append(path)
+    return recordings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replay recordings in parallel without a terminal, and compare their transcripts with golden files.'
+    )
+    parser.add_argument('recordings', nargs='+', help='Recorded command files, or directories of *.rec files')
+    parser.add_argument('--story', help='Story file to play every recording with, instead of the game in its header')
+    parser.add_argument('--games-dir', default='games', help='Directory of the story files named in the recordings')
+    parser.add_argument('--golden-dir', help='Directory of the golden files; by default they are next to the recordings')
+    parser.add_argument('--update', action='store_true', help='Replace golden files that don\'t match')
+    parser.add_argument('--jobs', type=int, help='Number of worker processes; defaults to the number of CPUs')
+    args = parser.parse_args()
+    recordings = expand_recordings(args.recordings)
+    if len(recordings) == 0:
+        parser.error('No recordings found')
+
+    start = time.perf_counter()
+    results = run_regressions(recordings, args.story, args.games_dir, args.jobs)
+    seconds = time.perf_counter() - start
+    failures = 0
+    for result in results:
+        status = check_golden(result, args.golden_dir, args.update)
+        if status in ('FAIL', 'ERROR'):
+            failures += 1
+        if result.error is not None:
+            print(f"{status:7} {result.recording}: {result.error}")
+        else:
+            print(f"{status:7} {result.recording}: {result.seconds:.3f}s, {result.instructions} instructions, "
+                  f"{result.instructions_per_second:,.0f} instructions/s")
+    total_instructions = sum(result.instructions for result in results)
+    print(f"{len(results)} recordings, {failures} failed, {total_instructions} instructions in {seconds:.3f}s")
+    sys.exit(1 if failures > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ from .error import InvalidScreenOperationException
 from .event import EventManager, EventArgs
 from .enums import WindowPosition, TextStyle
 from .protocol import ITerminalAdapter
+from .framebuffer import Framebuffer
 from .logging import screen_logger as logger
 from .constants import SUPPORTED_VERSIONS, DEFAULT_BACKGROUND_COLOR, DEFAULT_FOREGROUND_COLOR
 
@@ -22,8 +23,72 @@ class Window:
         self.y_cursor, self.x_cursor = y_pos, x_pos
 
 
+class LineWrapper:
+    """Word wraps text for a fixed screen width.
+    Each line of text is wrapped in a single pass, and recently wrapped text is cached."""
+    _CACHE_SIZE = 256
+
+    def __init__(self, width: int):
+        self.width = width
+        self._cache: dict[tuple[str, int], list[str]] = {}
+
+    def wrap(self, text: str, x: int) -> list[str]:
+        """Wrap the text, starting at column x. Returns the lines to write to the screen."""
+        key = (text, x)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._wrap(text, x)
+            if len(self._cache) >= self._CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = result
+        return result[:]
+
+    def _wrap(self, text: str, x: int) -> list[str]:
+        width = self.width
+        result = []
+        lines = text.split("\n")
+        last_line = len(lines) - 1
+        for line_num, line in enumerate(lines):
+            if line_num < last_line:
+                line += "\n"
+            elif line == '':
+                break
+            if len(line) < width - x:
+                result.append(line)
+                x = 0
+                continue
+            stripped_line = line.lstrip(' ')
+            indent = len(line) - len(stripped_line)
+            words = stripped_line.split(' ')
+            # Leading spaces are kept, up to the end of the screen line.
+            output_line = [' ' * max(0, min(indent, width - x + 1))]
+            x += indent
+            separator = ''
+            for word in words:
+                if len(separator) + len(word) > width - x:
+                    separator = ''
+                    output_line.append("\n")
+                    result.append(''.join(output_line))
+                    output_line = []
+                    x = 0
+                output_line.append(separator)
+                output_line.append(word)
+                x += len(separator) + len(word)
+                if x == width:
+                    x = 0
+                    separator = ''
+                    result.append(''.join(output_line))
+                    output_line = []
+                else:
+                    separator = ' '
+            last_output_line = ''.join(output_line)
+            if last_output_line.endswith("\n"):
+                x = 0
+            result.append(last_output_line)
+        return result
+
+
 class BaseScreen:
-    _TEXT_BUFFER_LENGTH = 1024
     _pause_enabled: bool = True
 
     def __init__(self, terminal_adapter: ITerminalAdapter, event_manager: EventManager):
@@ -31,12 +96,18 @@ class BaseScreen:
         self.terminal_adapter = terminal_adapter
         self.height = terminal_adapter.height
         self.width = terminal_adapter.width
+        self.line_wrapper = LineWrapper(self.width)
         self.lower_window = Window(self.height, self.width)
         self.upper_window = Window(0, 0)
         self.active_window = self.lower_window
         self.output_line_count = 0
-        self.text_buffer = ['\0'] * self._TEXT_BUFFER_LENGTH
+        # Buffered text is kept as a list of chunks and joined once when flushed.
+        # text_buffer_ptr is the number of characters in the buffer.
+        self.text_buffer: list[str] = []
         self.text_buffer_ptr = 0
+        # Versions with a framebuffer draw the upper window into it, and only the
+        # changed cells are sent to the terminal when the screen is flushed.
+        self.framebuffer: Framebuffer | None = None
         self._pause_enabled = True
         self._buffer_mode = True
         self.register_delegates(event_manager)
@@ -86,7 +157,8 @@ class BaseScreen:
     def pre_read_input_handler(self, sender, event_args: EventArgs):
         self.reset_output_line_count()
         self.flush_buffer(self.active_window)
-        self.terminal_adapter.refresh()
+        self.flush_framebuffer()
+        self.terminal_adapter.update_screen()
 
     def refresh_status_line(self, location: str, status: str) -> None:
         raise NotImplementedError(f"Status line is not implemented in v{self.version} screen.")
@@ -95,6 +167,7 @@ class BaseScreen:
         logger.info(f"Setting active window to {window_id}")
         if window_id == WindowPosition.LOWER:
             self.set_active_window(self.lower_window)
+            self.flush_framebuffer()
         elif window_id == WindowPosition.UPPER:
             self.flush_buffer(self.active_window)
             self.set_active_window(self.upper_window)
@@ -104,8 +177,12 @@ class BaseScreen:
     def split_window(self, lines: int) -> None: 
         logger.info(f"Splitting window at line {lines}")
         self.flush_buffer(self.lower_window)
+        self.flush_framebuffer()
         self.active_window.sync_cursor(*self.terminal_adapter.get_coordinates())
         lower_window_y = lines + self.upper_window.y_pos
+        if self.framebuffer is not None:
+            # Rows below the upper window belong to the lower window, which draws to the terminal directly.
+            self.framebuffer.forget(lower_window_y, self.height - lower_window_y)
         self.upper_window.height = lines
         self.lower_window.height = self.height - lower_window_y
         self.lower_window.y_pos = lower_window_y
@@ -124,10 +201,12 @@ class BaseScreen:
         self.flush_buffer(self.lower_window)
         if window_id == -2:
             self.terminal_adapter.erase_screen()
+            self.erase_framebuffer(0, self.height)
             self.output_line_count = 0
             self.reset_cursor(self.lower_window)
         elif window_id == -1:
             self.terminal_adapter.erase_screen()
+            self.erase_framebuffer(0, self.height)
             self.output_line_count = 0
             self.split_window(0)
             self.reset_cursor(self.lower_window)
@@ -159,8 +238,9 @@ class BaseScreen:
     def on_quit_handler(self, sender, e: EventArgs):
         self.set_active_window(self.lower_window)
         self.flush_buffer(self.active_window)
+        self.flush_framebuffer()
         self.terminal_adapter.write_to_screen("\n[Press any key to exit.]")
-        self.terminal_adapter.refresh()
+        self.terminal_adapter.update_screen()
         self.terminal_adapter.get_input_char(False)
         self.terminal_adapter.shutdown()
 
@@ -172,12 +252,44 @@ class BaseScreen:
 
     def write_to_active_window(self, text: str, newline: bool = False):
         self.flush_buffer(self.active_window)
+        framebuffer = self.framebuffer
+        if framebuffer is not None and self.active_window == self.upper_window:
+            self.write_to_framebuffer(framebuffer, text + "\n" if newline else text)
+            return
         self.apply_text_style_attributes(self.active_window)
         self.terminal_adapter.write_to_screen(text)
         if newline:
             self.terminal_adapter.write_to_screen("\n")
         self.terminal_adapter.refresh()
 
+    def write_to_framebuffer(self, framebuffer: Framebuffer, text: str):
+        window = self.upper_window
+        y, x = self.terminal_adapter.get_coordinates()
+        y, x = framebuffer.write(y, x, text, window.style_attributes, window.background_color, window.foreground_color)
+        # Keep the terminal cursor where it would be if the text had been written to the terminal.
+        self.terminal_adapter.move_cursor(min(y, self.height - 1), x)
+
+    def flush_framebuffer(self):
+        """Send the upper window cells that changed since the last flush to the terminal."""
+        if self.framebuffer is None or not self.framebuffer.is_dirty:
+            return
+        y, x = self.terminal_adapter.get_coordinates()
+        self.framebuffer.flush(self.terminal_adapter)
+        self.terminal_adapter.move_cursor(y, x)
+        self.apply_text_style_attributes(self.active_window)
+        if self.framebuffer.use_color:
+            self.terminal_adapter.set_color(self.active_window.background_color, self.active_window.foreground_color)
+
+    def erase_framebuffer(self, top: int, height: int):
+        if self.framebuffer is not None:
+            self.framebuffer.erase(top, height)
+
+    def get_upper_window_lines(self) -> list[str]:
+        """Return the text of the upper window, one string per line."""
+        if self.framebuffer is None:
+            raise NotImplementedError(f"Upper window contents are not available in v{self.version} screen.")
+        return self.framebuffer.get_lines(self.upper_window.y_pos, self.upper_window.height)
+
     def apply_text_style_attributes(self, window: Window):
         self.terminal_adapter.apply_style_attributes(window.style_attributes)
 
@@ -195,24 +307,22 @@ class BaseScreen:
 
     def erase(self, window: Window):
         self.terminal_adapter.erase_window(window.y_pos, window.height)
+        if window == self.upper_window:
+            self.erase_framebuffer(window.y_pos, window.height)
         self.reset_cursor(window)
 
     def write_to_buffer(self, text: str, newline: bool):
-        text_len = len(text)
-        while self.text_buffer_ptr + text_len + 1 >= len(self.text_buffer):
-            self.text_buffer += ['\0'] * self._TEXT_BUFFER_LENGTH
-        prev_ptr = self.text_buffer_ptr
-        next_ptr = self.text_buffer_ptr + text_len
-        self.text_buffer[prev_ptr:next_ptr] = text
+        self.text_buffer.append(text)
+        self.text_buffer_ptr += len(text)
         if newline:
-            self.text_buffer[next_ptr] = "\n"
-            next_ptr += 1
-        self.text_buffer_ptr = next_ptr
+            self.text_buffer.append("\n")
+            self.text_buffer_ptr += 1
 
     def flush_buffer(self, window: Window):
         if self.text_buffer_ptr == 0:
             return
-        text = ''.join(self.text_buffer[:self.text_buffer_ptr])
+        text = ''.join(self.text_buffer)
+        self.text_buffer.clear()
         self.text_buffer_ptr = 0
         active_window = self.active_window
         self.set_active_window(window)
@@ -224,57 +334,17 @@ class BaseScreen:
                 self.output_line_count += 1
             if self.output_line_count >= window.height - 1 and self.pause_enabled:
                 self.terminal_adapter.write_to_screen('[MORE]')
-                self.terminal_adapter.refresh()
+                self.flush_framebuffer()
+                self.terminal_adapter.update_screen()
                 self.terminal_adapter.get_input_char(False)
                 self.terminal_adapter.move_cursor(self.height - 1, 0)
                 self.terminal_adapter.clear_to_eol()
                 self.output_line_count = 0
         self.set_active_window(active_window)
 
-    def wrap_lines(self, text):
-        result = []
-        text_pos = 0
-        y, x = self.terminal_adapter.get_coordinates()
-        while text_pos < len(text):
-            line = text[text_pos:]
-            line_break = text.find("\n", text_pos)
-            if line_break >= 0:
-                line = text[text_pos:line_break + 1]
-                text_pos = line_break + 1
-            else:
-                text_pos = len(text)
-            if len(line) < self.width - x:
-                result += [line]
-                x = 0
-            else:
-                output_line = ''
-                linepos = 0
-                while line[linepos] == ' ':
-                    if x <= self.width:
-                        output_line += ' '
-                    linepos += 1
-                    x += 1
-                words = line[linepos:].split(' ')
-                separator = ''
-                for word in words:
-                    if len(separator) + len(word) > self.width - x:
-                        separator = ''
-                        result += [output_line + "\n"]
-                        output_line = ''
-                        x = 0
-                    output_line += f"{separator}{word}"
-                    x += len(separator) + len(word)
-                    if x == self.width:
-                        x = 0
-                        separator = ''
-                        result += [output_line]
-                        output_line = ''
-                    else:
-                        separator = ' '
-                if len(output_line) > 0 and output_line[-1] == '\n':
-                    x = 0
-                result += [output_line]
-        return result
+    def wrap_lines(self, text: str) -> list[str]:
+        # flush_buffer has just synced the active window's cursor with the terminal.
+        return self.line_wrapper.wrap(text, self.active_window.x_cursor)
 
 
 class ScreenV3(BaseScreen):
@@ -319,6 +389,7 @@ class ScreenV4(BaseScreen):
     def __init__(self, terminal_adapter: ITerminalAdapter, event_manager: EventManager):
         super().__init__(terminal_adapter, event_manager)
         self._version = 4
+        self.framebuffer: Framebuffer = Framebuffer(self.height, self.width)
         self.reset_cursor(self.lower_window)
 
     def set_cursor(self, y_pos: int, x_pos: int) -> None:
@@ -345,6 +416,7 @@ class ScreenV5(ScreenV4):
     def __init__(self, terminal_adapter: ITerminalAdapter, event_manager: EventManager):
         super().__init__(terminal_adapter, event_manager)
         self._version = 5
+        self.framebuffer.use_color = True
 
     def set_active_window(self, window: Window):
         super().set_active_window(window)
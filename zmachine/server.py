@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import itertools
+import os
+from typing import Generator
+from .builder import ZMachineBuilder
+from .story import StoryImage
+from .hibernate import hibernate, resume, warm_start
+from .headless import HeadlessAdapter
+from .enums import InputRequest
+from .error import ZMachineException
+from .constants import DEFAULT_INSTRUCTION_BUDGET
+from .logging import server_logger as logger
+
+
+class Session:
+    """One game played over a stream connection.
+    The interpreter runs as a generator on a headless screen. It gives control back to
+    the event loop each time the instruction budget runs out, and waits for a line from
+    the client each time the game reads input.
+    With use_warm_start, the session is cloned from the story's snapshot at the first prompt,
+    rather than running the boot sequence.
+    If hibernate_after_seconds is set, a session left waiting for input that long is
+    hibernated: the interpreter is dropped and its state kept as a compact blob, in memory
+    or in hibernate_dir. It's rebuilt when the client sends the next line."""
+    def __init__(self,
+                 session_id: int,
+                 story: StoryImage,
+                 instruction_budget: int = DEFAULT_INSTRUCTION_BUDGET,
+                 hibernate_after_seconds: float | None = None,
+                 hibernate_dir: str | None = None,
+                 use_warm_start: bool = True):
+        self.session_id = session_id
+        self.story = story
+        self.instruction_budget = instruction_budget
+        self.hibernate_after_seconds = hibernate_after_seconds
+        self.hibernate_dir = hibernate_dir
+        self.hibernated: bytes | None = None
+        self.hibernate_path: str | None = None
+        # None while the session is hibernating.
+        self.builder: ZMachineBuilder | None = None
+        self.terminal_adapter: HeadlessAdapter | None = None
+        self.game: Generator[InputRequest | None, str | None, None] | None = None
+        if use_warm_start:
+            self.start(warm_start(story))
+        else:
+            self.start(ZMachineBuilder(story.config.game_file, terminal='headless', story=story))
+
+    def start(self, builder: ZMachineBuilder) -> Generator[InputRequest | None, str | None, None]:
+        if not isinstance(builder.terminal_adapter, HeadlessAdapter):
+            raise ZMachineException("Sessions can only be played on a headless terminal.")
+        self.builder = builder
+        self.terminal_adapter = builder.terminal_adapter
+        self.game = builder.interpreter.run_resumable(self.instruction_budget)
+        return self.game
+
+    @property
+    def is_hibernating(self) -> bool:
+        return self.game is None
+
+    async def run(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        game = self.game
+        if game is None:
+            raise ZMachineException(f"Session {self.session_id} is hibernating.")
+        try:
+            request = next(game)
+            while True:
+                if request is None:
+                    # Out of budget for this round. Let the other sessions run.
+                    await asyncio.sleep(0)
+                    request = game.send(None)
+                    continue
+                await self.write_output(writer)
+                text = await self.read_input(reader, request)
+                if text is None and reader.at_eof():
+                    logger.info(f"Session {self.session_id}: client disconnected")
+                    break
+                if self.is_hibernating:
+                    # Reading and unpacking the blob is slow enough to hold up the other sessions.
+                    game = await asyncio.get_running_loop().run_in_executor(None, self.wake)
+                request = game.send(text)
+        except StopIteration:
+            pass
+        finally:
+            if self.is_hibernating:
+                self.discard_hibernated()
+            else:
+                game.close()
+                await self.write_output(writer)
+
+    async def read_input(self, reader: asyncio.StreamReader, request: InputRequest) -> str | None:
+        """Read a line from the client. Returns None if the read timed out or the client disconnected.
+        The session is hibernated if it waits too long for a line that has no time limit."""
+        try:
+            if request.timeout_ms > 0:
+                line = await asyncio.wait_for(reader.readline(), request.timeout_ms / 1000)
+            else:
+                line = await asyncio.wait_for(reader.readline(), self.hibernate_after_seconds)
+        except TimeoutError:
+            if request.timeout_ms > 0:
+                return None
+            await asyncio.get_running_loop().run_in_executor(None, self.hibernate)
+            line = await reader.readline()
+        if line == b'':
+            return None
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def hibernate(self):
+        if self.builder is None or self.game is None:
+            return
+        blob = hibernate(self.builder)
+        self.game.close()
+        self.builder = self.terminal_adapter = self.game = None
+        if self.hibernate_dir is None:
+            self.hibernated = blob
+        else:
+            self.hibernate_path = os.path.join(self.hibernate_dir, f'session-{os.getpid()}-{self.session_id}.zhib')
+            with open(self.hibernate_path, 'wb') as s:
+                s.write(blob)
+        logger.info(f"Session {self.session_id}: hibernated, {len(blob)} bytes")
+
+    def wake(self) -> Generator[InputRequest | None, str | None, None]:
+        """Rebuild the hibernated session. Returns its game, waiting at the read it was hibernated at."""
+        blob = self.hibernated
+        if self.hibernate_path is not None:
+            with open(self.hibernate_path, 'rb') as s:
+                blob = s.read()
+        if blob is None:
+            raise ZMachineException(f"Session {self.session_id} isn't hibernating.")
+        self.discard_hibernated()
+        game = self.start(resume(self.story, blob))
+        logger.info(f"Session {self.session_id}: resumed")
+        next(game)
+        return game
+
+    def discard_hibernated(self):
+        if self.hibernate_path is not None:
+            os.remove(self.hibernate_path)
+        self.hibernated = None
+        self.hibernate_path = None
+
+    async def write_output(self, writer: asyncio.StreamWriter):
+        if self.terminal_adapter is None:
+            return
+        text = self.terminal_adapter.read_output()
+        if text == '' or writer.is_closing():
+            return
+        writer.write(text.encode('utf-8', errors='replace'))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class ZMachineServer:
+    """Hosts many games in one process on an asyncio event loop.
+    Story files are loaded once and shared by all the sessions of the same game."""
+    def __init__(self,
+                 instruction_budget: int = DEFAULT_INSTRUCTION_BUDGET,
+                 stories: dict[str, StoryImage] | None = None,
+                 hibernate_after_seconds: float | None = None,
+                 hibernate_dir: str | None = None,
+                 use_warm_start: bool = True):
+        self.instruction_budget = instruction_budget
+        self.hibernate_after_seconds = hibernate_after_seconds
+        self.hibernate_dir = hibernate_dir
+        self.use_warm_start = use_warm_start
+        self.stories: dict[str, StoryImage] = stories if stories is not None else {}
+        self.sessions: dict[int, Session] = {}
+        self._session_ids = itertools.count(1)
+
+    def get_story(self, story_file: str) -> StoryImage:
+        story = self.stories.get(story_file)
+        if story is None:
+            story = StoryImage.load(story_file)
+            self.stories[story_file] = story
+        return story
+
+    def client_handler(self, story_file: str):
+        """Return a connection callback for asyncio that plays the given story."""
+        story = self.get_story(story_file)
+
+        async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            session_id = next(self._session_ids)
+            try:
+                session = Session(session_id, story, self.instruction_budget,
+                                  self.hibernate_after_seconds, self.hibernate_dir, self.use_warm_start)
+                self.sessions[session_id] = session
+                logger.info(f"Session {session_id}: started {story_file}")
+                await session.run(reader, writer)
+            except Exception as e:
+                logger.error(f"Session {session_id}: {e}")
+            finally:
+                self.sessions.pop(session_id, None)
+                writer.close()
+                logger.info(f"Session {session_id}: ended")
+
+        return handle_client
+
+    async def start_tcp_server(self, story_file: str, host: str = '127.0.0.1', port: int = 0) -> asyncio.Server:
+        return await asyncio.start_server(self.client_handler(story_file), host, port)
+
+    async def start_unix_server(self, story_file: str, path: str) -> asyncio.Server:
+        return await asyncio.start_unix_server(self.client_handler(story_file), path)
+
+
+async def serve(server: ZMachineServer, story_file: str, host: str, port: int, unix_path: str | None):
+    if unix_path is not None:
+        listener = await server.start_unix_server(story_file, unix_path)
+    else:
+        listener = await server.start_tcp_server(story_file, host, port)
+    for socket in listener.sockets:
+        print(f"Serving {story_file} on {socket.getsockname()}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host many games of a story over TCP or a Unix socket.')
+    parser.add_argument('story_file')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8023, help='TCP port to listen on')
+    parser.add_argument('--unix', metavar='PATH', help='Listen on a Unix socket instead of TCP')
+    parser.add_argument(
+        '--budget',
+        type=int,
+        default=DEFAULT_INSTRUCTION_BUDGET,
+        help='Instructions each session runs before giving the other sessions a turn'
+    )
+    parser.add_argument(
+        '--hibernate-after',
+        type=float,
+        metavar='SECONDS',
+        help='Hibernate sessions that have been waiting this long for input, until the player types something'
+    )
+    parser.add_argument(
+        '--hibernate-dir',
+        metavar='DIR',
+        help='With --hibernate-after, keep hibernated sessions in this directory instead of in memory'
+    )
+    parser.add_argument(
+        '--cold-start',
+        action='store_true',
+        help='Run the boot sequence for each new session, instead of cloning it from a snapshot at the first prompt'
+    )
+    args = parser.parse_args()
+    server = ZMachineServer(args.budget,
+                            hibernate_after_seconds=args.hibernate_after,
+                            hibernate_dir=args.hibernate_dir,
+                            use_warm_start=not args.cold_start)
+    try:
+        asyncio.run(serve(server, args.story_file, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
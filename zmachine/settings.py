@@ -5,6 +5,9 @@ class RuntimeSettings:
     
     def __init__(self, memory_map: MemoryMap):
         self.memory_map = memory_map
+        # Whether the player can be prompted for save, restore and transcript files.
+        # When it's off, saving and restoring fail and transcripts aren't written.
+        self.file_prompts_enabled = True
 
     @property
     def transcript_active_flag(self) -> bool:
@@ -0,0 +1,25 @@
+from dataclasses import dataclass, field
+from .config import ZMachineConfig
+
+
+@dataclass(frozen=True)
+class StoryImage:
+    """A game file read into memory once, to be shared by every session of the game.
+    Each session copies the image into its own memory map, so the file is not read again.
+    The caches hold only what can't change while the game runs (the main dictionary and
+    strings in static memory), so sessions share them too."""
+    config: ZMachineConfig
+    data: bytes
+    dictionary_index: dict[bytes, int] = field(default_factory=dict)
+    """ Encoded words in the main dictionary, and the address of each entry."""
+    string_cache: dict[int, tuple[str, int]] = field(default_factory=dict)
+    """ Decoded strings by address, with the address after the end of each string."""
+    warm_start: dict = field(default_factory=dict)
+    """ The state of a session at the game's first prompt, for starting new sessions without
+    running the boot sequence. Empty until it's captured."""
+
+    @classmethod
+    def load(cls, game_file: str) -> 'StoryImage':
+        with open(game_file, 'rb') as s:
+            data = s.read()
+        return cls(ZMachineConfig.from_story_data(game_file, data), data)
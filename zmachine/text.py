@@ -8,10 +8,21 @@ class TextUtils:
     A1 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
     A2 = ' ^0123456789.,!?_#\'"/\\-:()'
 
-    def __init__(self, memory_map: MemoryMap):
+    def __init__(self,
+                 memory_map: MemoryMap,
+                 dictionary_index: dict[bytes, int] | None = None,
+                 string_cache: dict[int, tuple[str, int]] | None = None):
         self.memory_map = memory_map
         self.config = memory_map.config
         self.separator_chars = self.get_separator_chars()
+        # Optional caches, which can be shared by every session of the same story.
+        # The dictionary index maps encoded words in the main dictionary to their entry addresses,
+        # and is filled in on the first lookup. It's only used if the dictionary is in static memory.
+        self.dictionary_index = dictionary_index
+        if self.config.dictionary_table_addr < self.config.static_memory_base_addr:
+            self.dictionary_index = None
+        # Decoded strings in static memory, with the address after the end of each string.
+        self.string_cache = string_cache
 
     def read_byte(self, ptr):
         return self.memory_map.read_byte(ptr)
@@ -71,6 +82,9 @@ class TextUtils:
         search_method = binary_search
         if dictionary_addr == 0:
             dictionary_addr = self.config.dictionary_table_addr
+        if self.dictionary_index is not None and dictionary_addr == self.config.dictionary_table_addr:
+            self.build_dictionary_index()
+            return self.dictionary_index.get(bytes(encoded), 0)
         num_separators = self.read_byte(dictionary_addr)
         entry_length = self.read_byte(dictionary_addr + num_separators + 1)
         num_entries = self.read_int16(dictionary_addr + num_separators + 2)
@@ -81,6 +95,21 @@ class TextUtils:
         first_entry_ptr = dictionary_addr + num_separators + 4
         return search_method()
 
+    def build_dictionary_index(self):
+        if self.dictionary_index is None or len(self.dictionary_index) > 0:
+            return
+        dictionary_addr = self.config.dictionary_table_addr
+        encoded_len = 4 if self.config.version <= 3 else 6
+        num_separators = self.read_byte(dictionary_addr)
+        entry_length = self.read_byte(dictionary_addr + num_separators + 1)
+        num_entries = abs(self.read_int16(dictionary_addr + num_separators + 2))
+        entry_ptr = dictionary_addr + num_separators + 4
+        view = self.memory_map.view
+        for _ in range(num_entries):
+            # If a word is in the dictionary twice, the search would find the first one.
+            self.dictionary_index.setdefault(bytes(view[entry_ptr:entry_ptr + encoded_len]), entry_ptr)
+            entry_ptr += entry_length
+
     @staticmethod
     def tokenize(command, separator_chars=None):
         if separator_chars is None:
@@ -150,6 +179,22 @@ class TextUtils:
             zptr += 1
         return ''.join(result)
 
+    def read_string(self, addr: int) -> tuple[str, int]:
+        """Decode the string at the given address. Returns the text and the address after the string."""
+        # Static memory can't change, so strings there are cached.
+        # This assumes the game doesn't rewrite its abbreviation table, which none do.
+        if self.string_cache is not None and addr >= self.config.static_memory_base_addr:
+            cached = self.string_cache.get(addr)
+            if cached is None:
+                cached = self.string_cache[addr] = self._read_string(addr)
+            return cached
+        return self._read_string(addr)
+
+    def _read_string(self, addr: int) -> tuple[str, int]:
+        zchars: list[int] = []
+        addr = self.read_zchars(addr, zchars)
+        return self.zscii_decode(zchars), addr
+
     def read_zchars(self, addr: int, buffer: List[int]) -> int:
         word = 0
         while word & 0x8000 != 0x8000: